@@ -0,0 +1,298 @@
+"""
+Throughput and latency benchmark of the example bots against a local fake Bot API.
+
+Each scenario builds the graph of one example (TelegramEchoBot, TelegramCommandBot,
+TelegramReplyMediaBot) from the same components, points TelegramInitApp at
+`fake_bot_api.py` (started in a subprocess) and polls it for a synthetic stream
+of updates spread over many chats. Reported per scenario:
+
+- updates/s from the first queued update to the last reply,
+- p50 / p99 reply latency (update queued -> reply received by the API),
+- replies missing at the end, requests answered with 429,
+- resident memory growth and open file descriptors after a warm-up.
+
+Run from the Xircuits project root (the directory containing `xai_components`):
+
+    python xai_components/xai_telegram/benchmarks/bench_examples.py --updates 5000
+    python xai_components/xai_telegram/benchmarks/bench_examples.py echo --latency 0.05 --rate-429 0.01 --scheduler
+    python xai_components/xai_telegram/benchmarks/bench_examples.py command --replay updates.ndjson.gz
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIBRARY = os.path.dirname(HERE)
+sys.path.insert(0, os.path.dirname(os.path.dirname(LIBRARY)))
+
+from xai_components.xai_events.event_components import OnEvent  # noqa: E402
+from xai_components.xai_utils.utils import ConcatString  # noqa: E402
+from xai_components.xai_telegram import telegram_core_components as core  # noqa: E402
+from xai_components.xai_telegram import telegram_media_components as media  # noqa: E402
+from xai_components.xai_telegram.telegram_replay import read_recording  # noqa: E402
+from xai_components.xai_telegram.telegram_runner import _start_app, _stop_app  # noqa: E402
+from xai_components.xai_telegram.telegram_scheduler import SendScheduler  # noqa: E402
+
+TOKEN = "123456:benchmark"
+MEDIA_COMMANDS = {
+    "reply_image": (media.TelegramSendImage, "example.jpg"),
+    "reply_pdf": (media.TelegramSendPDF, "example.pdf"),
+    "reply_audio": (media.TelegramSendAudio, "example.mp3"),
+    "reply_video": (media.TelegramSendVideo, "example.mp4"),
+}
+
+
+def _listener(ctx, event_name: str, *components):
+    """Chains `components` after an OnEvent for `event_name`, as the Xircuits compiler does."""
+    event = OnEvent()
+    event.eventName.value = event_name
+    event.init(ctx)
+    previous = event
+    for component in components:
+        previous.next = component
+        previous = component
+    previous.next = None
+    return event
+
+
+def build_echo(ctx) -> None:
+    # TelegramEchoBot: TelegramAddEchoHandler.
+    core.TelegramAddEchoHandler().execute(ctx)
+
+
+def build_command(ctx) -> None:
+    # TelegramCommandBot: /test_command -> ParseCommandPayload -> ConcatString -> ReplyToMessageEvent.
+    command = core.TelegramAddCommandEvent()
+    command.command_name.value = "test_command"
+    command.event_name.value = "/echo_me"
+    command.execute(ctx)
+
+    parse = core.TelegramParseCommandPayload()
+    concat = ConcatString()
+    concat.a.value = "You said: "
+    concat.b.connect(parse.message_text)
+    reply = core.TelegramReplyToMessageEvent()
+    reply.reply_text.connect(concat.out)
+    event = _listener(ctx, "/echo_me", parse, concat, reply)
+    parse.event_payload.connect(event.payload)
+    reply.event_payload.connect(event.payload)
+
+
+def build_media(ctx) -> None:
+    # TelegramReplyMediaBot: one command per media type -> InputFile -> Send<Media> replying to the command.
+    for command_name, (send_class, file_name) in MEDIA_COMMANDS.items():
+        command = core.TelegramAddCommandEvent()
+        command.command_name.value = command_name
+        command.event_name.value = command_name
+        command.execute(ctx)
+
+        parse = core.TelegramParseCommandPayload()
+        input_file = media.TelegramInputFile()
+        input_file.data.value = os.path.join(LIBRARY, "examples", file_name)
+        send = send_class()
+        send.chat_id.connect(parse.chat_id)
+        send.reply_to_message_id.connect(parse.message_id)
+        send.input_file.connect(input_file.input_file)
+        event = _listener(ctx, command_name, parse, input_file, send)
+        parse.event_payload.connect(event.payload)
+
+
+SCENARIOS = {
+    "echo": (build_echo, lambda i: f"hello {i}"),
+    "command": (build_command, lambda i: f"/test_command message {i}"),
+    "media": (build_media, lambda i: "/" + list(MEDIA_COMMANDS)[i % len(MEDIA_COMMANDS)]),
+}
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": chat_id, "type": "private", "first_name": f"user{chat_id}"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+        "text": text,
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": update_id, "message": message}
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Peak rather than current memory, on platforms without /proc.
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def open_fds() -> int:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        if os.path.isdir(path):
+            return len(os.listdir(path))
+    return -1
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Control:
+    def __init__(self, port: int):
+        self.base = f"http://127.0.0.1:{port}/_bench"
+
+    def call(self, path: str, payload=None) -> Dict[str, Any]:
+        data = json.dumps(payload).encode() if payload is not None else b""
+        method = "POST" if payload is not None or path != "stats" else "GET"
+        request = urllib.request.Request(f"{self.base}/{path}", data=data or None, method=method,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read())
+
+
+async def _drive(control: Control, loop, first_id: int, count: int, factory, rate: float) -> None:
+    batch = 100
+    started = loop.time()
+    for start in range(0, count, batch):
+        updates = [factory(first_id + i, i) for i in range(start, min(count, start + batch))]
+        await loop.run_in_executor(None, control.call, "updates", updates)
+        if rate:
+            await asyncio.sleep(max(0.0, started + (start + batch) / rate - loop.time()))
+
+
+async def _wait_for_replies(control: Control, loop, expected: int, timeout: float) -> Dict[str, Any]:
+    deadline = loop.time() + timeout
+    while True:
+        stats = await loop.run_in_executor(None, control.call, "stats")
+        if stats["replies"] >= expected or loop.time() >= deadline:
+            return stats
+        await asyncio.sleep(0.05)
+
+
+def run_scenario(name: str, args, control: Control) -> Dict[str, Any]:
+    build, text = SCENARIOS[name]
+    if args.replay:
+        # Recorded updates, cycled and renumbered so getUpdates offsets keep increasing.
+        recorded = [data for _, data in read_recording(args.replay)]
+        if not recorded:
+            raise ValueError(f"No updates in {args.replay}.")
+
+        def factory(update_id, i):
+            return dict(recorded[i % len(recorded)], update_id=update_id)
+    else:
+        def factory(update_id, i):
+            return make_update(update_id, 1000 + i % args.chats, text(i))
+    ctx = {}
+    init = core.TelegramInitApp()
+    init.telegram_token.value = TOKEN
+    init.bot_api_url.value = f"http://127.0.0.1:{args.port}"
+    init.local_mode.value = False
+    init.connection_pool_size.value = args.pool_size
+    init.media_pool_size.value = args.media_pool_size
+    init.concurrent_updates.value = args.concurrent_updates
+    init.send_scheduler.value = SendScheduler() if args.scheduler else None
+    init.execute(ctx)
+    app = ctx["telegram_app"]
+    if args.workers:
+        pool = core.TelegramConfigureWorkerPool()
+        pool.max_workers.value = args.workers
+        pool.execute(ctx)
+    build(ctx)
+    core._prepare_run(app)
+
+    async def run() -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, control.call, "reset", {})
+        await _start_app(app, polling=True, drop_pending_updates=False)
+        try:
+            await _drive(control, loop, 1, args.warmup, factory, 0)
+            await _wait_for_replies(control, loop, args.warmup, args.timeout)
+            await loop.run_in_executor(None, control.call, "reset", {})
+            rss_before, fds_before = rss_bytes(), open_fds()
+
+            await _drive(control, loop, args.warmup + 1, args.updates, factory, args.rate)
+            stats = await _wait_for_replies(control, loop, args.updates, args.timeout)
+            rss_after, fds_after = rss_bytes(), open_fds()
+        finally:
+            await _stop_app(app)
+
+        latencies = stats["latencies"]
+        return {
+            "scenario": name,
+            "updates": args.updates,
+            "updates_per_s": stats["replies"] / stats["elapsed"] if stats["elapsed"] else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "missing": args.updates - stats["replies"],
+            "rate_limited": stats["rate_limited"],
+            "rss_growth_mb": (rss_after - rss_before) / 2 ** 20,
+            "fds": f"{fds_before}->{fds_after}",
+        }
+
+    return asyncio.run(run())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks the example bots against a fake Bot API.")
+    parser.add_argument("scenarios", nargs="*", metavar="scenario",
+                        help=f"Scenarios to run: {', '.join(SCENARIOS)} (default: all).")
+    parser.add_argument("--updates", type=int, default=2000, help="Updates per scenario.")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--chats", type=int, default=100, help="Distinct chats the updates come from.")
+    parser.add_argument("--replay", help="Feed updates from a TelegramRecordUpdates recording instead.")
+    parser.add_argument("--rate", type=float, default=0.0, help="Updates per second to feed; 0 feeds at once.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Bot API response latency in seconds.")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of sends answered with 429.")
+    parser.add_argument("--workers", type=int, default=0, help="Worker pool size; 0 runs subgraphs inline.")
+    parser.add_argument("--scheduler", action="store_true", help="Use the SendScheduler rate limiter.")
+    parser.add_argument("--pool-size", type=int, default=None, help="Bot API connection pool size.")
+    parser.add_argument("--media-pool-size", type=int, default=None, help="Separate connection pool for uploads.")
+    parser.add_argument("--concurrent-updates", type=int, default=None, help="Updates processed at once.")
+    parser.add_argument("--port", type=int, default=18081)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for all replies.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "fake_bot_api.py"), "--port", str(args.port),
+         "--latency", str(args.latency), "--jitter", str(args.jitter), "--rate-429", str(args.rate_429)],
+        stdout=subprocess.PIPE,
+    )
+    try:
+        server.stdout.readline()
+        control = Control(args.port)
+        results = [run_scenario(name, args, control) for name in (args.scenarios or SCENARIOS)]
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+        return
+    columns = ("scenario", "updates_per_s", "p50_ms", "p99_ms", "missing", "rate_limited", "rss_growth_mb", "fds")
+    print("  ".join(f"{column:>14}" for column in columns))
+    for result in results:
+        print("  ".join(
+            f"{result[column]:>14.1f}" if isinstance(result[column], float) else f"{result[column]:>14}"
+            for column in columns
+        ))
+
+
+if __name__ == "__main__":
+    main()
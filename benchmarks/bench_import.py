@@ -0,0 +1,125 @@
+"""
+Import-time benchmark of the component modules.
+
+Xircuits imports the component modules when it lists components and compiles
+workflows, and every worker process imports them again at start. Each module is
+imported in a fresh interpreter, after `xai_components.base`, and reported with:
+
+- the median time to import it, over `--repeat` runs,
+- which heavy dependencies (python-telegram-bot, httpx) the import pulled in.
+
+With `--check`, the exit status is 1 if a component module imports a heavy
+dependency at load time, so CI can keep the library fast to load.
+
+Run from the Xircuits project root (the directory containing `xai_components`):
+
+    python xai_components/xai_telegram/benchmarks/bench_import.py
+    python xai_components/xai_telegram/benchmarks/bench_import.py --repeat 10 --check
+    python xai_components/xai_telegram/benchmarks/bench_import.py telegram_core_components --top 15
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LIBRARY = os.path.dirname(HERE)
+PROJECT = os.path.dirname(os.path.dirname(LIBRARY))
+PACKAGE = "xai_components." + os.path.basename(LIBRARY)
+
+HEAVY = ("telegram", "httpx")
+
+_PROBE = """
+import json, sys, time
+import xai_components.base
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def component_modules() -> List[str]:
+    return sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(LIBRARY, "*_components.py"))
+    )
+
+
+def probe(module: str) -> Dict[str, Any]:
+    """Imports `module` in a fresh interpreter and returns its import time and heavy imports."""
+    code = _PROBE.format(module=f"{PACKAGE}.{module}", heavy=HEAVY)
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def top_imports(module: str, count: int) -> List[Dict[str, Any]]:
+    """The `count` slowest imports (cumulative) of `module`, from `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import xai_components.base; import {PACKAGE}.{module}"],
+        cwd=PROJECT, check=True, capture_output=True, text=True,
+    ).stderr
+    # importtime also lists xai_components.base and its imports; only what follows is this module's.
+    lines = stderr.splitlines()
+    base = max(i for i, line in enumerate(lines) if line.rstrip().endswith("| xai_components.base"))
+    rows = []
+    for line in lines[base + 1:]:
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[1].isdigit():
+            rows.append({"module": parts[2].strip(), "cumulative_ms": int(parts[1]) / 1000})
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return rows[:count]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measures how long the component modules take to import.")
+    parser.add_argument("modules", nargs="*", metavar="module",
+                        help="Component modules to measure (default: all *_components modules).")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module.")
+    parser.add_argument("--top", type=int, default=0, help="Also list the N slowest imports of each module.")
+    parser.add_argument("--check", action="store_true",
+                        help=f"Exit with status 1 if a module imports {' or '.join(HEAVY)} at load time.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON lines.")
+    args = parser.parse_args()
+
+    available = component_modules()
+    unknown = set(args.modules) - set(available)
+    if unknown:
+        parser.error(f"unknown modules: {', '.join(sorted(unknown))}")
+
+    results = []
+    for module in args.modules or available:
+        runs = [probe(module) for _ in range(max(args.repeat, 1))]
+        result = {
+            "module": module,
+            "median_ms": statistics.median(run["seconds"] for run in runs) * 1000,
+            "max_ms": max(run["seconds"] for run in runs) * 1000,
+            "heavy_imports": runs[0]["loaded"],
+        }
+        if args.top:
+            result["top"] = top_imports(module, args.top)
+        results.append(result)
+
+    if args.json:
+        for result in results:
+            print(json.dumps(result))
+    else:
+        print(f"{'module':>32}  {'median_ms':>10}  {'max_ms':>10}  heavy_imports")
+        for result in results:
+            print(f"{result['module']:>32}  {result['median_ms']:>10.1f}  {result['max_ms']:>10.1f}  "
+                  f"{', '.join(result['heavy_imports']) or '-'}")
+            for row in result.get("top", ()):
+                print(f"{'':>34}{row['cumulative_ms']:>10.1f}  {row['module']}")
+
+    if args.check and any(result["heavy_imports"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+A local stand-in for the Telegram Bot API, for benchmarks and load tests.
+
+Serves the methods the components use (getMe, getUpdates, sendMessage,
+sendPhoto, sendDocument, sendAudio, sendVideo, sendMediaGroup, ...) on
+`http://<listen>:<port>/bot<token>/<method>`, with a configurable response
+latency and a fraction of requests answered with 429 Too Many Requests.
+
+Updates are fed to the bot through a control API on the same port:
+
+- `POST /_bench/updates` with a JSON list of updates queues them for getUpdates.
+- `GET /_bench/stats` returns request counts and, for every update, the time
+  until the first message sent to its chat afterwards (its reply latency).
+- `POST /_bench/reset` clears the queue and statistics.
+
+Run standalone with `python benchmarks/fake_bot_api.py --port 8081`.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from collections import defaultdict, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from typing import Any, Dict, List, Optional, Tuple
+
+SEND_METHODS = {
+    "sendMessage", "sendPhoto", "sendDocument", "sendAudio", "sendVideo", "sendVoice",
+    "sendAnimation", "sendMediaGroup", "copyMessage", "forwardMessage",
+}
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 429: "Too Many Requests"}
+
+
+def parse_parameters(headers: Dict[str, str], body: bytes) -> Dict[str, Any]:
+    """Decodes Bot API parameters sent as a form, multipart form (uploads) or JSON."""
+    content_type = headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+
+    raw: Dict[str, Any] = {}
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + body
+        )
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename() is None:
+                raw[name] = part.get_content() if part.get_content_maintype() == "text" else part.get_payload(decode=True).decode()
+            else:
+                raw[name] = part.get_payload(decode=True)
+    else:
+        raw = dict(urllib.parse.parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+
+    # python-telegram-bot JSON-encodes every non-string parameter value.
+    parameters = {}
+    for key, value in raw.items():
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        parameters[key] = value
+    return parameters
+
+
+class FakeBotAPI:
+    def __init__(self, listen: str = "127.0.0.1", port: int = 8081, latency: float = 0.0,
+                 jitter: float = 0.0, rate_429: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        self.listen = listen
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._arrived: Optional[asyncio.Event] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._updates: deque = deque()
+        self._waiting: Dict[Any, deque] = defaultdict(deque)
+        self._next_message_id = 1
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.rate_limited = 0
+        self.latencies: List[float] = []
+        self.first_update: Optional[float] = None
+        self.last_reply: Optional[float] = None
+
+    async def start(self) -> None:
+        self._arrived = asyncio.Event()
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, payload = await self._route(method, target.split("?", 1)[0], headers, body)
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Any]:
+        if path == "/_bench/updates":
+            self.push_updates(json.loads(body))
+            return 200, {"ok": True}
+        if path == "/_bench/stats":
+            return 200, self.stats()
+        if path == "/_bench/reset":
+            self.reset()
+            return 200, {"ok": True}
+
+        parts = path.strip("/").split("/")
+        if len(parts) != 2 or not parts[0].startswith("bot"):
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        api_method = parts[1]
+        self.requests[api_method] += 1
+        parameters = parse_parameters(headers, body)
+
+        if api_method == "getUpdates":
+            return 200, {"ok": True, "result": await self._get_updates(parameters)}
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self.rate_429 and api_method in SEND_METHODS and self._random.random() < self.rate_429:
+            self.rate_limited += 1
+            return 429, {
+                "ok": False, "error_code": 429, "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+        result = self._result(api_method, parameters)
+        if api_method in SEND_METHODS:
+            self._record_reply(parameters.get("chat_id"))
+        return 200, {"ok": True, "result": result}
+
+    def push_updates(self, updates: List[dict]) -> None:
+        now = time.monotonic()
+        if self.first_update is None:
+            self.first_update = now
+        for update in updates:
+            self._updates.append(update)
+            chat = (update.get("message") or {}).get("chat") or {}
+            self._waiting[chat.get("id")].append(now)
+        self._arrived.set()
+
+    async def _get_updates(self, parameters: Dict[str, Any]) -> List[dict]:
+        offset = parameters.get("offset") or 0
+        limit = parameters.get("limit") or 100
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and parameters.get("timeout"):
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout=parameters["timeout"])
+            except asyncio.TimeoutError:
+                pass
+        return [update for update, _ in zip(self._updates, range(limit))]
+
+    def _record_reply(self, chat_id) -> None:
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        waiting = self._waiting.get(chat_id)
+        if waiting:
+            now = time.monotonic()
+            self.latencies.append(now - waiting.popleft())
+            self.last_reply = now
+
+    def _message(self, parameters: Dict[str, Any]) -> dict:
+        message_id = self._next_message_id
+        self._next_message_id += 1
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+        }
+        if "text" in parameters:
+            message["text"] = str(parameters["text"])
+        return message
+
+    def _result(self, api_method: str, parameters: Dict[str, Any]) -> Any:
+        if api_method == "getMe":
+            return {
+                "id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False,
+            }
+        if api_method == "sendMediaGroup":
+            return [self._with_media(self._message(parameters), item.get("type", "photo"))
+                    for item in parameters.get("media") or []]
+        if api_method.startswith("send") and api_method != "sendMessage":
+            kind = api_method[4:].lower()
+            return self._with_media(self._message(parameters), kind)
+        if api_method in SEND_METHODS:
+            return self._message(parameters)
+        if api_method == "getFile":
+            file_id = parameters.get("file_id", "")
+            return {"file_id": file_id, "file_unique_id": file_id, "file_size": 0, "file_path": f"files/{file_id}"}
+        return True
+
+    def _with_media(self, message: dict, kind: str) -> dict:
+        media = {"file_id": f"{kind}-{message['message_id']}", "file_unique_id": f"u{message['message_id']}"}
+        if kind == "photo":
+            message["photo"] = [dict(media, width=1280, height=720)]
+        elif kind in ("video", "animation"):
+            message[kind] = dict(media, width=1280, height=720, duration=1)
+        elif kind in ("audio", "voice"):
+            message[kind] = dict(media, duration=1)
+        else:
+            message[kind] = media
+        return message
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "rate_limited": self.rate_limited,
+            "pending_updates": len(self._updates),
+            "replies": len(self.latencies),
+            "latencies": self.latencies,
+            "elapsed": (self.last_reply - self.first_update) if self.last_reply and self.first_update else 0.0,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every Bot API response.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of sends answered with 429.")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(args.listen, args.port, args.latency, args.jitter, args.rate_429, args.retry_after, args.seed)
+
+    async def serve():
+        await api.start()
+        print(f"Fake Bot API listening on http://{args.listen}:{args.port}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
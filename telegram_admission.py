@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+from .telegram_cache import dispatch_cached
+from .telegram_scheduler import TokenBucket
+
+
+logger = logging.getLogger(__name__)
+
+POLICY_DROP = "drop"
+POLICY_QUEUE = "queue"
+POLICY_MERGE = "merge"
+_POLICIES = (POLICY_DROP, POLICY_QUEUE, POLICY_MERGE)
+
+_controllers = weakref.WeakKeyDictionary()
+
+
+class _Pending:
+    """An inbound event waiting for admission; merged events keep the latest payload."""
+
+    __slots__ = ("app", "ctx", "event_name", "payload", "key", "user", "chat", "texts", "count")
+
+    def __init__(self, app, ctx, event_name: str, payload, key: Hashable, user: Hashable, chat: Hashable):
+        self.app = app
+        self.ctx = ctx
+        self.event_name = event_name
+        self.payload = payload
+        self.key = key
+        self.user = user
+        self.chat = chat
+        self.texts: List[Optional[str]] = [payload.get("text")]
+        self.count = 1
+
+    def matches(self, event_name: str, chat: Hashable) -> bool:
+        return self.event_name == event_name and self.chat == chat
+
+    def merge(self, payload) -> None:
+        self.payload = payload
+        self.texts.append(payload.get("text"))
+        self.count += 1
+
+    def absorb(self, other: "_Pending") -> None:
+        self.payload = other.payload
+        self.texts.extend(other.texts)
+        self.count += other.count
+
+    def final_payload(self):
+        payload = self.payload
+        if self.count > 1:
+            payload["merged_count"] = self.count
+            if "text" in payload and all(isinstance(text, str) for text in self.texts):
+                payload["text"] = "\n".join(self.texts)
+        return payload
+
+
+class AdmissionController:
+    """
+    Admission control for the inbound events of an Application, so a single
+    flooding user or busy group cannot take all subgraph capacity.
+
+    - Token buckets per user and per chat limit how often each may fire events.
+    - At most `max_in_flight` events are dispatched at once, counted until their
+      subgraphs have finished.
+    - With `debounce` seconds, messages a user sends to the same event and chat
+      within that time of the first one are merged into a single event.
+
+    An event that finds its bucket empty or `max_in_flight` reached is handled by
+    `policy`:
+
+    - "drop": the event is dropped.
+    - "queue": the event waits. Waiting events are admitted round robin across
+      users, so one user's backlog does not delay anyone else. Each user may have
+      at most `max_queue` events waiting; further events are dropped.
+    - "merge": as "queue", but an event joins the user's waiting event for the same
+      event and chat instead of waiting behind it.
+
+    Merged events fire once with the latest message's payload, its `text` holding
+    the merged texts one per line, and `merged_count` the number of messages.
+    Payloads without text (commands, media) keep only the latest message.
+    """
+
+    def __init__(
+        self,
+        user_rate: float = 1.0,
+        user_burst: float = 3.0,
+        chat_rate: float = 0.0,
+        chat_burst: float = 10.0,
+        max_in_flight: int = 0,
+        debounce: float = 0.0,
+        policy: str = POLICY_QUEUE,
+        max_queue: int = 10,
+        event_names: Optional[Iterable[str]] = None,
+    ):
+        if policy not in _POLICIES:
+            raise ValueError(f"policy must be one of {_POLICIES}.")
+        self.user_rate = user_rate
+        self.user_burst = max(user_burst, 1.0)
+        self.chat_rate = chat_rate
+        self.chat_burst = max(chat_burst, 1.0)
+        self.max_in_flight = max_in_flight
+        self.debounce = debounce
+        self.policy = policy
+        self.max_queue = max_queue
+        self.event_names = set(event_names) if event_names else None
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._users: Dict[Hashable, TokenBucket] = {}
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        self._batches: Dict[tuple, _Pending] = {}
+        self._queues: "OrderedDict[Hashable, deque]" = OrderedDict()
+        self._tasks = set()
+        self._pump: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._draining = False
+        self._last_sweep = 0.0
+
+        self._in_flight = 0
+        self._received = 0
+        self._admitted = 0
+        self._merged = 0
+        self._queued_total = 0
+        self._dropped = {"rate": 0, "busy": 0, "queue_full": 0}
+
+    def _bind(self) -> None:
+        # asyncio primitives must be created on the loop that uses them.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._idle.set()
+            self._batches = {}
+            self._queues = OrderedDict()
+            self._in_flight = 0
+            self._pump = None
+
+    def applies_to(self, event_name: str) -> bool:
+        return self.event_names is None or event_name in self.event_names
+
+    def submit(self, app, ctx, event_name: str, payload, key: Hashable = None) -> None:
+        """Admits, merges, queues or drops an inbound event. Never waits."""
+        self._bind()
+        self._received += 1
+        chat = payload.get("chat_id")
+        user = payload.get("user_id")
+        if user is None:
+            user = chat
+
+        if self.debounce > 0:
+            batch_key = (user, chat, event_name)
+            batch = self._batches.get(batch_key)
+            if batch is not None:
+                batch.merge(payload)
+                self._merged += 1
+                return
+            self._batches[batch_key] = _Pending(app, ctx, event_name, payload, key, user, chat)
+            self._idle.clear()
+            self.loop.call_later(self.debounce, self._close_batch, batch_key)
+            return
+
+        self._admit(_Pending(app, ctx, event_name, payload, key, user, chat))
+
+    def _close_batch(self, batch_key: tuple) -> None:
+        pending = self._batches.pop(batch_key, None)
+        if pending is not None:
+            self._admit(pending)
+            self._check_idle()
+
+    def _admit(self, pending: _Pending) -> None:
+        queue = self._queues.get(pending.user)
+        if not queue:
+            delay = self._delay(pending, self.loop.time())
+            if delay == 0 and not self._full():
+                self._start(pending)
+                return
+        else:
+            delay = None
+
+        if self.policy == POLICY_DROP:
+            self._dropped["busy" if delay == 0 else "rate"] += 1
+            return
+
+        if queue and self.policy == POLICY_MERGE:
+            for waiting in reversed(queue):
+                if waiting.matches(pending.event_name, pending.chat):
+                    waiting.absorb(pending)
+                    self._merged += pending.count
+                    return
+
+        if queue is None:
+            queue = self._queues[pending.user] = deque()
+        if len(queue) >= self.max_queue:
+            self._dropped["queue_full"] += 1
+            if not queue:
+                del self._queues[pending.user]
+            return
+        queue.append(pending)
+        self._queued_total += 1
+        self._idle.clear()
+        self._wakeup.set()
+        if self._pump is None or self._pump.done():
+            self._pump = self.loop.create_task(self._run_pump())
+
+    def _bucket(self, buckets: Dict[Hashable, TokenBucket], key: Hashable, rate: float, burst: float, now: float):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def _delay(self, pending: _Pending, now: float) -> float:
+        """Seconds until both of the event's buckets hold a token."""
+        if self._draining:
+            return 0.0
+        self._sweep(now)
+        delay = 0.0
+        if self.user_rate > 0:
+            bucket = self._bucket(self._users, pending.user, self.user_rate, self.user_burst, now)
+            delay = bucket.delay(now)
+        if self.chat_rate > 0:
+            bucket = self._bucket(self._chats, pending.chat, self.chat_rate, self.chat_burst, now)
+            delay = max(delay, bucket.delay(now))
+        return delay
+
+    def _sweep(self, now: float) -> None:
+        # Forget buckets of users and chats that have been quiet long enough to be full again.
+        if now - self._last_sweep > 60.0:
+            self._last_sweep = now
+            for buckets in (self._users, self._chats):
+                for key in [key for key, bucket in buckets.items() if bucket.idle(now)]:
+                    del buckets[key]
+
+    def _full(self) -> bool:
+        return 0 < self.max_in_flight <= self._in_flight
+
+    def _start(self, pending: _Pending) -> None:
+        if not self._draining:
+            if self.user_rate > 0:
+                self._users[pending.user].take()
+            if self.chat_rate > 0:
+                self._chats[pending.chat].take()
+        self._in_flight += 1
+        self._admitted += 1
+        self._idle.clear()
+
+        task = self.loop.create_task(self._dispatch(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, pending: _Pending) -> None:
+        finished = []
+
+        def on_done():
+            if not finished:
+                finished.append(True)
+                self.loop.call_soon_threadsafe(self._release)
+
+        try:
+            await dispatch_cached(
+                pending.app,
+                pending.ctx,
+                pending.event_name,
+                pending.final_payload(),
+                key=pending.key,
+                on_done=on_done,
+            )
+        except Exception:
+            logger.exception("Dispatching event %r failed.", pending.event_name)
+            on_done()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._wakeup.set()
+        self._check_idle()
+
+    def _check_idle(self) -> None:
+        if not self._in_flight and not self._queues and not self._batches:
+            self._idle.set()
+
+    async def _run_pump(self) -> None:
+        while self._queues:
+            now = self.loop.time()
+            wait = None
+            started = False
+            # Round robin: a user whose event starts moves to the back of the line.
+            for user in list(self._queues):
+                if self._full():
+                    break
+                queue = self._queues[user]
+                delay = self._delay(queue[0], now)
+                if delay > 0:
+                    wait = delay if wait is None else min(wait, delay)
+                    continue
+                self._start(queue.popleft())
+                started = True
+                del self._queues[user]
+                if queue:
+                    self._queues[user] = queue
+            if started or not self._queues:
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=None if self._full() else wait)
+            except asyncio.TimeoutError:
+                pass
+        self._check_idle()
+
+    async def drain(self) -> None:
+        """
+        Dispatches pending and waiting events without waiting for their buckets,
+        and waits until every admitted event has finished. Used on shutdown.
+        """
+        if self.loop is None or self.loop is not asyncio.get_running_loop():
+            return
+        self._draining = True
+        for batch_key in list(self._batches):
+            self._close_batch(batch_key)
+        self._wakeup.set()
+        await self._idle.wait()
+        self._draining = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "received": self._received,
+            "admitted": self._admitted,
+            "merged": self._merged,
+            "queued_total": self._queued_total,
+            "dropped": dict(self._dropped),
+            "waiting": sum(len(queue) for queue in self._queues.values()),
+            "debouncing": len(self._batches),
+            "in_flight": self._in_flight,
+            "tracked_users": len(self._users),
+        }
+
+
+def get_admission(app) -> Optional[AdmissionController]:
+    return _controllers.get(app)
+
+
+def set_admission(app, controller: AdmissionController) -> None:
+    _controllers[app] = controller
+
+
+async def dispatch_inbound(app, ctx, event_name: str, payload, key: Hashable = None) -> None:
+    """
+    Entry point of the message, command, text trigger and media events: passes the
+    event through the Application's AdmissionController if one is configured.
+    """
+    controller = _controllers.get(app)
+    if controller is None or not controller.applies_to(event_name):
+        await dispatch_cached(app, ctx, event_name, payload, key=key)
+    else:
+        controller.submit(app, ctx, event_name, payload, key)
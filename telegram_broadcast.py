@@ -0,0 +1,193 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from telegram import InputFile
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+
+from .telegram_files import extract_file_id, release_input_file, send_media
+from .telegram_scheduler import PRIORITY_BROADCAST, TokenBucket, rate_limit_kwargs
+
+
+logger = logging.getLogger(__name__)
+
+# Sends per second of a broadcast on an Application without a SendScheduler,
+# below Telegram's limit of ~30 messages per second.
+DEFAULT_BROADCAST_RATE = 25.0
+
+
+def iter_chat_ids(chat_ids) -> Iterator:
+    """
+    Yields chat ids from an iterable, or streams them line by line from a text file
+    when `chat_ids` is a path.
+    """
+    if isinstance(chat_ids, str):
+        with open(chat_ids, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield int(line) if line.lstrip("-").isdigit() else line
+    else:
+        yield from chat_ids
+
+
+class BroadcastCheckpoint:
+    """
+    Records broadcast progress in a small JSON file: every recipient before
+    `offset` is done, plus the few indices after it that finished out of order.
+    """
+
+    def __init__(self, path: Optional[str], interval: float = 1.0):
+        self.path = path
+        self.interval = interval
+        self.offset = 0
+        self.done = set()
+        self._written_at = 0.0
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.offset = state.get("offset", 0)
+            self.done = set(state.get("done", []))
+
+    def is_done(self, index: int) -> bool:
+        return index < self.offset or index in self.done
+
+    def mark(self, index: int) -> None:
+        self.done.add(index)
+        while self.offset in self.done:
+            self.done.discard(self.offset)
+            self.offset += 1
+        if time.monotonic() - self._written_at >= self.interval:
+            self.write()
+
+    def write(self) -> None:
+        if not self.path:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"offset": self.offset, "done": sorted(self.done)}, f)
+        os.replace(tmp_path, self.path)
+        self._written_at = time.monotonic()
+
+    def remove(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+async def broadcast(
+    app,
+    chat_ids: Iterable,
+    text: Optional[str] = None,
+    media=None,
+    media_type: str = "photo",
+    caption: Optional[str] = None,
+    concurrency: int = 10,
+    checkpoint_path: Optional[str] = None,
+    results_path: Optional[str] = None,
+    max_retries: int = 3,
+) -> Dict[str, Any]:
+    """
+    Sends `text`, or `media` of `media_type` with `caption`, to every chat in `chat_ids`.
+
+    Chat ids are consumed lazily by `concurrency` workers, sends go through the
+    broadcast priority lane of the send scheduler (or, without one, are paced at
+    `DEFAULT_BROADCAST_RATE` per second), and an uploaded file is sent
+    once and then reused by its file_id. Progress is saved to `checkpoint_path`,
+    so running the same broadcast again resumes where it stopped; the checkpoint
+    is removed once the broadcast completes. Per-recipient results are appended
+    to `results_path` as JSON lines. Without a send scheduler, a send rejected with
+    a 429 is retried up to `max_retries` times; with one, the scheduler retries it.
+    """
+    if not text and media is None:
+        raise ValueError("Either text or media is required for a broadcast.")
+
+    checkpoint = BroadcastCheckpoint(checkpoint_path)
+    recipients = iter(enumerate(iter_chat_ids(chat_ids)))
+    results = open(results_path, "a", encoding="utf-8") if results_path else None
+    summary = {"sent": 0, "failed": 0, "skipped": 0, "resumed_from": checkpoint.offset}
+    send_kwargs = rate_limit_kwargs(app, PRIORITY_BROADCAST)
+    # A SendScheduler already retries after 429 responses; retrying here too would multiply the attempts.
+    attempts = 1 if send_kwargs else max_retries + 1
+    loop = asyncio.get_running_loop()
+    # Each recipient gets one message, so a global pace is enough to stay within the limits.
+    pace = None if send_kwargs else TokenBucket(DEFAULT_BROADCAST_RATE, 1.0, loop.time())
+
+    async def send_one(chat_id):
+        if pace is not None:
+            delay = pace.reserve(loop.time())
+            if delay:
+                await asyncio.sleep(delay)
+        if media is None:
+            return await app.bot.send_message(
+                chat_id=chat_id, text=text, parse_mode=ParseMode.HTML, **send_kwargs
+            )
+        return await send_media(
+            app, media_type, chat_id, content, caption=caption, parse_mode=ParseMode.HTML, **send_kwargs
+        )
+
+    async def deliver(index, chat_id) -> bool:
+        nonlocal content
+        for attempt in range(attempts):
+            try:
+                message = await send_one(chat_id)
+                break
+            except RetryAfter as e:
+                if attempt == attempts - 1:
+                    return record(index, chat_id, error=e)
+                retry_after = e.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                await asyncio.sleep(retry_after)
+            except Exception as e:
+                return record(index, chat_id, error=e)
+
+        # Upload once, then let every other recipient reuse the file_id.
+        if isinstance(content, InputFile):
+            file_id = extract_file_id(message, media_type)
+            if file_id is not None:
+                content = file_id
+        return record(index, chat_id, message=message)
+
+    def record(index, chat_id, message=None, error=None) -> bool:
+        if error is None:
+            summary["sent"] += 1
+            result = {"chat_id": chat_id, "ok": True, "message_id": message.message_id}
+        else:
+            summary["failed"] += 1
+            result = {"chat_id": chat_id, "ok": False, "error": str(error)}
+        if results is not None:
+            results.write(json.dumps(result) + "\n")
+        checkpoint.mark(index)
+        return error is None
+
+    async def worker():
+        for index, chat_id in recipients:
+            if checkpoint.is_done(index):
+                summary["skipped"] += 1
+                continue
+            await deliver(index, chat_id)
+
+    content = media
+    try:
+        # The first delivery runs alone so an upload happens only once.
+        for index, chat_id in recipients:
+            if checkpoint.is_done(index):
+                summary["skipped"] += 1
+                continue
+            if await deliver(index, chat_id) or not isinstance(content, InputFile):
+                break
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        if results is not None:
+            results.close()
+        if isinstance(media, InputFile):
+            release_input_file(media)
+        checkpoint.write()
+
+    checkpoint.remove()
+    return summary
@@ -0,0 +1,108 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from xai_components.base import InArg, OutArg, Component, xai_component
+
+from .telegram_tasks import submit_send, wait_for_send
+
+if TYPE_CHECKING:
+    from telegram import InputFile
+else:
+    # Port type name only, see telegram_media_components.
+    InputFile = object
+
+
+@xai_component(color="green")
+class TelegramBroadcast(Component):
+    """
+    Sends one message or media item to many chats, within the send rate limits.
+
+    Chat ids are read lazily, so a generator or a file with one chat id per line can
+    feed 100k recipients without loading them into memory. Media is uploaded once and
+    then sent by file_id. Broadcast sends use the lowest priority lane of the send
+    scheduler (TelegramCreateSendScheduler), so replies to users are not delayed by a
+    running broadcast. Without a send scheduler, the broadcast alone is paced at 25
+    messages per second; other sends of the bot are not counted against that pace.
+
+    With a `checkpoint_path`, progress is saved while sending; running the same
+    broadcast again after an interruption resumes where it stopped.
+
+    When run from the main graph, the broadcast completes before the next component.
+    Inside an event subgraph it runs in the background and `send_handle` resolves to the
+    summary (set `wait_for_completion` to block when subgraphs run on the worker pool).
+
+    ##### inPorts:
+    - application (object): Telegram Application object.
+    - chat_ids (any): An iterable or generator of chat ids, or the path of a text file
+      with one chat id per line.
+    - text (str): Text to send (HTML). Ignored if `input_file` is set.
+    - input_file (InputFile): Optional media to send instead of text.
+    - media_type (str): "photo", "document", "audio" or "video". Default "photo".
+    - caption (str): Optional caption for the media.
+    - concurrency (int): Number of sends in flight at once. Default 10.
+    - checkpoint_path (str): Optional file to save progress to, for resuming.
+    - results_path (str): Optional file to append per-recipient results to (JSON lines).
+    - wait_for_completion (bool): Block until the broadcast completes. Default False.
+
+    ##### outPorts:
+    - send_handle (object): A concurrent.futures.Future resolving to the summary.
+    - summary (dict): Counts of sent, failed and skipped recipients, once completed.
+    """
+    application: InArg[object]
+    chat_ids: InArg[any]
+    text: InArg[str]
+    input_file: InArg[InputFile]
+    media_type: InArg[str]
+    caption: InArg[str]
+    concurrency: InArg[int]
+    checkpoint_path: InArg[str]
+    results_path: InArg[str]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    summary: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        from .telegram_broadcast import broadcast
+
+        app = self.application.value or ctx.get("telegram_app")
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        if self.chat_ids.value is None:
+            raise ValueError("chat_ids is required.")
+
+        media_type = (self.media_type.value or "photo").lower()
+        if media_type not in ("photo", "document", "audio", "video"):
+            raise ValueError(f"Unsupported media_type: {media_type}")
+
+        coro = broadcast(
+            app,
+            self.chat_ids.value,
+            text=self.text.value,
+            media=self.input_file.value,
+            media_type=media_type,
+            caption=self.caption.value or None,
+            concurrency=self.concurrency.value or 10,
+            checkpoint_path=self.checkpoint_path.value or None,
+            results_path=self.results_path.value or None,
+        )
+
+        try:
+            asyncio.get_running_loop()
+            in_loop = True
+        except RuntimeError:
+            in_loop = False
+
+        if in_loop or app.running:
+            handle = submit_send(app, coro, "broadcast")
+            self.send_handle.value = handle
+            self.summary.value = wait_for_send(handle) if self.wait_for_completion.value else None
+        else:
+            # Standalone use from the main graph, before or without TelegramRunApp.
+            self.send_handle.value = None
+            self.summary.value = asyncio.get_event_loop().run_until_complete(_run_standalone(app, coro))
+
+
+async def _run_standalone(app, coro):
+    async with app:
+        return await coro
@@ -0,0 +1,242 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import ApplicationHandlerStop, TypeHandler
+
+from .telegram_dispatch import dispatch_event
+from .telegram_scheduler import PRIORITY_REPLY, rate_limit_kwargs
+from .telegram_tasks import submit_send
+from .telegram_text import send_text
+
+
+SCOPE_GLOBAL = "global"
+SCOPE_CHAT = "chat"
+SCOPE_USER = "user"
+_SCOPES = (SCOPE_GLOBAL, SCOPE_CHAT, SCOPE_USER)
+
+# Payload key under which the subgraph of a cached event finds its ResponseRecorder.
+RESPONSES_KEY = "_responses"
+
+# Runs before every other group, including the update recorder.
+DEDUP_GROUP = -2000
+_SEEN_KEY = "xircuits_seen_updates"
+
+_response_caches = weakref.WeakKeyDictionary()
+_deduplicators = weakref.WeakKeyDictionary()
+
+
+def normalize_text(text: Optional[str]) -> str:
+    return " ".join((text or "").split()).casefold()
+
+
+class ResponseCache:
+    """
+    Replies of an event, cached for `ttl` seconds so repeated requests are answered
+    without running the event's subgraph again.
+
+    Entries are keyed by the command (or message text) with normalized arguments:
+    whitespace collapsed and case folded, and with scope "chat" or "user" also by
+    the chat or user. At most `max_entries` are kept; the least recently used
+    entry is evicted first.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1000, scope: str = SCOPE_GLOBAL):
+        if scope not in _SCOPES:
+            raise ValueError(f"cache scope must be one of {_SCOPES}.")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.scope = scope
+        self._entries: "OrderedDict[Tuple, Tuple[float, List[Tuple[str, Optional[str]]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, payload) -> Tuple:
+        command = payload.get("command_name")
+        if command is not None:
+            key: Tuple = ("/" + command.lower(), normalize_text(payload.get("message_text")))
+        else:
+            key = ("", normalize_text(payload.get("text")))
+        if self.scope == SCOPE_CHAT:
+            key += (payload.get("chat_id"),)
+        elif self.scope == SCOPE_USER:
+            key += (payload.get("user_id"),)
+        return key
+
+    def get(self, key: Tuple) -> Optional[List[Tuple[str, Optional[str]]]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple, replies: List[Tuple[str, Optional[str]]]) -> None:
+        """Caches `replies` for `key`; the list may still grow while the request is handled."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, replies)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ResponseRecorder:
+    """
+    Collects the replies sent while handling one request. The first reply caches
+    the request's entry; later replies of the same request are appended to it.
+    """
+
+    __slots__ = ("cache", "key", "replies")
+
+    def __init__(self, cache: ResponseCache, key: Tuple):
+        self.cache = cache
+        self.key = key
+        self.replies: List[Tuple[str, Optional[str]]] = []
+
+    def add(self, text: str, parse_mode: Optional[str] = ParseMode.HTML) -> None:
+        with self.cache._lock:
+            self.replies.append((text, parse_mode))
+            first = len(self.replies) == 1
+        if first:
+            self.cache.put(self.key, self.replies)
+
+
+def record_response(payload, text: str, parse_mode: Optional[str] = ParseMode.HTML) -> None:
+    """Called by reply components: caches `text` as a reply to `payload`'s request, if its event is cached."""
+    recorder = payload.get(RESPONSES_KEY) if payload is not None else None
+    if recorder is not None:
+        recorder.add(text, parse_mode)
+
+
+def get_response_cache(app, event_name: str) -> Optional[ResponseCache]:
+    caches = _response_caches.get(app)
+    return caches.get(event_name) if caches else None
+
+
+def set_response_cache(app, event_name: str, cache: ResponseCache) -> None:
+    caches = _response_caches.get(app)
+    if caches is None:
+        caches = _response_caches[app] = {}
+    caches[event_name] = cache
+
+
+async def _send_cached(app, payload, replies) -> list:
+    messages = []
+    for text, parse_mode in replies:
+        messages += await send_text(
+            app,
+            payload.get("chat_id"),
+            text,
+            parse_mode=parse_mode,
+            reply_to_message_id=payload.get("message_id"),
+            **rate_limit_kwargs(app, PRIORITY_REPLY),
+        )
+    return messages
+
+
+async def dispatch_cached(app, ctx, event_name: str, payload, key=None, on_done=None) -> None:
+    """
+    `dispatch_event` for command and message events: answers from the event's
+    ResponseCache when it holds the request, and otherwise fires the event with
+    a recorder for the replies its subgraph sends.
+    """
+    cache = get_response_cache(app, event_name)
+    if cache is not None:
+        cache_key = cache.key(payload)
+        replies = cache.get(cache_key)
+        if replies is not None:
+            submit_send(app, _send_cached(app, payload, replies), "cached reply")
+            if on_done is not None:
+                on_done()
+            return
+        payload[RESPONSES_KEY] = ResponseRecorder(cache, cache_key)
+    await dispatch_event(app, ctx, event_name, payload, key=key, on_done=on_done)
+
+
+class UpdateDeduplicator:
+    """
+    Drops updates whose update_id was seen among the last `window` updates, e.g.
+    updates Telegram delivers again after a restart or a failed webhook response.
+
+    The window is kept in the Application's bot_data, so with a Persistence
+    (see TelegramInitApp) it survives restarts.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.window = window
+        self.dropped = 0
+        self._order: deque = deque()
+        self._seen = set()
+        self._loaded = False
+
+    def _load(self, application) -> None:
+        self._loaded = True
+        stored = application.bot_data.get(_SEEN_KEY)
+        if stored:
+            for update_id in list(stored)[-self.window:]:
+                if update_id not in self._seen:
+                    self._order.append(update_id)
+                    self._seen.add(update_id)
+        application.bot_data[_SEEN_KEY] = self._order
+
+    def seen(self, update_id: int) -> bool:
+        """Returns True if `update_id` was seen before, and remembers it otherwise."""
+        if update_id in self._seen:
+            self.dropped += 1
+            return True
+        self._order.append(update_id)
+        self._seen.add(update_id)
+        while len(self._order) > self.window:
+            self._seen.discard(self._order.popleft())
+        return False
+
+    async def _check(self, update: Update, context) -> None:
+        if not self._loaded:
+            self._load(context.application)
+        if self.seen(update.update_id):
+            raise ApplicationHandlerStop
+
+    def handler(self) -> TypeHandler:
+        return TypeHandler(Update, self._check)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"window": self.window, "tracked": len(self._order), "dropped": self.dropped}
+
+
+def enable_update_dedup(app, window: int) -> UpdateDeduplicator:
+    """Installs the Application's UpdateDeduplicator, or widens the existing one to `window`."""
+    dedup = _deduplicators.get(app)
+    if dedup is None:
+        dedup = _deduplicators[app] = UpdateDeduplicator(window)
+        app.add_handler(dedup.handler(), group=DEDUP_GROUP)
+    dedup.window = max(dedup.window, window)
+    return dedup
+
+
+def get_update_dedup(app) -> Optional[UpdateDeduplicator]:
+    return _deduplicators.get(app)
@@ -1,9 +1,19 @@
-from xai_components.base import InArg, OutArg, InCompArg, Component, xai_component, secret, SubGraphExecutor
+from xai_components.base import InArg, OutArg, InCompArg, Component, xai_component, secret
 
 import asyncio
-from telegram import Update
-from telegram.constants import ChatType, ParseMode
-from telegram.ext import CommandHandler, MessageHandler, filters, ContextTypes
+
+# python-telegram-bot (and httpx) are imported inside execute(), so that loading
+# this library to list or compile components does not pay for importing them.
+# Only modules that do not import telegram are imported here.
+from .telegram_dispatch import (
+    SubGraphWorkerPool,
+    add_post_stop_hook,
+    dispatch_event,
+    get_worker_pool,
+    set_worker_pool,
+)
+from .telegram_payloads import payload_first_name
+from .telegram_tasks import SendTaskRegistry, get_send_registry, set_send_registry, submit_send, wait_for_send
 
 
 @xai_component(color="blue")
@@ -11,28 +21,154 @@ class TelegramInitApp(Component):
     """
     Initializes a Telegram Application using python-telegram-bot.
 
+    The connection and timeout settings are optional; unset values keep the
+    python-telegram-bot defaults. Under heavy send load, raise `connection_pool_size`
+    (or `pool_timeout`) if sends fail with PoolTimeout, and set `media_pool_size`
+    so large uploads use their own connections instead of delaying text replies.
+
     ##### inPorts:
     - telegram_token (str): The Bot API token from BotFather.
+    - send_scheduler (object): Optional SendScheduler (from TelegramCreateSendScheduler)
+      that rate limits every request the bot sends.
+    - persistence (object): Optional python-telegram-bot Persistence, e.g. PicklePersistence,
+      for chat/user data (see TelegramConfigureStateStore).
+    - connection_pool_size (int): Connections for Bot API requests. Default 256.
+    - read_timeout (float): Seconds to wait for a response. Default 5.
+    - write_timeout (float): Seconds to wait while sending a request. Default 5.
+    - connect_timeout (float): Seconds to wait for a connection. Default 5.
+    - pool_timeout (float): Seconds to wait for a free pooled connection. Default 1.
+    - media_write_timeout (float): Write timeout of file uploads. Default 20.
+    - media_pool_size (int): Optional separate pool of connections for file uploads.
+    - http2 (bool): Use HTTP/2 (needs `pip install httpx[http2]`). Default False.
+    - concurrent_updates (int): Number of updates processed at the same time.
+      Default 1 (one after another).
+    - bot_api_url (str): Optional URL of a local Bot API server, e.g. "http://localhost:8081",
+      which allows files up to 2000 MB.
+    - local_mode (bool): Whether the Bot API server at `bot_api_url` runs with --local
+      on this machine, so files are read from its disk. Default True when `bot_api_url` is set.
 
     ##### outPorts:
     - application (object): The initialized Telegram Application object.
     """
     telegram_token: InCompArg[secret]
+    send_scheduler: InArg[object]
+    persistence: InArg[object]
+    connection_pool_size: InArg[int]
+    read_timeout: InArg[float]
+    write_timeout: InArg[float]
+    connect_timeout: InArg[float]
+    pool_timeout: InArg[float]
+    media_write_timeout: InArg[float]
+    media_pool_size: InArg[int]
+    http2: InArg[bool]
+    concurrent_updates: InArg[int]
+    bot_api_url: InArg[str]
+    local_mode: InArg[bool]
     application: OutArg[any]
 
     def execute(self, ctx) -> None:
         from telegram.ext import ApplicationBuilder
-        
+        from .telegram_http import build_requests
+
         token = self.telegram_token.value
         if not token:
             raise ValueError("No Telegram token provided!")
-        
-        app = ApplicationBuilder().token(token).build()
+
+        request, get_updates_request = build_requests(
+            pool_size=self.connection_pool_size.value,
+            read_timeout=self.read_timeout.value,
+            write_timeout=self.write_timeout.value,
+            connect_timeout=self.connect_timeout.value,
+            pool_timeout=self.pool_timeout.value,
+            media_write_timeout=self.media_write_timeout.value,
+            media_pool_size=self.media_pool_size.value,
+            http2=bool(self.http2.value),
+        )
+        builder = ApplicationBuilder().token(token).request(request).get_updates_request(get_updates_request)
+        if self.concurrent_updates.value and self.concurrent_updates.value > 1:
+            builder = builder.concurrent_updates(self.concurrent_updates.value)
+        if self.bot_api_url.value:
+            url = self.bot_api_url.value.rstrip("/")
+            builder = builder.base_url(f"{url}/bot").base_file_url(f"{url}/file/bot")
+            builder = builder.local_mode(self.local_mode.value is not False)
+        if self.send_scheduler.value is not None:
+            builder = builder.rate_limiter(self.send_scheduler.value)
+        if self.persistence.value is not None:
+            builder = builder.persistence(self.persistence.value)
+
+        app = builder.build()
         self.application.value = app
         
         ctx['telegram_app'] = app
 
 
+@xai_component(color="blue")
+class TelegramCreateSendScheduler(Component):
+    """
+    Creates a send scheduler that keeps every outgoing request within Telegram's limits.
+    Connect it to TelegramInitApp's `send_scheduler` port.
+
+    Requests wait on a global token bucket, a per-chat bucket and a stricter per-group
+    bucket. When the global limit is saturated, replies go first, then regular sends,
+    then broadcasts. A RetryAfter (429) pauses all sends for the requested time and
+    the request is retried automatically.
+
+    ##### inPorts:
+    - global_rate (float): Maximum requests per second across all chats. Default 30.
+    - chat_rate (float): Maximum messages per second to one private chat. Default 1.
+    - chat_burst (int): Messages a private chat may receive in a quick burst. Default 3.
+    - group_rate_per_minute (float): Maximum messages per minute to one group. Default 20.
+    - max_retries (int): Retries after a RetryAfter before giving up. Default 3.
+
+    ##### outPorts:
+    - scheduler (object): The SendScheduler.
+    """
+    global_rate: InArg[float]
+    chat_rate: InArg[float]
+    chat_burst: InArg[int]
+    group_rate_per_minute: InArg[float]
+    max_retries: InArg[int]
+
+    scheduler: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_scheduler import SendScheduler
+
+        max_retries = self.max_retries.value
+        self.scheduler.value = SendScheduler(
+            global_rate=self.global_rate.value or 30.0,
+            chat_rate=self.chat_rate.value or 1.0,
+            chat_burst=self.chat_burst.value or 3,
+            group_rate_per_minute=self.group_rate_per_minute.value or 20.0,
+            max_retries=3 if max_retries is None else max_retries,
+        )
+
+
+@xai_component(color="blue")
+class TelegramGetSendSchedulerStats(Component):
+    """
+    Returns a snapshot of the send scheduler: overall queue depth, and per priority
+    lane (reply, default, broadcast) the queued and sent requests and the average and
+    maximum wait time in seconds, plus RetryAfter counters.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - stats (dict): The scheduler statistics, or an empty dict if no scheduler is configured.
+    """
+    application: InArg[object]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        from .telegram_scheduler import SendScheduler
+
+        app = self.application.value or ctx.get('telegram_app')
+        scheduler = getattr(app.bot, "rate_limiter", None) if app else None
+        self.stats.value = scheduler.stats() if isinstance(scheduler, SendScheduler) else {}
+
+
 @xai_component(color="blue")
 class TelegramAddEchoHandler(Component):
     """
@@ -49,6 +185,8 @@ class TelegramAddEchoHandler(Component):
     application_out: OutArg[any]
 
     def execute(self, ctx) -> None:
+        from telegram import Update
+        from telegram.ext import ContextTypes, MessageHandler, filters
 
         async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE):
             """Simply echo all incoming text messages."""
@@ -69,11 +207,29 @@ class TelegramAddEchoHandler(Component):
         self.application_out.value = app
 
 
+def _prepare_run(app) -> None:
+    # Let queued subgraphs and the sends they schedule finish before shutdown.
+    async def _drain(application):
+        from .telegram_admission import get_admission
+
+        admission = get_admission(application)
+        if admission is not None:
+            await admission.drain()
+        pool = get_worker_pool(application)
+        if pool is not None:
+            await pool.drain()
+            pool.shutdown()
+        await get_send_registry(application).drain()
+
+    add_post_stop_hook(app, _drain)
+
+
 @xai_component(color="blue")
 class TelegramRunApp(Component):
     """
     Runs the Telegram Application in polling mode.
     This call is blocking until the user stops the execution.
+    On stop, queued subgraphs and pending sends are allowed to finish.
 
     ##### inPorts:
     - application (object): The Telegram Application (with any handlers attached).
@@ -84,10 +240,500 @@ class TelegramRunApp(Component):
         app = self.application.value or ctx.get('telegram_app')
         if not app:
             raise ValueError("Telegram Application not found in input or context!")
-        
+
+        _prepare_run(app)
         app.run_polling()
 
 
+@xai_component(color="blue")
+class TelegramRunWebhook(Component):
+    """
+    Runs the Telegram Application in webhook mode, serving updates from a local HTTP server.
+    This call is blocking until the user stops the execution.
+
+    Each update is acknowledged as soon as it is queued, and handlers run afterwards.
+    Several bot replicas can sit behind one ingress that forwards to their servers.
+    If `webhook_url` is empty, the webhook is not registered with Telegram, so
+    recorded Update JSON can be POSTed to http://listen:port/url_path for local testing.
+
+    ##### inPorts:
+    - application (object): The Telegram Application (with any handlers attached).
+    - webhook_url (str): Public HTTPS URL Telegram should POST to, e.g. "https://bot.example.com/telegram".
+    - listen (str): Address to listen on. Default "127.0.0.1".
+    - port (int): Port to listen on. Default 8443.
+    - url_path (str): Path the updates are POSTed to, e.g. "telegram". Default "".
+    - secret_token (str): Optional secret expected in the X-Telegram-Bot-Api-Secret-Token header.
+    - max_connections (int): Maximum simultaneous HTTPS connections. Default 40.
+    - drop_pending_updates (bool): Drop updates queued at Telegram before start. Default False.
+    """
+    application: InArg[any]
+    webhook_url: InArg[str]
+    listen: InArg[str]
+    port: InArg[int]
+    url_path: InArg[str]
+    secret_token: InArg[secret]
+    max_connections: InArg[int]
+    drop_pending_updates: InArg[bool]
+
+    def execute(self, ctx) -> None:
+        from .telegram_webhook import WebhookServer, run_webhook
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        server = WebhookServer(
+            app,
+            listen=self.listen.value or "127.0.0.1",
+            port=self.port.value or 8443,
+            url_path=self.url_path.value or "",
+            secret_token=self.secret_token.value,
+            max_connections=self.max_connections.value or 40,
+        )
+        _prepare_run(app)
+        run_webhook(
+            app,
+            server,
+            webhook_url=self.webhook_url.value,
+            drop_pending_updates=bool(self.drop_pending_updates.value),
+        )
+
+
+
+@xai_component(color="blue")
+class TelegramRunApps(Component):
+    """
+    Runs several Telegram Applications (one per bot token) together on one event loop.
+    This call is blocking until the user stops the execution.
+
+    Build each Application with its own TelegramInitApp and connect the event
+    components to the right one through their `application` port.
+
+    Without `port`, every bot polls for its updates. With `port`, one webhook server
+    serves all bots, each on the path of its bot id (the part of the token before ':'),
+    and with `webhook_url` each bot is registered at `<webhook_url>/<bot id>`.
+
+    ##### inPorts:
+    - applications (list): The Telegram Applications to run.
+    - port (int): Optional port for a shared webhook server.
+    - listen (str): Address the webhook server listens on. Default "127.0.0.1".
+    - webhook_url (str): Optional public HTTPS base URL to register the webhooks at.
+    - secret_token (str): Optional secret expected in the X-Telegram-Bot-Api-Secret-Token header.
+    - drop_pending_updates (bool): Drop updates queued at Telegram before start. Default False.
+    """
+    applications: InCompArg[list]
+    port: InArg[int]
+    listen: InArg[str]
+    webhook_url: InArg[str]
+    secret_token: InArg[secret]
+    drop_pending_updates: InArg[bool]
+
+    def execute(self, ctx) -> None:
+        from .telegram_runner import run_applications
+        from .telegram_webhook import WebhookServer
+
+        apps = list(self.applications.value or [])
+        if not apps:
+            raise ValueError("At least one Telegram Application is required.")
+
+        server = None
+        if self.port.value:
+            # The runner adds one route per bot.
+            server = WebhookServer(
+                None,
+                listen=self.listen.value or "127.0.0.1",
+                port=self.port.value,
+                secret_token=self.secret_token.value,
+            )
+        for app in apps:
+            _prepare_run(app)
+        run_applications(
+            apps,
+            server=server,
+            webhook_url=self.webhook_url.value,
+            drop_pending_updates=bool(self.drop_pending_updates.value),
+        )
+
+
+@xai_component(color="blue")
+class TelegramRunShardedWebhook(Component):
+    """
+    Runs the Telegram Application in webhook mode across several worker processes.
+    This call is blocking until the user stops the execution.
+
+    This process receives the webhook requests and forwards each update to one of
+    `workers` processes, chosen by chat id, so every chat is always handled by the same
+    worker and in order. Each worker is a fork of this process, with the handlers and
+    configuration set up before this component. Workers that crash are restarted.
+
+    Only available where processes can be forked (Linux, macOS).
+
+    ##### inPorts:
+    - application (object): The Telegram Application (with any handlers attached).
+    - workers (int): Number of worker processes. Default: the number of CPUs.
+    - webhook_url (str): Public HTTPS URL Telegram should POST to. If empty, the webhook
+      is not registered with Telegram.
+    - listen (str): Address to listen on. Default "127.0.0.1".
+    - port (int): Port to listen on. Default 8443.
+    - url_path (str): Path the updates are POSTed to. Default "".
+    - secret_token (str): Optional secret expected in the X-Telegram-Bot-Api-Secret-Token header.
+    - max_connections (int): Maximum simultaneous HTTPS connections. Default 40.
+    - drop_pending_updates (bool): Drop updates queued at Telegram before start. Default False.
+    """
+    application: InArg[any]
+    workers: InArg[int]
+    webhook_url: InArg[str]
+    listen: InArg[str]
+    port: InArg[int]
+    url_path: InArg[str]
+    secret_token: InArg[secret]
+    max_connections: InArg[int]
+    drop_pending_updates: InArg[bool]
+
+    def execute(self, ctx) -> None:
+        import os
+        from .telegram_runner import run_sharded_webhook
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        _prepare_run(app)
+        run_sharded_webhook(
+            app,
+            workers=self.workers.value or os.cpu_count() or 1,
+            webhook_url=self.webhook_url.value,
+            drop_pending_updates=bool(self.drop_pending_updates.value),
+            listen=self.listen.value or "127.0.0.1",
+            port=self.port.value or 8443,
+            url_path=self.url_path.value or "",
+            secret_token=self.secret_token.value,
+            max_connections=self.max_connections.value or 40,
+        )
+
+
+@xai_component(color="blue")
+class TelegramConfigureWorkerPool(Component):
+    """
+    Runs event subgraphs on a bounded thread pool instead of the bot's event loop,
+    so a slow subgraph (LLM call, DB query) no longer stalls every other chat.
+
+    Events from the same chat are still processed one at a time, in order.
+    When `max_queue_size` events are pending, new updates wait for a free slot.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - max_workers (int): Maximum number of subgraphs running at once. Default 8.
+    - max_queue_size (int): Maximum number of pending (queued or running) subgraphs. Default 1000.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application using the worker pool.
+    """
+    application: InArg[object]
+    max_workers: InArg[int]
+    max_queue_size: InArg[int]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        pool = SubGraphWorkerPool(
+            max_workers=self.max_workers.value or 8,
+            max_queue_size=self.max_queue_size.value or 1000,
+        )
+        set_worker_pool(app, pool)
+        self.application_out.value = app
+
+
+@xai_component(color="blue")
+class TelegramGetWorkerPoolStats(Component):
+    """
+    Returns a snapshot of the worker pool counters: submitted, completed, failed,
+    running and queued runs, backpressure waits and queue wait times (seconds).
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - stats (dict): The worker pool statistics, or an empty dict if no pool is configured.
+    """
+    application: InArg[object]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        pool = get_worker_pool(app) if app else None
+        self.stats.value = pool.stats() if pool is not None else {}
+
+
+@xai_component(color="blue")
+class TelegramConfigureFloodControl(Component):
+    """
+    Limits how many events the message, command, text trigger and media events fire,
+    so one spamming user or busy group cannot take the subgraph capacity from everyone else.
+
+    Each user and (optionally) each chat gets a token bucket, and at most `max_in_flight`
+    events run at once. An event over a limit is dropped, queued, or merged into the
+    user's waiting event, depending on `policy`. Queued events are admitted round robin
+    across users. With `debounce_seconds`, messages a user sends in quick succession are
+    merged into one event whose `text` holds them one per line (and `merged_count` their number).
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - user_rate (float): Events per second one user may fire. 0 disables. Default 1.
+    - user_burst (int): Events one user may fire in a quick burst. Default 3.
+    - chat_rate (float): Events per second one chat may fire. Default 0 (no chat limit).
+    - chat_burst (int): Events one chat may fire in a quick burst. Default 10.
+    - max_in_flight (int): Maximum events being handled at once. Default 0 (no limit).
+    - debounce_seconds (float): Merge a user's messages sent within this time of the
+      first one. Default 0 (off).
+    - policy (str): "drop", "queue" (default) or "merge".
+    - max_queue (int): Maximum events waiting per user; further events are dropped. Default 10.
+    - event_names (list): Optional event names to limit. Default all events.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application using flood control.
+    """
+    application: InArg[object]
+    user_rate: InArg[float]
+    user_burst: InArg[int]
+    chat_rate: InArg[float]
+    chat_burst: InArg[int]
+    max_in_flight: InArg[int]
+    debounce_seconds: InArg[float]
+    policy: InArg[str]
+    max_queue: InArg[int]
+    event_names: InArg[list]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_admission import AdmissionController, set_admission
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        user_rate = self.user_rate.value
+        max_queue = self.max_queue.value
+        controller = AdmissionController(
+            user_rate=1.0 if user_rate is None else user_rate,
+            user_burst=self.user_burst.value or 3,
+            chat_rate=self.chat_rate.value or 0.0,
+            chat_burst=self.chat_burst.value or 10,
+            max_in_flight=self.max_in_flight.value or 0,
+            debounce=self.debounce_seconds.value or 0.0,
+            policy=(self.policy.value or "queue").strip().lower(),
+            max_queue=10 if max_queue is None else max_queue,
+            event_names=self.event_names.value,
+        )
+        set_admission(app, controller)
+        self.application_out.value = app
+
+
+@xai_component(color="blue")
+class TelegramGetFloodControlStats(Component):
+    """
+    Returns a snapshot of the flood control counters: events received, admitted,
+    merged and dropped (by reason: rate, busy, queue_full), and the events waiting,
+    being debounced and in flight.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - stats (dict): The flood control statistics, or an empty dict if not configured.
+    """
+    application: InArg[object]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        from .telegram_admission import get_admission
+
+        app = self.application.value or ctx.get('telegram_app')
+        controller = get_admission(app) if app else None
+        self.stats.value = controller.stats() if controller is not None else {}
+
+
+@xai_component(color="blue")
+class TelegramConfigureSendTasks(Component):
+    """
+    Configures how sends scheduled by the reply and media components are tracked.
+
+    At most `max_in_flight` sends run at once; the rest wait for a slot. A failed send
+    is logged and, if `error_event_name` is set, fires that Xircuits event with a
+    payload of {"error": Exception, "description": str}.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - max_in_flight (int): Maximum number of sends running at once. Default 100.
+    - error_event_name (str): Optional event to fire when a send fails.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application using these settings.
+    """
+    application: InArg[object]
+    max_in_flight: InArg[int]
+    error_event_name: InArg[str]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        registry = SendTaskRegistry(max_in_flight=self.max_in_flight.value or 100)
+
+        error_event = (self.error_event_name.value or "").strip()
+        if error_event:
+            def _on_error(exc, description):
+                payload = {"error": exc, "description": description}
+                asyncio.get_running_loop().create_task(dispatch_event(app, ctx, error_event, payload))
+
+            registry.add_error_callback(_on_error)
+
+        set_send_registry(app, registry)
+        self.application_out.value = app
+
+
+@xai_component(color="blue")
+class TelegramGetSendTaskStats(Component):
+    """
+    Returns a snapshot of the tracked sends: submitted, succeeded, failed, in-flight
+    and pending counts, and the average and maximum send latency in seconds.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - stats (dict): The send statistics.
+    """
+    application: InArg[object]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        self.stats.value = get_send_registry(app).stats()
+
+
+@xai_component(color="blue")
+class TelegramEnableEventRouter(Component):
+    """
+    Routes all message, command and text trigger events of the Application through a
+    single handler. Place it before the event components: events registered afterwards
+    are added to the router instead of adding one handler each.
+
+    Commands are found with a dict lookup and text triggers with one combined
+    regex, so routing cost barely grows with the number of events. Without the
+    router, only the first matching handler fires and later registrations for the
+    same message never run.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - fan_out (str): "all" (default) fires every matching event; "first" fires only
+      the first match (commands, then text triggers, then message events).
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application with the router installed.
+    """
+    application: InArg[object]
+    fan_out: InArg[str]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_router import FAN_OUT_ALL, get_router
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        fan_out = (self.fan_out.value or FAN_OUT_ALL).strip().lower()
+        router = get_router(app, create=True, fan_out=fan_out)
+        if router.fan_out != fan_out:
+            raise ValueError(f"The event router is already enabled with fan_out '{router.fan_out}'.")
+        self.application_out.value = app
+
+
+@xai_component(color="green")
+class TelegramAddTextTriggerEvent(Component):
+    """
+    Fires an event for messages containing one of the given keywords or matching a
+    regular expression. Uses the event router, enabling it if needed.
+
+    The payload has the same keys as TelegramAddMessageEvent's, plus `trigger`:
+    the keyword or the text matched by the pattern.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - event_name (str): The event name to fire in Xircuits.
+    - pattern (str): Optional regular expression searched in the message text.
+    - keywords (list): Optional words or phrases, matched as whole words.
+    - case_sensitive (bool): Default False.
+
+    ##### outPorts:
+    - application_out (object): The updated Telegram Application.
+    """
+    application: InArg[object]
+    event_name: InArg[str]
+    pattern: InArg[str]
+    keywords: InArg[list]
+    case_sensitive: InArg[bool]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_router import get_router
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        event_name = (self.event_name.value or "").strip()
+        if not event_name:
+            raise ValueError("event_name is required to trigger subgraphs.")
+
+        pattern = self.pattern.value
+        keywords = self.keywords.value or []
+        if not pattern and not keywords:
+            raise ValueError("Either pattern or keywords is required.")
+
+        case_sensitive = bool(self.case_sensitive.value)
+        router = get_router(app, create=True)
+        for keyword in keywords:
+            router.add_keyword(str(keyword), event_name, ctx, case_sensitive)
+        if pattern:
+            router.add_pattern(pattern, event_name, ctx, case_sensitive)
+        self.application_out.value = app
+
+
+def _configure_cache(component, app, event_name: str) -> None:
+    """Applies the cache_* and dedup_window ports of a command or message event."""
+    from .telegram_cache import ResponseCache, enable_update_dedup, set_response_cache
+
+    if component.cache_ttl.value:
+        set_response_cache(
+            app,
+            event_name,
+            ResponseCache(
+                component.cache_ttl.value,
+                max_entries=component.cache_size.value or 1000,
+                scope=(component.cache_scope.value or "global").strip().lower(),
+            ),
+        )
+    if component.dedup_window.value:
+        enable_update_dedup(app, component.dedup_window.value)
+
+
 @xai_component(color="blue")
 class TelegramAddMessageEvent(Component):
     """
@@ -102,6 +748,9 @@ class TelegramAddMessageEvent(Component):
     You must supply `bot_username` if you enable mentions, e.g. 'MyBotUsername'.
     Leading '@' is optional.
 
+    When TelegramEnableEventRouter ran first, the event is registered on the
+    router instead of adding its own handler.
+
     #### inPorts:
     - application (object): Telegram Application (from TelegramInitApp).
     - event_name (str): Xircuits event name to fire.
@@ -109,6 +758,13 @@ class TelegramAddMessageEvent(Component):
       private chat OR the user mentions the bot. If False, handle all text messages.
     - bot_username (str): The bot's username, e.g. "MyBotUsername" (optional if
       require_bot_mention=False, required if True).
+    - cache_ttl (float): Seconds to answer the same message text (ignoring case and
+      spacing) with the replies TelegramReplyToMessageEvent sent the first time,
+      without running the subgraph. Default 0 (no cache).
+    - cache_scope (str): "global" (same reply for everyone), "chat" or "user". Default "global".
+    - cache_size (int): Maximum number of cached messages. Default 1000.
+    - dedup_window (int): Drop updates whose update_id is among the last
+      `dedup_window` updates. Applies to every handler of the Application. Default 0 (off).
 
     #### outPorts:
     - application_out (object): Updated Telegram application with the message handler.
@@ -119,10 +775,20 @@ class TelegramAddMessageEvent(Component):
     event_name: InArg[str]
     require_bot_mention: InArg[bool]
     bot_username: InArg[str]
+    cache_ttl: InArg[float]
+    cache_scope: InArg[str]
+    cache_size: InArg[int]
+    dedup_window: InArg[int]
 
     application_out: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram import Update
+        from telegram.ext import ContextTypes, MessageHandler, filters
+        from .telegram_admission import dispatch_inbound
+        from .telegram_payloads import message_payload
+        from .telegram_router import get_router
+
         app = self.application.value or ctx.get('telegram_app')
         if not app:
             raise ValueError("Telegram Application not found in input or context!")
@@ -151,21 +817,19 @@ class TelegramAddMessageEvent(Component):
             # Respond to all text in any chat
             combined_filter = filters.TEXT
 
+        _configure_cache(self, app, event_name)
+
+        router = get_router(app)
+        if router is not None:
+            router.add_message(event_name, ctx, combined_filter)
+            self.application_out.value = app
+            return
+
         async def _callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if update.message and update.message.text:
-                payload = {
-                    "update": update,
-                    "chat_id": update.effective_chat.id,
-                    "user_id": update.effective_user.id if update.effective_user else None,
-                    "message_id": update.effective_message.message_id if update.effective_message else None,
-                    "text": update.message.text,
-                    "is_command": update.message.text.startswith('/'),
-                }
+                payload = message_payload(update)
                 # Trigger the event in Xircuits
-                listeners = ctx.get('events', {}).get(event_name, [])
-                for listener in listeners:
-                    listener.payload.value = payload
-                    SubGraphExecutor(listener).do(ctx)
+                await dispatch_inbound(app, ctx, event_name, payload, key=payload["chat_id"])
 
         handler = MessageHandler(combined_filter, _callback)
         app.add_handler(handler)
@@ -175,12 +839,24 @@ class TelegramAddMessageEvent(Component):
 class TelegramAddCommandEvent(Component):
     """
     Registers a Telegram command handler that will fire an event in the Xircuits context
-    whenever the command is received.
+    whenever the command is received. When TelegramEnableEventRouter ran first,
+    the command is added to the router's command table instead.
+
+    Set `cache_ttl` to answer repeated requests (same command and arguments, ignoring
+    case and spacing) from the replies TelegramReplyToMessageEvent sent the first
+    time, without running the subgraph again until the entry expires.
 
     ##### inPorts:
     - application (object): The Telegram Application object
     - command_name (str): The command (without slash), e.g. "start"
     - event_name (str): The event name to fire in Xircuits, e.g. "my_command_event"
+    - cache_ttl (float): Seconds to reuse the replies to a request. Default 0 (no cache).
+    - cache_scope (str): "global" (same reply for everyone), "chat" or "user". Default "global".
+    - cache_size (int): Maximum number of cached requests, least recently used
+      evicted first. Default 1000.
+    - dedup_window (int): Drop updates whose update_id is among the last
+      `dedup_window` updates, e.g. updates Telegram redelivers. Applies to every
+      handler of the Application. Default 0 (off).
 
     ##### outPorts:
     - application_out (object): The updated Telegram Application
@@ -188,9 +864,19 @@ class TelegramAddCommandEvent(Component):
     application: InArg[object]
     command_name: InArg[str]
     event_name: InArg[str]
+    cache_ttl: InArg[float]
+    cache_scope: InArg[str]
+    cache_size: InArg[int]
+    dedup_window: InArg[int]
     application_out: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram import Update
+        from telegram.ext import CommandHandler, ContextTypes
+        from .telegram_admission import dispatch_inbound
+        from .telegram_payloads import command_payload
+        from .telegram_router import get_router
+
         app = self.application.value or ctx.get('telegram_app')
         if not app:
             raise ValueError("Telegram Application not found in input or context!")
@@ -201,37 +887,64 @@ class TelegramAddCommandEvent(Component):
         if not (cmd and evt):
             raise ValueError("command_name and event_name are required.")
 
+        _configure_cache(self, app, evt)
+
+        router = get_router(app)
+        if router is not None:
+            router.add_command(cmd, evt, ctx)
+            self.application_out.value = app
+            return
+
         async def command_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # This is called each time user does /<cmd>.
-            message_text = " ".join(context.args) if context.args else ""
-            chat_id = update.effective_chat.id
-            user_id = update.effective_user.id if update.effective_user else None
-            message_id = update.effective_message.message_id if update.effective_message else None
-
-            payload = {
-                "command_name": cmd,
-                "message_text": message_text,
-                "chat_id": chat_id,
-                "user_id": user_id,
-                "message_id": message_id,
-                "update": update,
-            }
-            listeners = ctx.get('events', {}).get(evt, [])
-            for listener in listeners:
-                listener.payload.value = payload
-                SubGraphExecutor(listener).do(ctx)
+            payload = command_payload(update, cmd, context.args)
+            await dispatch_inbound(app, ctx, evt, payload, key=payload["chat_id"])
 
         handler = CommandHandler(cmd, command_callback)
         app.add_handler(handler)
         self.application_out.value = app
 
+
+@xai_component(color="blue")
+class TelegramGetResponseCacheStats(Component):
+    """
+    Returns the hit, miss and eviction counts of an event's response cache, and how
+    many duplicate updates were dropped.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - event_name (str): The command or message event whose cache to inspect.
+
+    ##### outPorts:
+    - stats (dict): {"cache": {...} or None, "dedup": {...} or None}.
+    """
+    application: InArg[object]
+    event_name: InArg[str]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        from .telegram_cache import get_response_cache, get_update_dedup
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        cache = get_response_cache(app, self.event_name.value or "")
+        dedup = get_update_dedup(app)
+        self.stats.value = {
+            "cache": cache.stats() if cache else None,
+            "dedup": dedup.stats() if dedup else None,
+        }
+
+
 @xai_component
 class TelegramParseMessagePayload(Component):
     """
     Parses payloads specifically for Telegram normal messages.
 
     ##### inPorts:
-    - event_payload (dict): A dictionary containing keys like:
+    - event_payload (dict): The message payload (a MessagePayload, or a dict) with keys like:
         {
           "text": str,        # Normal message text
           "chat_id": int,     # Chat ID
@@ -262,12 +975,7 @@ class TelegramParseMessagePayload(Component):
         self.message_text.value = payload.get("text")
         self.update_obj.value = payload.get("update")
 
-        # Extract first_name if available
-        first_name = ""
-        update = payload.get("update")
-        if update and update.effective_user:
-            first_name = update.effective_user.first_name or ""
-        self.first_name.value = first_name
+        self.first_name.value = payload_first_name(payload)
 
 @xai_component
 class TelegramParseCommandPayload(Component):
@@ -275,7 +983,7 @@ class TelegramParseCommandPayload(Component):
     Parses payloads specifically for Telegram command messages.
 
     ##### inPorts:
-    - event_payload (dict): A dictionary containing keys like:
+    - event_payload (dict): The command payload (a CommandPayload, or a dict) with keys like:
         {
           "message_text": str,   # Command text including arguments
           "command_name": str,   # Command name
@@ -306,7 +1014,6 @@ class TelegramParseCommandPayload(Component):
 
     def execute(self, ctx) -> None:
         payload = self.event_payload.value or {}
-        print(payload)
         self.chat_id.value = payload.get("chat_id")
         self.user_id.value = payload.get("user_id")
         self.message_id.value = payload.get("message_id")
@@ -314,28 +1021,40 @@ class TelegramParseCommandPayload(Component):
         self.message_text.value = payload.get("message_text")
         self.update_obj.value = payload.get("update")
 
-        # Extract first_name if available
-        first_name = ""
-        update = payload.get("update")
-        if update and update.effective_user:
-            first_name = update.effective_user.first_name or ""
-        self.first_name.value = first_name
+        self.first_name.value = payload_first_name(payload)
 
 @xai_component(color="green")
 class TelegramReplyToMessageEvent(Component):
     """
     Sends a reply in a Telegram chat, quoting the original message from an event payload.
+    Text longer than 4096 characters is sent as several messages, split between
+    paragraphs or sentences without breaking HTML tags.
 
     ##### inPorts:
     - application (object): Telegram Application object
     - event_payload (dict): The payload containing info such as 'update', 'chat_id', etc.
     - reply_text (str): The text you want to send as a reply
+    - wait_for_completion (bool): Block until the reply is sent and set `message`.
+      Only possible when subgraphs run on the worker pool. Default False.
+
+    ##### outPorts:
+    - send_handle (object): A concurrent.futures.Future resolving to the (first) sent Message.
+    - message (object): The sent telegram.Message, if `wait_for_completion` is True.
     """
     application: InArg[object]
     event_payload: InArg[dict]
     reply_text: InArg[str]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    message: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_cache import record_response
+        from .telegram_scheduler import PRIORITY_REPLY, rate_limit_kwargs
+        from .telegram_text import send_text
+
         app = self.application.value or ctx.get('telegram_app')
         payload = self.event_payload.value
         reply_text = self.reply_text.value
@@ -353,12 +1072,84 @@ class TelegramReplyToMessageEvent(Component):
         message_id = update.effective_message.message_id
         
         async def _send_reply():
-            await app.bot.send_message(
-                chat_id=chat_id,
-                text=reply_text,
+            messages = await send_text(
+                app,
+                chat_id,
+                reply_text,
                 parse_mode=ParseMode.HTML,
-                reply_to_message_id=message_id  # This quotes the original
+                reply_to_message_id=message_id,  # This quotes the original
+                **rate_limit_kwargs(app, PRIORITY_REPLY),
             )
+            # Only a delivered reply may be replayed to repeated requests.
+            record_response(payload, reply_text, ParseMode.HTML)
+            return messages[0] if messages else None
+
+        handle = submit_send(app, _send_reply(), "reply")
+        self.send_handle.value = handle
+        self.message.value = wait_for_send(handle) if self.wait_for_completion.value else None
+
+
+@xai_component(color="green")
+class TelegramStreamReply(Component):
+    """
+    Replies with text that is still being generated, e.g. by an LLM, so the user sees
+    it appear progressively instead of waiting for the complete answer.
+
+    While the text is generated, "typing..." is shown in the chat. The first text is
+    sent as soon as it arrives; further chunks are combined and shown by editing the
+    message about every `edit_interval` seconds, which keeps edits within Telegram's
+    limits. Text longer than 4096 characters continues in a new message.
+
+    ##### inPorts:
+    - application (object): Telegram Application object.
+    - event_payload (dict): The payload of the message to reply to.
+    - text_chunks (any): A sync or async generator (or any iterable) of text chunks,
+      or a complete string.
+    - edit_interval (float): Minimum seconds between edits. Default 1.
+    - parse_mode (str): Optional parse mode (e.g. "HTML") applied to each message once
+      its text is complete. Text is streamed as plain text.
+    - wait_for_completion (bool): Block until the whole reply is sent and set `messages`.
+      Only possible when subgraphs run on the worker pool. Default False.
+
+    ##### outPorts:
+    - send_handle (object): A concurrent.futures.Future resolving to the list of sent Messages.
+    - messages (list): The sent telegram.Message objects, if `wait_for_completion` is True.
+    """
+    application: InArg[object]
+    event_payload: InArg[dict]
+    text_chunks: InArg[any]
+    edit_interval: InArg[float]
+    parse_mode: InArg[str]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    messages: OutArg[list]
+
+    def execute(self, ctx) -> None:
+        from .telegram_streaming import stream_reply
+
+        app = self.application.value or ctx.get('telegram_app')
+        payload = self.event_payload.value
+
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        if not payload:
+            raise ValueError("No event_payload provided, can't reply.")
+        if self.text_chunks.value is None:
+            raise ValueError("text_chunks is required.")
+
+        update = payload.get('update')
+        if not update:
+            raise ValueError("No 'update' in event_payload, cannot reply.")
 
-        loop = asyncio.get_event_loop()
-        loop.create_task(_send_reply())
+        coro = stream_reply(
+            app,
+            update.effective_chat.id,
+            self.text_chunks.value,
+            reply_to_message_id=update.effective_message.message_id,
+            parse_mode=self.parse_mode.value or None,
+            edit_interval=self.edit_interval.value or 1.0,
+        )
+        handle = submit_send(app, coro, "streaming reply")
+        self.send_handle.value = handle
+        self.messages.value = wait_for_send(handle) if self.wait_for_completion.value else None
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from collections import ChainMap
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from xai_components.base import BaseComponent, InArg, InCompArg, OutArg, SubGraphExecutor
+
+from .telegram_metrics import get_metrics, update_age
+
+
+logger = logging.getLogger(__name__)
+
+_PORT_TYPES = (InArg, InCompArg, OutArg)
+
+# Per-Application helpers, keyed weakly so a discarded Application frees them.
+_worker_pools = weakref.WeakKeyDictionary()
+# Per-listener subgraph templates, built once and instantiated on every event.
+_templates = weakref.WeakKeyDictionary()
+# Per-Application post_stop hooks: (regular hooks, close hooks).
+_stop_hooks = weakref.WeakKeyDictionary()
+
+
+class SubGraphTemplate:
+    """
+    A reusable blueprint of the subgraph starting at an event listener.
+
+    Each call to `instantiate` returns a fresh copy of the subgraph's components
+    and ports, wired to each other exactly like the original. Branch and loop
+    bodies, which the compiler wraps in a SubGraphExecutor, are copied as well.
+    Ports connected to components outside the subgraph (e.g. the Application from
+    TelegramInitApp) stay shared, and port values are never copied, so the cost is
+    one object per component and port regardless of the payload size.
+
+    A subgraph holding components somewhere they cannot be followed (e.g. in a
+    list) is not `cloneable`; run_subgraph then runs it one event at a time.
+    """
+
+    def __init__(self, root: BaseComponent):
+        self.root = root
+        self.nodes = []
+        self.cloneable = True
+        self.lock = threading.Lock()
+
+        seen = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            self.nodes.append(node)
+            for value in vars(node).values():
+                if isinstance(value, _PORT_TYPES):
+                    value = value._value
+                if _is_node(value):
+                    stack.append(value)
+                elif _holds_node(value):
+                    self.cloneable = False
+
+    def instantiate(self) -> BaseComponent:
+        clones = {id(node): node.__class__.__new__(node.__class__) for node in self.nodes}
+        ports = {}
+
+        for node in self.nodes:
+            clone = clones[id(node)]
+            for key, value in vars(node).items():
+                if isinstance(value, _PORT_TYPES):
+                    port = value.__class__(value._value, value._getter)
+                    ports[id(value)] = value = port
+                elif _is_node(value):
+                    value = clones.get(id(value), value)
+                clone.__dict__[key] = value
+
+        refs = dict(ports)
+        refs.update(clones)
+        for port in ports.values():
+            port._value = _remap_refs(port._value, refs)
+
+        return clones[id(self.root)]
+
+
+def _is_node(value) -> bool:
+    """Components and the SubGraphExecutor wrappers of branch and loop bodies."""
+    return isinstance(value, (BaseComponent, SubGraphExecutor)) and hasattr(value, "__dict__")
+
+
+def _holds_node(value) -> bool:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return any(_is_node(item) or _holds_node(item) for item in value)
+    if isinstance(value, dict):
+        return any(_is_node(item) or _holds_node(item) for item in value.values())
+    return isinstance(value, (BaseComponent, SubGraphExecutor))
+
+
+def _remap_refs(value, refs):
+    if isinstance(value, _PORT_TYPES) or _is_node(value):
+        return refs.get(id(value), value)
+    if isinstance(value, list) and any(isinstance(item, _PORT_TYPES) for item in value):
+        remapped = value.__class__.__new__(value.__class__)
+        remapped.extend(_remap_refs(item, refs) for item in value)
+        return remapped
+    if isinstance(value, tuple) and any(isinstance(item, _PORT_TYPES) for item in value):
+        return tuple.__new__(value.__class__, (_remap_refs(item, refs) for item in value))
+    return value
+
+
+def get_subgraph_template(listener: BaseComponent) -> SubGraphTemplate:
+    template = _templates.get(listener)
+    if template is None:
+        template = _templates[listener] = SubGraphTemplate(listener)
+    return template
+
+
+def run_subgraph(listener: BaseComponent, ctx, payload) -> None:
+    """
+    Runs the listener's subgraph on a private copy of its components with
+    `payload`, so concurrent events never overwrite each other's payload.
+
+    The subgraph sees a copy-on-write view of `ctx`: it reads the shared values,
+    but keys it assigns are only visible within this invocation.
+    """
+    template = get_subgraph_template(listener)
+    if not template.cloneable:
+        with template.lock:
+            listener.payload.value = payload
+            SubGraphExecutor(listener).do(ChainMap({}, ctx))
+        return
+
+    entry = template.instantiate()
+    entry.payload.value = payload
+    SubGraphExecutor(entry).do(ChainMap({}, ctx))
+
+
+class SubGraphWorkerPool:
+    """
+    Runs Xircuits subgraphs on a bounded thread pool instead of the
+    python-telegram-bot event loop.
+
+    - At most `max_workers` subgraphs run at the same time.
+    - At most `max_queue_size` runs may be pending (queued or running). When the
+      queue is full, `submit` waits for a free slot, which pushes back on the
+      update processing of the Application.
+    - Runs sharing the same key (usually the chat id) execute strictly in the
+      order they were submitted; different keys run in parallel.
+    """
+
+    def __init__(self, max_workers: int = 8, max_queue_size: int = 1000):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1.")
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1.")
+
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="xai-telegram-worker"
+        )
+        self._capacity: Optional[asyncio.Semaphore] = None
+        self._tails: Dict[Hashable, asyncio.Future] = {}
+        self._tasks = set()
+
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._running = 0
+        self._started = 0
+        self._backpressure_waits = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+
+    def _bind(self) -> None:
+        # asyncio primitives must be created on the loop that uses them.
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self._capacity = asyncio.Semaphore(self.max_queue_size)
+            self._tails = {}
+
+    async def submit(self, key: Hashable, fn: Callable[..., Any], *args) -> None:
+        """
+        Queues `fn(*args)` for execution on the pool. Returns as soon as the run
+        is queued; waits only while the queue is full.
+        """
+        self._bind()
+        if self._capacity.locked():
+            self._backpressure_waits += 1
+        await self._capacity.acquire()
+
+        self._submitted += 1
+        previous = self._tails.get(key)
+        done = self.loop.create_future()
+        self._tails[key] = done
+
+        task = self.loop.create_task(self._run(key, previous, done, fn, args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key, previous, done, fn, args) -> None:
+        queued_at = time.monotonic()
+        try:
+            if previous is not None:
+                await previous
+
+            waited = time.monotonic() - queued_at
+            self._queue_wait_total += waited
+            self._queue_wait_max = max(self._queue_wait_max, waited)
+
+            self._started += 1
+            self._running += 1
+            try:
+                await self.loop.run_in_executor(self._executor, fn, *args)
+                self._completed += 1
+            finally:
+                self._running -= 1
+        except Exception:
+            self._failed += 1
+            logger.exception("Subgraph run for %r failed.", key)
+        finally:
+            done.set_result(None)
+            if self._tails.get(key) is done:
+                del self._tails[key]
+            self._capacity.release()
+
+    async def drain(self) -> None:
+        """Waits until every queued and running subgraph has finished."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, Any]:
+        pending = self._submitted - self._completed - self._failed
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "running": self._running,
+            "queued": pending - self._running,
+            "backpressure_waits": self._backpressure_waits,
+            "queue_wait_avg": self._queue_wait_total / self._started if self._started else 0.0,
+            "queue_wait_max": self._queue_wait_max,
+        }
+
+
+def get_worker_pool(app) -> Optional[SubGraphWorkerPool]:
+    return _worker_pools.get(app)
+
+
+def set_worker_pool(app, pool: SubGraphWorkerPool) -> None:
+    previous = _worker_pools.get(app)
+    if previous is not None and previous is not pool:
+        previous.shutdown(wait=False)
+    _worker_pools[app] = pool
+
+
+def add_post_init_hook(app, hook: Callable) -> None:
+    """
+    Chains `hook(app)` after any existing `post_init` callback of the Application.
+    python-telegram-bot awaits `post_init` on the running loop before the first update.
+    """
+    previous = app.post_init
+
+    async def post_init(application):
+        if previous is not None:
+            await previous(application)
+        await hook(application)
+
+    app.post_init = post_init
+
+
+def add_post_stop_hook(app, hook: Callable, close: bool = False) -> None:
+    """
+    Runs `hook(app)` after any existing `post_stop` callback of the Application.
+    python-telegram-bot awaits `post_stop` on the running loop before shutdown.
+
+    Hooks run in the order they were added, except that `close` hooks run after
+    all others: use it for hooks that release resources (files, connections,
+    servers), so they stay usable while the Run* components drain queued subgraphs.
+    """
+    hooks = _stop_hooks.get(app)
+    if hooks is None:
+        hooks = _stop_hooks[app] = ([], [])
+        previous = app.post_stop
+
+        async def post_stop(application):
+            if previous is not None:
+                await previous(application)
+            for stop_hook in hooks[0] + hooks[1]:
+                await stop_hook(application)
+
+        app.post_stop = post_stop
+    hooks[1 if close else 0].append(hook)
+
+
+def run_coroutine(app, coro):
+    """
+    Schedules `coro` on the Application's event loop. Works both from the loop
+    itself (inline subgraphs) and from worker threads (pooled subgraphs).
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if loop is not None:
+        return loop.create_task(coro)
+
+    pool = get_worker_pool(app)
+    if pool is not None and pool.loop is not None and pool.loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coro, pool.loop)
+    return asyncio.get_event_loop().create_task(coro)
+
+
+async def dispatch_event(
+    app, ctx, event_name: str, payload, key: Hashable = None, on_done: Optional[Callable[[], None]] = None
+) -> None:
+    """
+    Fires all Xircuits listeners for `event_name` with `payload`, either inline
+    on the event loop or through the Application's worker pool if configured.
+
+    `on_done` is called once the listeners have run, possibly from a worker thread.
+    """
+    listeners = ctx.get('events', {}).get(event_name, [])
+    if not listeners:
+        if on_done is not None:
+            on_done()
+        return
+
+    metrics = get_metrics(app)
+    if metrics is None:
+        def fire():
+            for listener in listeners:
+                run_subgraph(listener, ctx, payload)
+    else:
+        age = update_age(payload.get("update")) if isinstance(payload, Mapping) else None
+        if age is not None:
+            metrics.update_age_seconds.observe(age, event_name)
+        queued_at = time.perf_counter()
+
+        def fire():
+            started = time.perf_counter()
+            metrics.queue_wait_seconds.observe(started - queued_at, event_name)
+            for listener in listeners:
+                try:
+                    run_subgraph(listener, ctx, payload)
+                except Exception:
+                    metrics.handler_errors.inc(event_name)
+                    raise
+                finally:
+                    finished = time.perf_counter()
+                    metrics.handler_seconds.observe(finished - started, event_name)
+                    started = finished
+
+    if on_done is not None:
+        run = fire
+
+        def fire():
+            try:
+                run()
+            finally:
+                on_done()
+
+    pool = get_worker_pool(app)
+    if pool is None:
+        fire()
+    else:
+        await pool.submit(key, fire)
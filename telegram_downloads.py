@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+import urllib.parse
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_KINDS = ("photo", "document", "audio", "video", "voice")
+
+# The cloud Bot API refuses to serve files larger than this through get_file.
+BOT_API_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+
+
+def pick_photo_size(photos: Sequence, min_width: Optional[int] = None, min_height: Optional[int] = None):
+    """
+    Returns the smallest PhotoSize that is at least `min_width` x `min_height`,
+    or the largest one if none is big enough or no resolution is requested.
+    """
+    if not photos:
+        return None
+    by_area = sorted(photos, key=lambda size: size.width * size.height)
+    if min_width or min_height:
+        for size in by_area:
+            if size.width >= (min_width or 0) and size.height >= (min_height or 0):
+                return size
+    return by_area[-1]
+
+
+def find_attachment(
+    message, kinds: Sequence[str] = MEDIA_KINDS, min_width: Optional[int] = None, min_height: Optional[int] = None
+) -> Optional[Tuple[str, Any]]:
+    """Returns (kind, attachment) for the first media of `kinds` carried by `message`."""
+    if message is None:
+        return None
+    for kind in kinds:
+        attachment = getattr(message, kind, None)
+        if not attachment:
+            continue
+        if kind == "photo":
+            attachment = pick_photo_size(attachment, min_width, min_height)
+        return kind, attachment
+    return None
+
+
+def _encoded_url(file_path: str) -> str:
+    parts = urllib.parse.urlsplit(file_path)
+    return urllib.parse.urlunsplit(parts._replace(path=urllib.parse.quote(parts.path)))
+
+
+def _file_name(kind: str, attachment, file_path: Optional[str]) -> str:
+    ext = os.path.splitext(file_path or "")[1] or os.path.splitext(getattr(attachment, "file_name", None) or "")[1]
+    if not ext:
+        ext = mimetypes.guess_extension(getattr(attachment, "mime_type", None) or "") or (".jpg" if kind == "photo" else "")
+    return f"{attachment.file_unique_id}{ext}"
+
+
+class MediaTooLargeError(ValueError):
+    pass
+
+
+class MediaDownloader:
+    """
+    Downloads files users send to the bot.
+
+    - Files are streamed from the Bot API in `chunk_size` chunks, straight into
+      `download_dir` (files are named by their Telegram unique id, so a file sent
+      twice is only downloaded once), or into memory when they are at most
+      `memory_limit` bytes.
+    - Files larger than `max_file_size` are rejected before and during the download.
+    - At most `max_concurrent` downloads run at once.
+    - With a local Bot API server, its file path is returned without copying.
+    """
+
+    def __init__(
+        self,
+        download_dir: Optional[str] = None,
+        max_file_size: int = BOT_API_DOWNLOAD_LIMIT,
+        max_concurrent: int = 4,
+        chunk_size: int = 64 * 1024,
+        memory_limit: int = 0,
+    ):
+        self.download_dir = download_dir or os.path.join(tempfile.gettempdir(), "xai-telegram-media")
+        self.max_file_size = max_file_size
+        self.max_concurrent = max_concurrent
+        self.chunk_size = chunk_size
+        self.memory_limit = memory_limit
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+
+        self.downloaded = 0
+        self.reused = 0
+        self.rejected = 0
+        self.bytes_downloaded = 0
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=60.0))
+            self._pending = {}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    async def download(self, app, kind: str, attachment) -> Dict[str, Any]:
+        """
+        Downloads `attachment` and returns {"file_path", "data", "file_size"}:
+        either a path on disk or, for files within `memory_limit`, the bytes.
+        """
+        size = getattr(attachment, "file_size", None)
+        if size is not None and size > self.max_file_size:
+            self.rejected += 1
+            raise MediaTooLargeError(f"File of {size} bytes exceeds the {self.max_file_size} byte limit.")
+
+        self._bind()
+        async with self._slots:
+            tg_file = await app.bot.get_file(attachment.file_id)
+            source = tg_file.file_path or ""
+            if os.path.isfile(source):
+                self.reused += 1
+                return {"file_path": source, "data": None, "file_size": os.path.getsize(source)}
+
+            in_memory = size is not None and size <= self.memory_limit
+            path = None
+            if not in_memory:
+                os.makedirs(self.download_dir, exist_ok=True)
+                path = os.path.join(self.download_dir, _file_name(kind, attachment, source))
+                if os.path.exists(path):
+                    self.reused += 1
+                    return {"file_path": path, "data": None, "file_size": os.path.getsize(path)}
+                if path in self._pending:
+                    # The same file is already being downloaded for another message.
+                    self.reused += 1
+                    return await asyncio.shield(self._pending[path])
+
+                future = self._pending[path] = self._loop.create_future()
+                try:
+                    result = await self._stream(_encoded_url(source), path)
+                except BaseException as e:
+                    future.set_exception(e)
+                    future.exception()
+                    raise
+                else:
+                    future.set_result(result)
+                    return result
+                finally:
+                    self._pending.pop(path, None)
+
+            return await self._stream(_encoded_url(source), None)
+
+    async def _stream(self, url: str, path: Optional[str]) -> Dict[str, Any]:
+        buffer = bytearray() if path is None else None
+        part_path = f"{path}.part" if path else None
+        received = 0
+        out = open(part_path, "wb") if part_path else None
+        try:
+            async with self._client.stream("GET", url) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    received += len(chunk)
+                    if received > self.max_file_size:
+                        self.rejected += 1
+                        raise MediaTooLargeError(f"File exceeds the {self.max_file_size} byte limit.")
+                    if out is not None:
+                        out.write(chunk)
+                    else:
+                        buffer += chunk
+        except BaseException:
+            if out is not None:
+                out.close()
+                os.remove(part_path)
+            raise
+
+        self.downloaded += 1
+        self.bytes_downloaded += received
+        if out is None:
+            return {"file_path": None, "data": bytes(buffer), "file_size": received}
+        out.close()
+        os.replace(part_path, path)
+        return {"file_path": path, "data": None, "file_size": received}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "downloaded": self.downloaded,
+            "reused": self.reused,
+            "rejected": self.rejected,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
@@ -0,0 +1,479 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, List, Optional, Sequence, Union
+from uuid import uuid4
+
+from telegram import InputFile, InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo
+from telegram.error import BadRequest
+
+from .telegram_text import split_caption
+
+
+logger = logging.getLogger(__name__)
+
+_caches = weakref.WeakKeyDictionary()
+
+# Bot API method used to send each kind of media, keyed by its parameter name.
+SEND_METHODS = {
+    "photo": "send_photo",
+    "document": "send_document",
+    "audio": "send_audio",
+    "video": "send_video",
+}
+
+
+INPUT_MEDIA_TYPES = {
+    "photo": InputMediaPhoto,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+    "video": InputMediaVideo,
+}
+
+# Telegram sends at most this many items in one album.
+MAX_ALBUM_SIZE = 10
+
+
+class CachedInputFile(InputFile):
+    """
+    An InputFile that remembers a content key (path + size + mtime, or a hash of
+    the bytes), so the send components can reuse the Telegram file_id of an
+    earlier upload of the same content.
+
+    `cache_key` may be a function computing the key; it is then called the first
+    time a FileIdCache asks for the key, so no hashing happens without a cache.
+    `stream_start` is where a caller's stream is rewound to after each send.
+    """
+
+    __slots__ = ("_cache_key", "stream_start")
+
+    def __init__(self, obj, cache_key: Union[str, Callable[[], str], None] = None,
+                 stream_start: Optional[int] = None, **kwargs):
+        super().__init__(obj, **kwargs)
+        self._cache_key = cache_key
+        self.stream_start = stream_start
+
+    @property
+    def cache_key(self) -> Optional[str]:
+        if callable(self._cache_key):
+            self._cache_key = self._cache_key()
+        return self._cache_key
+
+
+class LazyFile:
+    """
+    A read-only file handle that only opens `path` when the upload reads it.
+    `close` releases the descriptor; a later read (e.g. a retried upload, or another
+    send of the same InputFile) simply opens the file again.
+    """
+
+    def __init__(self, path: str):
+        self.name = path
+        self._file = None
+
+    def _handle(self):
+        if self._file is None:
+            self._file = open(self.name, "rb")
+        return self._file
+
+    def read(self, size: int = -1) -> bytes:
+        return self._handle().read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._handle().seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell() if self._file is not None else 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BufferReader:
+    """
+    A file-like view over a bytes-like object (bytearray, memoryview, mmap) that
+    hands out one chunk at a time instead of copying the whole buffer.
+    """
+
+    def __init__(self, buffer, name: Optional[str] = None):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+        if name:
+            self.name = name
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._position + size)
+        chunk = self._view[self._position:end].tobytes()
+        self._position = end
+        return chunk
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += len(self._view)
+        self._position = max(0, min(offset, len(self._view)))
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        self._position = 0
+
+
+def make_input_file(data, filename: Optional[str] = None) -> CachedInputFile:
+    """
+    Wraps `data` in a CachedInputFile without reading or copying it up front:
+
+    - a file path is opened lazily by the upload and closed again after the send,
+    - bytes are used as they are,
+    - bytearray, memoryview and mmap objects are streamed in chunks,
+    - file-like streams are passed through, left open and, if seekable, rewound
+      after the send, so the InputFile can be sent again.
+    """
+    if isinstance(data, str):
+        if not os.path.isfile(data):
+            raise ValueError(f"File not found: {data}")
+        return CachedInputFile(
+            LazyFile(data),
+            cache_key=path_cache_key(data),
+            filename=filename or os.path.basename(data),
+            read_file_handle=False,
+        )
+    if isinstance(data, bytes):
+        return CachedInputFile(data, cache_key=lambda: bytes_cache_key(data), filename=filename)
+    if isinstance(data, (bytearray, memoryview, mmap.mmap)):
+        return CachedInputFile(
+            BufferReader(data, name=filename),
+            cache_key=lambda: bytes_cache_key(data),
+            filename=filename,
+            read_file_handle=False,
+        )
+    if hasattr(data, "read"):
+        seekable = getattr(data, "seekable", None)
+        start = data.tell() if seekable is not None and seekable() else None
+        return CachedInputFile(data, filename=filename, read_file_handle=False, stream_start=start)
+    raise ValueError("Data must be a file path, bytes-like object or readable stream.")
+
+
+def release_input_file(media) -> None:
+    """
+    Called once the send of an InputFile has completed. Closes the file handle
+    the library opened for a path, and rewinds a caller's stream; the caller's
+    stream stays open, as the InputFile may be sent again.
+    """
+    content = getattr(media, "input_file_content", None)
+    try:
+        if isinstance(content, (LazyFile, BufferReader)):
+            content.close()
+        elif getattr(media, "stream_start", None) is not None:
+            content.seek(media.stream_start)
+    except Exception:
+        logger.debug("Failed to release input file.", exc_info=True)
+
+
+def path_cache_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"path:{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def bytes_cache_key(data) -> str:
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+class JSONFileIdStore:
+    """Persists file_ids in a JSON file, rewritten on every new entry."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._data = json.load(f)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._data.get(key)
+
+    def set(self, key: str, file_id: str) -> None:
+        with self._lock:
+            self._data[key] = file_id
+            self._write()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._data.pop(key, None) is not None:
+                self._write()
+
+    def _write(self) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f)
+        os.replace(tmp_path, self.path)
+
+
+class SQLiteFileIdStore:
+    """Persists file_ids in a SQLite database."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_ids (key TEXT PRIMARY KEY, file_id TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT file_id FROM file_ids WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, file_id: str) -> None:
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO file_ids (key, file_id) VALUES (?, ?)", (key, file_id))
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM file_ids WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+def open_file_id_store(path: str):
+    """Opens a JSON store for '.json' paths and a SQLite store otherwise."""
+    if path.lower().endswith(".json"):
+        return JSONFileIdStore(path)
+    return SQLiteFileIdStore(path)
+
+
+class FileIdCache:
+    """
+    Maps uploaded content to the Telegram file_id it received, so the same bytes
+    are only uploaded once per bot and media kind.
+
+    Lookups go to an in-memory LRU of `max_entries` first and then to the optional
+    persistent `store`, which is filled on every new upload.
+    """
+
+    def __init__(self, max_entries: int = 10000, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(app, kind: str, media) -> Optional[str]:
+        content_key = getattr(media, "cache_key", None)
+        if content_key is None:
+            if not isinstance(media, InputFile) or not isinstance(media.input_file_content, bytes):
+                return None
+            content_key = bytes_cache_key(media.input_file_content)
+        bot_id = app.bot.token.split(":", 1)[0]
+        return f"{bot_id}:{kind}:{content_key}"
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            file_id = self._entries.get(key)
+            if file_id is not None:
+                self._entries.move_to_end(key)
+        if file_id is None and self.store is not None:
+            file_id = self.store.get(key)
+            if file_id is not None:
+                self._remember(key, file_id)
+        if file_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return file_id
+
+    def put(self, key: str, file_id: str) -> None:
+        self._remember(key, file_id)
+        if self.store is not None:
+            self.store.set(key, file_id)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.store is not None:
+            self.store.delete(key)
+
+    def _remember(self, key: str, file_id: str) -> None:
+        with self._lock:
+            self._entries[key] = file_id
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def get_file_id_cache(app) -> Optional[FileIdCache]:
+    return _caches.get(app)
+
+
+def set_file_id_cache(app, cache: FileIdCache) -> None:
+    _caches[app] = cache
+
+
+def extract_file_id(message, kind: str) -> Optional[str]:
+    """Returns the file_id Telegram assigned to the media sent in `message`."""
+    if kind == "photo":
+        return message.photo[-1].file_id if message.photo else None
+    # Telegram may store a video as an animation or a document, depending on its content.
+    for attachment in (getattr(message, kind, None), message.animation, message.document):
+        if attachment is not None:
+            return attachment.file_id
+    return None
+
+
+async def send_media(app, kind: str, chat_id, media, **kwargs):
+    """
+    Sends `media` as `kind` ("photo", "document", "audio" or "video"), reusing a
+    cached file_id instead of uploading when the same content was sent before.
+    The file handle behind `media` is closed once the send has completed.
+    A caption longer than 1024 characters is cut at a paragraph or sentence and
+    the rest is sent as text replying to the media message.
+    """
+    caption, overflow = split_caption(kwargs.get("caption"), kwargs.get("parse_mode"))
+    if overflow:
+        kwargs["caption"] = caption
+        message = await _send_media(app, kind, chat_id, media, **kwargs)
+        await _send_overflow(app, chat_id, message, overflow, kwargs)
+        return message
+    return await _send_media(app, kind, chat_id, media, **kwargs)
+
+
+async def _send_overflow(app, chat_id, message, overflow: List[str], kwargs: dict) -> None:
+    for part in overflow:
+        await app.bot.send_message(
+            chat_id=chat_id,
+            text=part,
+            parse_mode=kwargs.get("parse_mode"),
+            reply_to_message_id=message.message_id,
+            **({"rate_limit_args": kwargs["rate_limit_args"]} if "rate_limit_args" in kwargs else {}),
+        )
+
+
+async def _send_media(app, kind: str, chat_id, media, **kwargs):
+    send = getattr(app.bot, SEND_METHODS[kind])
+    cache = get_file_id_cache(app)
+    key = cache.key(app, kind, media) if cache is not None else None
+
+    try:
+        if key is not None:
+            file_id = cache.get(key)
+            if file_id is not None:
+                try:
+                    return await send(chat_id=chat_id, **{kind: file_id}, **kwargs)
+                except BadRequest as e:
+                    if "file" not in str(e).lower():
+                        raise
+                    # The file_id is no longer valid (e.g. the file was removed), upload again.
+                    logger.info("Cached file_id for %s rejected (%s), uploading again.", key, e)
+                    cache.discard(key)
+
+        message = await send(chat_id=chat_id, **{kind: media}, **kwargs)
+        if key is not None:
+            file_id = extract_file_id(message, kind)
+            if file_id is not None:
+                cache.put(key, file_id)
+        return message
+    finally:
+        release_input_file(media)
+
+
+def guess_media_type(media, default: str = "photo") -> str:
+    """Guesses the album media type of an InputFile from its MIME type."""
+    mimetype = getattr(media, "mimetype", "") or ""
+    if not isinstance(media, InputFile) or mimetype == "application/octet-stream":
+        return default
+    for prefix, kind in (("image/", "photo"), ("video/", "video"), ("audio/", "audio")):
+        if mimetype.startswith(prefix):
+            return kind
+    return "document"
+
+
+def split_album(items: Sequence[tuple]) -> List[List[tuple]]:
+    """
+    Splits (kind, media, caption) items into albums Telegram accepts: at most 10
+    items each, photos and videos mixed freely, while documents and audio are only
+    grouped with items of their own type. Item order is preserved.
+    """
+    albums = []
+    current_group = None
+    for item in items:
+        group = "visual" if item[0] in ("photo", "video") else item[0]
+        if not albums or group != current_group or len(albums[-1]) == MAX_ALBUM_SIZE:
+            albums.append([])
+            current_group = group
+        albums[-1].append(item)
+    return albums
+
+
+async def send_album(app, chat_id, items: Sequence[tuple], parse_mode=None, reply_to_message_id=None, **kwargs):
+    """
+    Sends (kind, media, caption) items as albums through `send_media_group`,
+    one request per album of up to 10 items. Single leftover items are sent on
+    their own. Uploaded files go through the file_id cache like `send_media`.
+    Only the first album replies to `reply_to_message_id`. Captions longer than
+    1024 characters continue in text messages after their album. Returns all
+    sent Messages.
+    """
+    cache = get_file_id_cache(app)
+    messages = []
+    try:
+        for album in split_album(items):
+            if len(album) == 1:
+                kind, media, caption = album[0]
+                message = await send_media(
+                    app, kind, chat_id, media, caption=caption, parse_mode=parse_mode,
+                    reply_to_message_id=reply_to_message_id, **kwargs
+                )
+                messages.append(message)
+                reply_to_message_id = None
+                continue
+
+            keys = []
+            input_media = []
+            overflows = []
+            for kind, media, caption in album:
+                caption, overflow = split_caption(caption, parse_mode)
+                overflows.append(overflow)
+                key = cache.key(app, kind, media) if cache is not None else None
+                file_id = cache.get(key) if key is not None else None
+                if file_id is not None:
+                    media, key = file_id, None
+                elif isinstance(media, InputFile) and media.attach_name is None:
+                    media.attach_name = "attached" + uuid4().hex
+                keys.append(key)
+                input_media.append(INPUT_MEDIA_TYPES[kind](media=media, caption=caption, parse_mode=parse_mode))
+
+            sent = await app.bot.send_media_group(
+                chat_id=chat_id, media=input_media, reply_to_message_id=reply_to_message_id, **kwargs
+            )
+            reply_to_message_id = None
+            messages.extend(sent)
+
+            # Captions over the limit continue as text after the album.
+            for message, overflow in zip(sent, overflows):
+                if overflow:
+                    await _send_overflow(app, chat_id, message, overflow, dict(kwargs, parse_mode=parse_mode))
+
+            for (kind, _, _), key, message in zip(album, keys, sent):
+                if key is not None:
+                    file_id = extract_file_id(message, kind)
+                    if file_id is not None:
+                        cache.put(key, file_id)
+    finally:
+        for _, media, _ in items:
+            release_input_file(media)
+    return messages
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Optional, Tuple
+
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+
+# python-telegram-bot's own defaults, kept when a setting is not given.
+DEFAULT_POOL_SIZE = 256
+DEFAULT_READ_TIMEOUT = 5.0
+DEFAULT_WRITE_TIMEOUT = 5.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_POOL_TIMEOUT = 1.0
+DEFAULT_MEDIA_WRITE_TIMEOUT = 20.0
+
+
+def http_version(http2: bool) -> str:
+    if not http2:
+        return "1.1"
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        raise ValueError("HTTP/2 needs the h2 package: pip install 'httpx[http2]'")
+    return "2"
+
+
+class SplitRequest(BaseRequest):
+    """
+    Sends requests that upload files through their own connection pool, so a few
+    large uploads cannot take every connection and delay text replies behind them.
+    Everything else, including media sent by file_id, goes through `default`.
+    """
+
+    def __init__(self, default: BaseRequest, media: BaseRequest):
+        self.default = default
+        self.media = media
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.default.read_timeout
+
+    async def initialize(self) -> None:
+        await asyncio.gather(self.default.initialize(), self.media.initialize())
+
+    async def shutdown(self) -> None:
+        await asyncio.gather(self.default.shutdown(), self.media.shutdown())
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        read_timeout=BaseRequest.DEFAULT_NONE,
+        write_timeout=BaseRequest.DEFAULT_NONE,
+        connect_timeout=BaseRequest.DEFAULT_NONE,
+        pool_timeout=BaseRequest.DEFAULT_NONE,
+    ) -> Tuple[int, bytes]:
+        target = self.media if request_data is not None and request_data.contains_files else self.default
+        return await target.do_request(
+            url,
+            method,
+            request_data=request_data,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            connect_timeout=connect_timeout,
+            pool_timeout=pool_timeout,
+        )
+
+
+def build_requests(
+    pool_size: Optional[int] = None,
+    read_timeout: Optional[float] = None,
+    write_timeout: Optional[float] = None,
+    connect_timeout: Optional[float] = None,
+    pool_timeout: Optional[float] = None,
+    media_write_timeout: Optional[float] = None,
+    media_pool_size: Optional[int] = None,
+    http2: bool = False,
+) -> Tuple[BaseRequest, BaseRequest]:
+    """
+    Returns the (request, get_updates_request) pair for ApplicationBuilder. Unset
+    values keep python-telegram-bot's defaults. With `media_pool_size`, uploads get
+    a pool of that many connections besides the `pool_size` one.
+    """
+    version = http_version(http2)
+    timeouts = dict(
+        read_timeout=DEFAULT_READ_TIMEOUT if read_timeout is None else read_timeout,
+        write_timeout=DEFAULT_WRITE_TIMEOUT if write_timeout is None else write_timeout,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT if connect_timeout is None else connect_timeout,
+        pool_timeout=DEFAULT_POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+        media_write_timeout=DEFAULT_MEDIA_WRITE_TIMEOUT if media_write_timeout is None else media_write_timeout,
+    )
+
+    request: BaseRequest = HTTPXRequest(
+        connection_pool_size=pool_size or DEFAULT_POOL_SIZE, http_version=version, **timeouts
+    )
+    if media_pool_size:
+        media = HTTPXRequest(connection_pool_size=media_pool_size, http_version=version, **timeouts)
+        request = SplitRequest(request, media)
+
+    # getUpdates holds its single connection for the long poll; it never uploads.
+    get_updates_request = HTTPXRequest(connection_pool_size=1, http_version=version, **timeouts)
+    return request, get_updates_request
@@ -1,40 +1,87 @@
-import asyncio
 import os
-import io
-from typing import Union
-from telegram import InputFile, Update
-from telegram.constants import ChatType, ParseMode, MessageEntityType
+from typing import TYPE_CHECKING, Union
 from xai_components.base import InArg, OutArg, Component, xai_component
 
+# As in telegram_core_components, telegram and the modules using it are imported in execute().
+from .telegram_dispatch import add_post_stop_hook
+from .telegram_payloads import MediaPayload, payload_first_name
+from .telegram_tasks import submit_send, wait_for_send
+
+if TYPE_CHECKING:
+    from telegram import InputFile
+else:
+    # Only names the port type; the ports accept telegram.InputFile objects.
+    InputFile = object
+
 
 @xai_component(color="blue")
 class TelegramInputFile(Component):
     """
-    Converts a file path or binary data into a telegram.InputFile.
+    Converts a file path, binary data or a stream into a telegram.InputFile.
+
+    Nothing is read or copied up front: a file path is only opened while it is being
+    uploaded, bytearray/memoryview/mmap data is streamed in chunks, and streams are
+    passed through. Files opened from a path are closed once the send completes, so a
+    graph can prepare many attachments without holding open file descriptors. Streams
+    are left open and rewound after each send, so the InputFile can be sent again.
+    The file also remembers a content key, so a file_id cache
+    (TelegramConfigureFileIdCache) can skip uploading content that was sent before.
 
     ##### inPorts:
-    - data (Union[str, bytes]): Either a file path (str) or binary data (bytes).
+    - data (Union[str, bytes]): A file path (str), bytes-like data (bytes, bytearray,
+      memoryview, mmap) or a readable file-like stream.
+    - filename (str): Optional filename, used to guess the MIME type of data and streams.
 
     ##### outPorts:
     - input_file (InputFile): The resulting InputFile object.
     """
     data: InArg[Union[str, bytes]]
+    filename: InArg[str]
 
     input_file: OutArg[InputFile]
 
     def execute(self, ctx) -> None:
-        data = self.data.value
+        from .telegram_files import make_input_file
+
+        self.input_file.value = make_input_file(self.data.value, filename=self.filename.value)
+
+
+@xai_component(color="blue")
+class TelegramConfigureFileIdCache(Component):
+    """
+    Caches the Telegram file_id of every uploaded file, so sending the same content
+    again (e.g. a promo video to thousands of chats) only sends the file_id instead
+    of re-uploading the bytes.
 
-        # If data is a string and corresponds to an existing file path, open that file.
-        if isinstance(data, str) and os.path.exists(data):
-            file_obj = open(data, "rb")
-            self.input_file.value = InputFile(file_obj)
-        # If data is bytes, wrap it with BytesIO.
-        elif isinstance(data, bytes):
-            file_obj = io.BytesIO(data)
-            self.input_file.value = InputFile(file_obj)
-        else:
-            raise ValueError("Data must be a valid file path or binary data.")
+    Content is identified by path, size and modification time for files, and by a
+    SHA-256 hash for raw bytes. Recent entries are kept in memory; set `store_path`
+    to also persist them across restarts (SQLite, or JSON if the path ends in ".json").
+
+    ##### inPorts:
+    - application (object): Telegram Application object.
+    - max_entries (int): Maximum number of file_ids kept in memory. Default 10000.
+    - store_path (str): Optional path of the persistent store.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application using the cache.
+    """
+    application: InArg[object]
+    max_entries: InArg[int]
+    store_path: InArg[str]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_files import FileIdCache, open_file_id_store, set_file_id_cache
+
+        app = self.application.value or ctx.get("telegram_app")
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        store = open_file_id_store(self.store_path.value) if self.store_path.value else None
+        cache = FileIdCache(max_entries=self.max_entries.value or 10000, store=store)
+        set_file_id_cache(app, cache)
+        self.application_out.value = app
 
 
 @xai_component(color="green")
@@ -48,17 +95,28 @@ class TelegramSendImage(Component):
     - input_file (InputFile): Telegram InputFile object containing the image.
     - caption (str): Optional caption for the image.
     - reply_to_message_id (int): Optional message ID to reply to.
+    - wait_for_completion (bool): Block until the message is sent and set `message`.
+      Only possible when subgraphs run on the worker pool. Default False.
 
     ##### outPorts:
-    None
+    - send_handle (object): A concurrent.futures.Future resolving to the sent Message.
+    - message (object): The sent telegram.Message, if `wait_for_completion` is True.
     """
     application: InArg[object]
     chat_id: InArg[int]
     input_file: InArg[InputFile]
     caption: InArg[str]
     reply_to_message_id: InArg[int]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    message: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_files import send_media
+        from .telegram_scheduler import PRIORITY_DEFAULT, PRIORITY_REPLY, rate_limit_kwargs
+
         app = self.application.value or ctx.get("telegram_app")
         chat_id = self.chat_id.value
         input_file = self.input_file.value
@@ -68,20 +126,26 @@ class TelegramSendImage(Component):
         if not (app and chat_id and input_file):
             raise ValueError("Application, chat_id, and input_file are required.")
 
+        priority = PRIORITY_REPLY if reply_to_message_id else PRIORITY_DEFAULT
+
         async def send_image():
             try:
-                await app.bot.send_photo(
-                    chat_id=chat_id,
-                    photo=input_file,
+                return await send_media(
+                    app,
+                    "photo",
+                    chat_id,
+                    input_file,
                     caption=caption,
                     reply_to_message_id=reply_to_message_id,
                     parse_mode=ParseMode.HTML,
+                    **rate_limit_kwargs(app, priority),
                 )
             except Exception as e:
                 raise ValueError(f"Failed to send the image: {e}")
 
-        loop = asyncio.get_event_loop()
-        loop.create_task(send_image())
+        handle = submit_send(app, send_image(), "send_image")
+        self.send_handle.value = handle
+        self.message.value = wait_for_send(handle) if self.wait_for_completion.value else None
 
 
 @xai_component(color="green")
@@ -95,17 +159,28 @@ class TelegramSendPDF(Component):
     - input_file (InputFile): Telegram InputFile object containing the PDF.
     - caption (str): Optional caption for the document.
     - reply_to_message_id (int): Optional message ID to reply to.
+    - wait_for_completion (bool): Block until the message is sent and set `message`.
+      Only possible when subgraphs run on the worker pool. Default False.
 
     ##### outPorts:
-    None
+    - send_handle (object): A concurrent.futures.Future resolving to the sent Message.
+    - message (object): The sent telegram.Message, if `wait_for_completion` is True.
     """
     application: InArg[object]
     chat_id: InArg[int]
     input_file: InArg[InputFile]
     caption: InArg[str]
     reply_to_message_id: InArg[int]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    message: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_files import send_media
+        from .telegram_scheduler import PRIORITY_DEFAULT, PRIORITY_REPLY, rate_limit_kwargs
+
         app = self.application.value or ctx.get("telegram_app")
         chat_id = self.chat_id.value
         input_file = self.input_file.value
@@ -115,17 +190,23 @@ class TelegramSendPDF(Component):
         if not (app and chat_id and input_file):
             raise ValueError("Application, chat_id, and input_file are required.")
 
+        priority = PRIORITY_REPLY if reply_to_message_id else PRIORITY_DEFAULT
+
         async def send_pdf():
-            await app.bot.send_document(
-                chat_id=chat_id,
-                document=input_file,
+            return await send_media(
+                app,
+                "document",
+                chat_id,
+                input_file,
                 caption=caption,
                 reply_to_message_id=reply_to_message_id,
                 parse_mode=ParseMode.HTML,
+                **rate_limit_kwargs(app, priority),
             )
 
-        loop = asyncio.get_event_loop()
-        loop.create_task(send_pdf())
+        handle = submit_send(app, send_pdf(), "send_pdf")
+        self.send_handle.value = handle
+        self.message.value = wait_for_send(handle) if self.wait_for_completion.value else None
 
 
 @xai_component(color="green")
@@ -139,17 +220,28 @@ class TelegramSendAudio(Component):
     - input_file (InputFile): Telegram InputFile object containing the audio.
     - caption (str): Optional caption for the audio file.
     - reply_to_message_id (int): Optional message ID to reply to.
+    - wait_for_completion (bool): Block until the message is sent and set `message`.
+      Only possible when subgraphs run on the worker pool. Default False.
 
     ##### outPorts:
-    None
+    - send_handle (object): A concurrent.futures.Future resolving to the sent Message.
+    - message (object): The sent telegram.Message, if `wait_for_completion` is True.
     """
     application: InArg[object]
     chat_id: InArg[int]
     input_file: InArg[InputFile]
     caption: InArg[str]
     reply_to_message_id: InArg[int]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    message: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_files import send_media
+        from .telegram_scheduler import PRIORITY_DEFAULT, PRIORITY_REPLY, rate_limit_kwargs
+
         app = self.application.value or ctx.get("telegram_app")
         chat_id = self.chat_id.value
         input_file = self.input_file.value
@@ -159,17 +251,23 @@ class TelegramSendAudio(Component):
         if not (app and chat_id and input_file):
             raise ValueError("Application, chat_id, and input_file are required.")
 
+        priority = PRIORITY_REPLY if reply_to_message_id else PRIORITY_DEFAULT
+
         async def send_audio():
-            await app.bot.send_audio(
-                chat_id=chat_id,
-                audio=input_file,
+            return await send_media(
+                app,
+                "audio",
+                chat_id,
+                input_file,
                 caption=caption,
                 reply_to_message_id=reply_to_message_id,
                 parse_mode=ParseMode.HTML,
+                **rate_limit_kwargs(app, priority),
             )
 
-        loop = asyncio.get_event_loop()
-        loop.create_task(send_audio())
+        handle = submit_send(app, send_audio(), "send_audio")
+        self.send_handle.value = handle
+        self.message.value = wait_for_send(handle) if self.wait_for_completion.value else None
 
 
 @xai_component(color="green")
@@ -183,17 +281,28 @@ class TelegramSendVideo(Component):
     - input_file (InputFile): Telegram InputFile object containing the video.
     - caption (str): Optional caption for the video file.
     - reply_to_message_id (int): Optional message ID to reply to.
+    - wait_for_completion (bool): Block until the message is sent and set `message`.
+      Only possible when subgraphs run on the worker pool. Default False.
 
     ##### outPorts:
-    None
+    - send_handle (object): A concurrent.futures.Future resolving to the sent Message.
+    - message (object): The sent telegram.Message, if `wait_for_completion` is True.
     """
     application: InArg[object]
     chat_id: InArg[int]
     input_file: InArg[InputFile]
     caption: InArg[str]
     reply_to_message_id: InArg[int]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    message: OutArg[object]
 
     def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_files import send_media
+        from .telegram_scheduler import PRIORITY_DEFAULT, PRIORITY_REPLY, rate_limit_kwargs
+
         app = self.application.value or ctx.get("telegram_app")
         chat_id = self.chat_id.value
         input_file = self.input_file.value
@@ -203,14 +312,263 @@ class TelegramSendVideo(Component):
         if not (app and chat_id and input_file):
             raise ValueError("Application, chat_id, and input_file are required.")
 
+        priority = PRIORITY_REPLY if reply_to_message_id else PRIORITY_DEFAULT
+
         async def send_video():
-            await app.bot.send_video(
-                chat_id=chat_id,
-                video=input_file,
+            return await send_media(
+                app,
+                "video",
+                chat_id,
+                input_file,
                 caption=caption,
                 reply_to_message_id=reply_to_message_id,
                 parse_mode=ParseMode.HTML,
+                **rate_limit_kwargs(app, priority),
+            )
+
+        handle = submit_send(app, send_video(), "send_video")
+        self.send_handle.value = handle
+        self.message.value = wait_for_send(handle) if self.wait_for_completion.value else None
+
+
+@xai_component(color="green")
+class TelegramSendMediaGroup(Component):
+    """
+    Sends several photos, videos, documents or audio files as albums, with one
+    request (and one notification) per album of up to 10 items instead of one per file.
+
+    Items are split into albums automatically: photos and videos can be mixed, while
+    documents and audio files are only grouped with their own type. Item order is kept.
+
+    ##### inPorts:
+    - application (object): Telegram Application object.
+    - chat_id (int): The ID of the chat where the media will be sent.
+    - media_items (list): InputFiles, file paths or file_ids. An item may also be a dict
+      {"media": ..., "type": "photo"|"video"|"document"|"audio", "caption": str}.
+    - captions (list): Optional per-item captions, matched to `media_items` by position.
+    - media_type (str): Type of items whose type can't be inferred (file_ids). Default "photo".
+      InputFiles and paths are typed by their MIME type.
+    - reply_to_message_id (int): Optional message ID the first album replies to.
+    - wait_for_completion (bool): Block until all albums are sent and set `messages`.
+      Only possible when subgraphs run on the worker pool. Default False.
+
+    ##### outPorts:
+    - send_handle (object): A concurrent.futures.Future resolving to the sent Messages.
+    - messages (list): The sent telegram.Messages, if `wait_for_completion` is True.
+    """
+    application: InArg[object]
+    chat_id: InArg[int]
+    media_items: InArg[list]
+    captions: InArg[list]
+    media_type: InArg[str]
+    reply_to_message_id: InArg[int]
+    wait_for_completion: InArg[bool]
+
+    send_handle: OutArg[object]
+    messages: OutArg[list]
+
+    def execute(self, ctx) -> None:
+        from telegram.constants import ParseMode
+        from .telegram_files import guess_media_type, make_input_file, send_album
+        from .telegram_scheduler import PRIORITY_DEFAULT, PRIORITY_REPLY, rate_limit_kwargs
+
+        app = self.application.value or ctx.get("telegram_app")
+        chat_id = self.chat_id.value
+        media_items = self.media_items.value
+        captions = self.captions.value or []
+        default_type = (self.media_type.value or "photo").lower()
+        reply_to_message_id = self.reply_to_message_id.value
+
+        if not (app and chat_id and media_items):
+            raise ValueError("Application, chat_id, and media_items are required.")
+
+        items = []
+        for index, item in enumerate(media_items):
+            spec = item if isinstance(item, dict) else {"media": item}
+            media = spec["media"]
+            if isinstance(media, str) and os.path.isfile(media):
+                media = make_input_file(media)
+            kind = (spec.get("type") or guess_media_type(media, default_type)).lower()
+            if kind not in ("photo", "video", "document", "audio"):
+                raise ValueError(f"Unsupported media type: {kind}")
+            caption = spec.get("caption")
+            if caption is None and index < len(captions):
+                caption = captions[index]
+            items.append((kind, media, caption))
+
+        priority = PRIORITY_REPLY if reply_to_message_id else PRIORITY_DEFAULT
+
+        async def send_media_group():
+            return await send_album(
+                app,
+                chat_id,
+                items,
+                parse_mode=ParseMode.HTML,
+                reply_to_message_id=reply_to_message_id,
+                **rate_limit_kwargs(app, priority),
             )
 
-        loop = asyncio.get_event_loop()
-        loop.create_task(send_video())
+        handle = submit_send(app, send_media_group(), "send_media_group")
+        self.send_handle.value = handle
+        self.messages.value = wait_for_send(handle) if self.wait_for_completion.value else None
+
+
+def _media_filters() -> dict:
+    from telegram.ext import filters
+
+    return {
+        "photo": filters.PHOTO,
+        "document": filters.Document.ALL,
+        "audio": filters.AUDIO,
+        "video": filters.VIDEO,
+        "voice": filters.VOICE,
+    }
+
+
+@xai_component(color="green")
+class TelegramAddMediaEvent(Component):
+    """
+    Fires an event whenever a user sends a photo, document, audio file, video or voice
+    message, after downloading the file.
+
+    Files are streamed to `download_dir` in chunks, so large videos never sit in memory;
+    the payload carries the path. Files up to `memory_limit_kb` are kept in memory
+    (payload `data`) instead. Files above `max_file_size_mb` are not downloaded and
+    fire the event with `error` set. For photos, the smallest size that is at least
+    `min_photo_width` x `min_photo_height` is downloaded (the largest if unset).
+
+    Downloads run concurrently with other updates, at most `max_concurrent_downloads`
+    at a time. A file sent again is not downloaded again.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - event_name (str): The event name to fire in Xircuits.
+    - media_types (list): Media to handle, any of "photo", "document", "audio",
+      "video", "voice". Default all.
+    - download_dir (str): Directory to save files to. Default a temporary directory.
+    - max_file_size_mb (float): Largest file to download. Default 20 (the Bot API limit),
+      or 2000 with a local Bot API server.
+    - memory_limit_kb (int): Keep files up to this size in memory. Default 0 (always disk).
+    - min_photo_width (int): Optional minimum photo width.
+    - min_photo_height (int): Optional minimum photo height.
+    - max_concurrent_downloads (int): Default 4.
+
+    ##### outPorts:
+    - application_out (object): The updated Telegram Application.
+    """
+    application: InArg[object]
+    event_name: InArg[str]
+    media_types: InArg[list]
+    download_dir: InArg[str]
+    max_file_size_mb: InArg[float]
+    memory_limit_kb: InArg[int]
+    min_photo_width: InArg[int]
+    min_photo_height: InArg[int]
+    max_concurrent_downloads: InArg[int]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from telegram import Update
+        from telegram.ext import ContextTypes, MessageHandler
+        from .telegram_admission import dispatch_inbound
+        from .telegram_downloads import MEDIA_KINDS, MediaDownloader, find_attachment
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        event_name = (self.event_name.value or "").strip()
+        if not event_name:
+            raise ValueError("event_name is required to trigger subgraphs.")
+
+        media_filters = _media_filters()
+        kinds = [kind.lower() for kind in (self.media_types.value or MEDIA_KINDS)]
+        unknown = [kind for kind in kinds if kind not in media_filters]
+        if unknown:
+            raise ValueError(f"Unsupported media types: {unknown}. Use {list(MEDIA_KINDS)}.")
+
+        # A local Bot API server (TelegramInitApp bot_api_url) serves files up to 2000 MB.
+        max_file_size_mb = self.max_file_size_mb.value or (2000 if app.bot.local_mode else 20)
+        downloader = MediaDownloader(
+            download_dir=self.download_dir.value,
+            max_file_size=int(max_file_size_mb * 1024 * 1024),
+            max_concurrent=self.max_concurrent_downloads.value or 4,
+            memory_limit=(self.memory_limit_kb.value or 0) * 1024,
+        )
+        min_width = self.min_photo_width.value
+        min_height = self.min_photo_height.value
+
+        async def _callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+            found = find_attachment(update.effective_message, kinds, min_width, min_height)
+            if found is None:
+                return
+            kind, attachment = found
+            try:
+                result = await downloader.download(app, kind, attachment)
+                payload = MediaPayload(update, kind, attachment, **result)
+            except Exception as e:
+                payload = MediaPayload(update, kind, attachment, error=str(e))
+            await dispatch_inbound(app, ctx, event_name, payload, key=payload["chat_id"])
+
+        async def _close(application):
+            await downloader.close()
+
+        media_filter = media_filters[kinds[0]]
+        for kind in kinds[1:]:
+            media_filter = media_filter | media_filters[kind]
+
+        # Non-blocking, so a large download does not hold up other updates.
+        app.add_handler(MessageHandler(media_filter, _callback, block=False))
+        add_post_stop_hook(app, _close, close=True)
+        self.application_out.value = app
+
+
+@xai_component
+class TelegramParseMediaPayload(Component):
+    """
+    Parses payloads of TelegramAddMediaEvent.
+
+    ##### inPorts:
+    - event_payload (dict): The media payload.
+
+    ##### outPorts:
+    - chat_id (int): The chat ID where the media was sent.
+    - user_id (int): The user's Telegram ID.
+    - message_id (int): The message ID.
+    - media_type (str): "photo", "document", "audio", "video" or "voice".
+    - file_path (str): Path of the downloaded file (None if kept in memory or not downloaded).
+    - data (bytes): The file content, for files kept in memory.
+    - file_name (str): The original file name, if Telegram provides one.
+    - mime_type (str): The MIME type, if Telegram provides one.
+    - caption (str): The media caption.
+    - error (str): Why the file was not downloaded, if it was not.
+    - first_name (str): The first_name from update.effective_user (if available).
+    """
+    event_payload: InArg[dict]
+
+    chat_id: OutArg[int]
+    user_id: OutArg[int]
+    message_id: OutArg[int]
+    media_type: OutArg[str]
+    file_path: OutArg[str]
+    data: OutArg[bytes]
+    file_name: OutArg[str]
+    mime_type: OutArg[str]
+    caption: OutArg[str]
+    error: OutArg[str]
+    first_name: OutArg[str]
+
+    def execute(self, ctx) -> None:
+        payload = self.event_payload.value or {}
+        self.chat_id.value = payload.get("chat_id")
+        self.user_id.value = payload.get("user_id")
+        self.message_id.value = payload.get("message_id")
+        self.media_type.value = payload.get("media_type")
+        self.file_path.value = payload.get("file_path")
+        self.data.value = payload.get("data")
+        self.file_name.value = payload.get("file_name")
+        self.mime_type.value = payload.get("mime_type")
+        self.caption.value = payload.get("caption")
+        self.error.value = payload.get("error")
+        self.first_name.value = payload_first_name(payload)
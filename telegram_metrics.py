@@ -0,0 +1,266 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_metrics = weakref.WeakKeyDictionary()
+
+# Seconds; fine-grained at the low end, where handlers and sends usually land.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    """A monotonically increasing count per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return list(self._values.items())
+
+
+class Histogram:
+    """
+    Cumulative bucket counts, sum and count per label set, as Prometheus expects.
+    Observing is a bisect and three additions under a lock, cheap enough for every
+    handler run and send.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum, count.
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            return [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+
+    def quantile(self, q: float, counts: Sequence[int], count: int) -> float:
+        """Estimates the `q` quantile from bucket counts, interpolating within a bucket."""
+        if not count:
+            return 0.0
+        rank = q * count
+        seen = 0
+        lower = 0.0
+        for upper, in_bucket in zip(self.buckets, counts):
+            if seen + in_bucket >= rank and in_bucket:
+                return lower + (upper - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+            lower = upper
+        return self.buckets[-1]
+
+
+def _label_text(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """
+    The metrics of one Application.
+
+    - Histograms: handler time and queue wait per event, update age when an
+      event fires, send time per send kind and Bot API request time per method.
+    - Counters: handler errors per event, failed sends per kind and error, and
+      429 (RetryAfter) responses per method.
+    - Gauges registered with `add_gauge` are read when metrics are rendered,
+      so queue depths cost nothing between scrapes.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.started = time.time()
+        self.handler_seconds = Histogram(
+            "telegram_handler_seconds", "Time spent running event subgraphs.", ("event",), buckets)
+        self.queue_wait_seconds = Histogram(
+            "telegram_queue_wait_seconds", "Time events waited before their subgraphs started.", ("event",), buckets)
+        self.update_age_seconds = Histogram(
+            "telegram_update_age_seconds", "Age of the message behind an event when it fired.", ("event",), buckets)
+        self.send_seconds = Histogram(
+            "telegram_send_seconds", "Time from scheduling a send until it completed.", ("send",), buckets)
+        self.request_seconds = Histogram(
+            "telegram_api_request_seconds", "Bot API request time, excluding rate limiter waits.", ("method",), buckets)
+        self.handler_errors = Counter(
+            "telegram_handler_errors_total", "Event subgraph runs that raised.", ("event",))
+        self.send_errors = Counter(
+            "telegram_send_errors_total", "Sends that failed.", ("send", "error"))
+        self.retry_after = Counter(
+            "telegram_retry_after_total", "Bot API requests answered with 429 Too Many Requests.", ("method",))
+        self._metrics = [
+            self.handler_seconds, self.queue_wait_seconds, self.update_age_seconds, self.send_seconds,
+            self.request_seconds, self.handler_errors, self.send_errors, self.retry_after,
+        ]
+        self._gauges: Dict[str, Tuple[str, Callable[[], Any]]] = {}
+
+    def add_gauge(self, name: str, help_text: str, read: Callable[[], Any]) -> None:
+        """Registers a gauge read on demand; `read` returns a number or {label value: number}."""
+        self._gauges[name] = (help_text, read)
+
+    def _read_gauges(self) -> Dict[str, Any]:
+        values = {}
+        for name, (_, read) in self._gauges.items():
+            try:
+                values[name] = read()
+            except Exception:
+                logger.debug("Failed to read gauge %s.", name, exc_info=True)
+        return values
+
+    def render(self) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in metric.samples():
+                if metric.kind == "counter":
+                    lines.append(f"{metric.name}{_label_text(metric.labels, labels)} {_format(value)}")
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for upper, in_bucket in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += in_bucket
+                    le = 'le="+Inf"' if upper == float("inf") else f'le="{upper!r}"'
+                    lines.append(f"{metric.name}_bucket{_label_text(metric.labels, labels, le)} {cumulative}")
+                lines.append(f"{metric.name}_sum{_label_text(metric.labels, labels)} {_format(total)}")
+                lines.append(f"{metric.name}_count{_label_text(metric.labels, labels)} {count}")
+
+        for name, value in self._read_gauges().items():
+            lines.append(f"# HELP {name} {self._gauges[name][0]}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for label, number in value.items():
+                    lines.append(f'{name}{{name="{_escape(label)}"}} {_format(number)}')
+            else:
+                lines.append(f"{name} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        The metrics as a dict: per histogram and label, count, sum, average and
+        estimated p50 / p95 / p99; per counter and label, its value; and the gauges.
+        """
+        result: Dict[str, Any] = {"uptime": time.time() - self.started}
+        for metric in self._metrics:
+            entries = {}
+            for labels, value in metric.samples():
+                key = "/".join(str(label) for label in labels) or "all"
+                if metric.kind == "counter":
+                    entries[key] = value
+                    continue
+                counts, total, count = value
+                entries[key] = {
+                    "count": count,
+                    "sum": total,
+                    "avg": total / count if count else 0.0,
+                    "p50": metric.quantile(0.5, counts, count),
+                    "p95": metric.quantile(0.95, counts, count),
+                    "p99": metric.quantile(0.99, counts, count),
+                }
+            result[metric.name] = entries
+        result.update(self._read_gauges())
+        return result
+
+
+def get_metrics(app) -> Optional[Metrics]:
+    return _metrics.get(app)
+
+
+def set_metrics(app, metrics: Metrics) -> None:
+    _metrics[app] = metrics
+
+
+def update_age(update) -> Optional[float]:
+    """Seconds since the message (or edit) behind `update` was sent, if it has one."""
+    message = getattr(update, "effective_message", None)
+    date = getattr(message, "edit_date", None) or getattr(message, "date", None)
+    return time.time() - date.timestamp() if date is not None else None
+
+
+class MetricsServer:
+    """
+    Serves `GET /metrics` in the Prometheus text format on a local port, on the
+    Application's event loop. Meant for a scraper on the same host or network;
+    it has no authentication.
+    """
+
+    def __init__(self, metrics: Metrics, listen: str = "127.0.0.1", port: int = 9464):
+        self.metrics = metrics
+        self.listen = listen
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        logger.info("Metrics available on http://%s:%s/metrics", self.listen, self.port)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                status, body = "405 Method Not Allowed", b""
+            elif parts[1].split("?", 1)[0].rstrip("/") != "/metrics":
+                status, body = "404 Not Found", b""
+            else:
+                status, body = "200 OK", self.metrics.render().encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
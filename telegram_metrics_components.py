@@ -0,0 +1,123 @@
+import logging
+
+from xai_components.base import InArg, OutArg, Component, xai_component
+
+from .telegram_dispatch import add_post_init_hook, add_post_stop_hook, get_worker_pool
+from .telegram_metrics import DEFAULT_BUCKETS, Metrics, MetricsServer, get_metrics, set_metrics
+from .telegram_tasks import get_send_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+@xai_component(color="blue")
+class TelegramEnableMetrics(Component):
+    """
+    Records latency and error metrics for the Application:
+
+    - handler time, queue wait and update age per event,
+    - send time and failed sends per send component,
+    - Bot API request time and 429 responses per method (with TelegramCreateSendScheduler),
+    - the depth of the update queue, worker pool, send tasks and send scheduler.
+
+    Recording costs a few microseconds per event and send, so metrics can stay on in
+    production. With a `port`, they are served in the Prometheus text format at
+    `http://<listen>:<port>/metrics` while the Application runs. With sharded
+    webhook workers, only the first worker to bind the port serves it.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - port (int): Optional port for the metrics endpoint. No endpoint if empty.
+    - listen (str): Address the metrics endpoint listens on. Default "127.0.0.1".
+    - buckets (list): Optional histogram bucket bounds in seconds.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application object.
+    """
+    application: InArg[object]
+    port: InArg[int]
+    listen: InArg[str]
+    buckets: InArg[list]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_scheduler import SendScheduler
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        metrics = Metrics(buckets=self.buckets.value or DEFAULT_BUCKETS)
+        metrics.add_gauge(
+            "telegram_update_queue_size", "Updates received but not yet processed.", app.update_queue.qsize
+        )
+        metrics.add_gauge(
+            "telegram_worker_pool_runs", "Subgraph runs on the worker pool.", lambda: _pool_runs(app)
+        )
+        metrics.add_gauge(
+            "telegram_send_tasks", "Sends scheduled by the components.", lambda: _send_tasks(app)
+        )
+        scheduler = app.bot.rate_limiter
+        if isinstance(scheduler, SendScheduler):
+            scheduler.metrics = metrics
+            metrics.add_gauge(
+                "telegram_send_scheduler_queue_depth", "Requests waiting for the rate limiter.",
+                lambda: scheduler.stats()["queue_depth"],
+            )
+        set_metrics(app, metrics)
+
+        if self.port.value:
+            server = MetricsServer(metrics, listen=self.listen.value or "127.0.0.1", port=self.port.value)
+
+            async def _start(application):
+                try:
+                    await server.start()
+                except OSError as e:
+                    logger.warning("Metrics endpoint not started: %s", e)
+
+            async def _stop(application):
+                await server.stop()
+
+            add_post_init_hook(app, _start)
+            add_post_stop_hook(app, _stop, close=True)
+
+        self.application_out.value = app
+
+
+def _pool_runs(app) -> dict:
+    pool = get_worker_pool(app)
+    if pool is None:
+        return {}
+    stats = pool.stats()
+    return {"running": stats["running"], "queued": stats["queued"]}
+
+
+def _send_tasks(app) -> dict:
+    stats = get_send_registry(app).stats()
+    return {"in_flight": stats["in_flight"], "pending": stats["pending"]}
+
+
+@xai_component(color="blue")
+class TelegramGetMetricsSnapshot(Component):
+    """
+    Returns the current metrics. Histograms are summarized per event, send or method
+    as count, sum, average and estimated p50 / p95 / p99 in seconds.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - snapshot (dict): The metrics, or an empty dict if metrics are not enabled.
+    - prometheus_text (str): The metrics in the Prometheus text format.
+    """
+    application: InArg[object]
+
+    snapshot: OutArg[dict]
+    prometheus_text: OutArg[str]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        metrics = get_metrics(app) if app else None
+        self.snapshot.value = metrics.snapshot() if metrics is not None else {}
+        self.prometheus_text.value = metrics.render() if metrics is not None else ""
@@ -0,0 +1,202 @@
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class EventPayload(Mapping):
+    """
+    Base of the payloads fired by the message and command events.
+
+    Only the Update and the chat id are stored; every other field is read from
+    the Update when it is accessed. Payloads behave like the dicts earlier
+    versions fired: `payload["chat_id"]`, `payload.get("text")`, iteration over
+    the keys, `dict(payload)` and item assignment all work. The lazily computed
+    extras (first_name, username, reply_to_message_id, reply_to_user_id and
+    entities) are readable as attributes or items but are not listed in `keys()`.
+    """
+
+    __slots__ = ("update", "chat_id", "_extra")
+
+    _keys: Tuple[str, ...] = ("update", "chat_id", "user_id", "message_id")
+    _lazy = frozenset(("first_name", "username", "reply_to_message_id", "reply_to_user_id", "entities"))
+
+    def __init__(self, update):
+        self.update = update
+        self.chat_id = update.effective_chat.id if update.effective_chat else None
+        self._extra: Optional[Dict[str, Any]] = None
+
+    @property
+    def user_id(self) -> Optional[int]:
+        user = self.update.effective_user
+        return user.id if user else None
+
+    @property
+    def message_id(self) -> Optional[int]:
+        message = self.update.effective_message
+        return message.message_id if message else None
+
+    @property
+    def first_name(self) -> str:
+        user = self.update.effective_user
+        return (user.first_name or "") if user else ""
+
+    @property
+    def username(self) -> Optional[str]:
+        user = self.update.effective_user
+        return user.username if user else None
+
+    @property
+    def reply_to_message_id(self) -> Optional[int]:
+        message = self.update.effective_message
+        reply = message.reply_to_message if message else None
+        return reply.message_id if reply else None
+
+    @property
+    def reply_to_user_id(self) -> Optional[int]:
+        message = self.update.effective_message
+        reply = message.reply_to_message if message else None
+        return reply.from_user.id if reply and reply.from_user else None
+
+    @property
+    def entities(self) -> List[Tuple[str, str]]:
+        """(type, text) pairs of the message entities, e.g. ("mention", "@bot")."""
+        message = self.update.effective_message
+        if message is None:
+            return []
+        return [(entity.type, text) for entity, text in message.parse_entities().items()]
+
+    def __getitem__(self, key: str) -> Any:
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        if key in self._keys or key in self._lazy:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._keys
+        if self._extra:
+            yield from (key for key in self._extra if key not in self._keys)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict[str, Any]:
+        return dict(self)
+
+    def __repr__(self) -> str:
+        # Deliberately leaves out the Update, whose repr is large.
+        return f"{type(self).__name__}(chat_id={self.chat_id!r}, message_id={self.message_id!r})"
+
+
+class MessagePayload(EventPayload):
+    """Payload of a text message event."""
+
+    __slots__ = ()
+
+    _keys = ("update", "chat_id", "user_id", "message_id", "text", "is_command")
+
+    @property
+    def text(self) -> Optional[str]:
+        message = self.update.message
+        return message.text if message else None
+
+    @property
+    def is_command(self) -> bool:
+        text = self.text
+        return bool(text) and text.startswith('/')
+
+
+class CommandPayload(EventPayload):
+    """Payload of a /command event; `args` holds the words after the command."""
+
+    __slots__ = ("command_name", "args")
+
+    _keys = ("command_name", "message_text", "chat_id", "user_id", "message_id", "update")
+
+    def __init__(self, update, command_name: str, args):
+        super().__init__(update)
+        self.command_name = command_name
+        self.args = args or []
+
+    @property
+    def message_text(self) -> str:
+        return " ".join(self.args)
+
+    def __repr__(self) -> str:
+        return f"CommandPayload(command_name={self.command_name!r}, chat_id={self.chat_id!r})"
+
+
+class MediaPayload(EventPayload):
+    """
+    Payload of a media event. The file itself is referenced by `file_path`
+    (or held in `data` for small in-memory downloads); `error` is set instead
+    when the download was refused or failed.
+    """
+
+    __slots__ = ("media_type", "attachment", "file_path", "data", "file_size", "error")
+
+    _keys = (
+        "update", "chat_id", "user_id", "message_id", "media_type", "file_id", "file_path",
+        "data", "file_size", "file_name", "mime_type", "caption", "width", "height", "error",
+    )
+
+    def __init__(self, update, media_type: str, attachment, file_path=None, data=None, file_size=None, error=None):
+        super().__init__(update)
+        self.media_type = media_type
+        self.attachment = attachment
+        self.file_path = file_path
+        self.data = data
+        self.file_size = file_size if file_size is not None else getattr(attachment, "file_size", None)
+        self.error = error
+
+    @property
+    def file_id(self) -> str:
+        return self.attachment.file_id
+
+    @property
+    def file_name(self) -> Optional[str]:
+        return getattr(self.attachment, "file_name", None)
+
+    @property
+    def mime_type(self) -> Optional[str]:
+        return getattr(self.attachment, "mime_type", None)
+
+    @property
+    def width(self) -> Optional[int]:
+        return getattr(self.attachment, "width", None)
+
+    @property
+    def height(self) -> Optional[int]:
+        return getattr(self.attachment, "height", None)
+
+    @property
+    def caption(self) -> Optional[str]:
+        message = self.update.effective_message
+        return message.caption if message else None
+
+    def __repr__(self) -> str:
+        return f"MediaPayload(media_type={self.media_type!r}, file_path={self.file_path!r}, chat_id={self.chat_id!r})"
+
+
+def payload_first_name(payload) -> str:
+    """Returns the sender's first name from a payload object or a plain payload dict."""
+    if isinstance(payload, EventPayload):
+        return payload.first_name
+    update = payload.get("update")
+    if update and update.effective_user:
+        return update.effective_user.first_name or ""
+    return ""
+
+
+def message_payload(update) -> MessagePayload:
+    """Builds the event payload for a text message update."""
+    return MessagePayload(update)
+
+
+def command_payload(update, command_name: str, args) -> CommandPayload:
+    """Builds the event payload for a /command update with its arguments."""
+    return CommandPayload(update, command_name, args)
@@ -0,0 +1,162 @@
+import asyncio
+import gzip
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import TypeHandler
+
+from .telegram_runner import _start_app, _stop_app
+
+
+logger = logging.getLogger(__name__)
+
+# Runs before the handlers of every other group, so each update is recorded once.
+RECORD_GROUP = -1000
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_recording(path: str, mode: str = "r"):
+    """
+    Opens a recording as text. Files ending in ".gz" are written gzip-compressed;
+    when reading, compression is detected from the content.
+    """
+    if mode == "a":
+        if path.endswith(".gz"):
+            return gzip.open(path, "at", encoding="utf-8", compresslevel=5)
+        return open(path, "a", encoding="utf-8")
+    with open(path, "rb") as probe:
+        compressed = probe.read(2) == _GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+class UpdateRecorder:
+    """
+    Appends every Update an Application receives to a newline-delimited JSON file,
+    one `{"t": <unix time>, "update": <Update JSON>}` object per line.
+
+    Lines are buffered and flushed every `flush_interval` seconds and when the
+    recorder is closed, so recording costs one JSON encoding per update. A file
+    ending in ".gz" is gzip-compressed; each run appends a new gzip member, which
+    readers see as one continuous stream.
+    """
+
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self._file = open_recording(path, "a")
+        self._next_flush = time.monotonic() + flush_interval
+
+    def record(self, update: Update) -> None:
+        if self._file is None:
+            return
+        line = json.dumps({"t": round(time.time(), 3), "update": update.to_dict()}, separators=(",", ":"))
+        self._file.write(line + "\n")
+        self.recorded += 1
+        now = time.monotonic()
+        if now >= self._next_flush:
+            self._file.flush()
+            self._next_flush = now + self.flush_interval
+
+    async def _handle(self, update, context) -> None:
+        self.record(update)
+
+    def handler(self) -> TypeHandler:
+        return TypeHandler(Update, self._handle)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_recording(path: str) -> Iterator[Tuple[float, Dict[str, Any]]]:
+    """Yields (unix time, Update JSON) pairs from a recording, skipping a truncated last line."""
+    with open_recording(path) as recording:
+        for number, line in enumerate(recording, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable line %d of %s.", number, path)
+                continue
+            yield record["t"], record["update"]
+
+
+async def replay_updates(
+    app,
+    path: str,
+    speed: float = 1.0,
+    limit: Optional[int] = None,
+    max_pending: int = 1000,
+) -> Dict[str, Any]:
+    """
+    Feeds a recording into the update queue of a started Application.
+
+    With `speed` 1 updates arrive with their recorded spacing, with 10 ten times
+    as fast, and with 0 as fast as the Application takes them (at most
+    `max_pending` queued at once). Returns the number of updates replayed, the
+    elapsed time, and how far the replay fell behind the recorded timing.
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    first = None
+    replayed = 0
+    max_lag = 0.0
+
+    for recorded_at, data in read_recording(path):
+        if limit is not None and replayed >= limit:
+            break
+        if speed > 0:
+            if first is None:
+                first = recorded_at
+            due = started + (recorded_at - first) / speed
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+        while app.update_queue.qsize() >= max_pending:
+            await asyncio.sleep(0.001)
+        await app.update_queue.put(Update.de_json(data, app.bot))
+        replayed += 1
+
+    while not app.update_queue.empty():
+        await asyncio.sleep(0.01)
+    return {"replayed": replayed, "elapsed": loop.time() - started, "max_lag": max_lag}
+
+
+def run_replay(app, path: str, speed: float = 1.0, limit: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Runs the Application on a recording instead of polling, with the usual
+    lifecycle (post_init, post_stop, post_shutdown), and returns replay statistics
+    once every update has been handled.
+    """
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = None
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+    async def _run():
+        await _start_app(app, polling=False, drop_pending_updates=False)
+        try:
+            stats = await replay_updates(app, path, speed=speed, limit=limit)
+        finally:
+            await _stop_app(app)
+        # Stopping waits for running handlers and drains the worker pool and pending sends.
+        stats["elapsed"] = loop.time() - started
+        stats["updates_per_s"] = stats["replayed"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        return stats
+
+    started = loop.time()
+    return loop.run_until_complete(_run())
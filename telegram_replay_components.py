@@ -0,0 +1,93 @@
+from xai_components.base import InArg, OutArg, Component, xai_component
+
+from .telegram_core_components import _prepare_run
+from .telegram_dispatch import add_post_stop_hook
+
+
+@xai_component(color="blue")
+class TelegramRecordUpdates(Component):
+    """
+    Records every update the Application receives to a file, for replaying later with
+    TelegramReplayUpdates (e.g. to reproduce production traffic while profiling).
+
+    Updates are appended as newline-delimited JSON with their arrival time. A path
+    ending in ".gz" is gzip-compressed. Recording does not change how updates are handled.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object (from TelegramInitApp).
+    - path (str): The file to append the updates to, e.g. "updates.ndjson.gz".
+    - flush_interval (float): Seconds between writes to disk. Default 5.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application object.
+    """
+    application: InArg[object]
+    path: InArg[str]
+    flush_interval: InArg[float]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        from .telegram_replay import RECORD_GROUP, UpdateRecorder
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        if not self.path.value:
+            raise ValueError("path is required.")
+
+        recorder = UpdateRecorder(self.path.value, flush_interval=self.flush_interval.value or 5.0)
+        app.add_handler(recorder.handler(), group=RECORD_GROUP)
+
+        async def _close(application):
+            recorder.close()
+
+        add_post_stop_hook(app, _close, close=True)
+        self.application_out.value = app
+
+
+@xai_component(color="blue")
+class TelegramReplayUpdates(Component):
+    """
+    Runs the Application on updates recorded with TelegramRecordUpdates instead of
+    polling Telegram, through the same handlers and event subgraphs. Use it in place
+    of TelegramRunApp; it returns once every replayed update has been handled.
+
+    Replies are sent to the Bot API the Application is configured with, so replay
+    with a test bot or a local stand-in API (see benchmarks/fake_bot_api.py).
+
+    ##### inPorts:
+    - application (object): The Telegram Application (with any handlers attached).
+    - path (str): The recording to replay (plain or gzip-compressed).
+    - speed (float): 1 replays with the recorded timing, 10 ten times as fast,
+      0 as fast as possible. Default 1.
+    - limit (int): Optional maximum number of updates to replay.
+
+    ##### outPorts:
+    - stats (dict): Updates replayed, elapsed seconds, updates per second and the
+      largest delay behind the recorded timing.
+    """
+    application: InArg[object]
+    path: InArg[str]
+    speed: InArg[float]
+    limit: InArg[int]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        from .telegram_replay import run_replay
+
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        if not self.path.value:
+            raise ValueError("path is required.")
+
+        speed = self.speed.value
+        _prepare_run(app)
+        self.stats.value = run_replay(
+            app,
+            self.path.value,
+            speed=1.0 if speed is None else speed,
+            limit=self.limit.value,
+        )
@@ -0,0 +1,234 @@
+import re
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from telegram import MessageEntity, Update
+from telegram.ext import BaseHandler
+
+from .telegram_admission import dispatch_inbound
+from .telegram_payloads import command_payload, message_payload
+
+
+FAN_OUT_ALL = "all"
+FAN_OUT_FIRST = "first"
+
+_COMMAND_NAME = re.compile(r"^[\da-z_]{1,32}$")
+_WORD = re.compile(r"\w+")
+
+_routers = weakref.WeakKeyDictionary()
+
+
+class EventRouter:
+    """
+    Routes every incoming message of an Application to its Xircuits events
+    through a single handler, instead of one PTB handler per event.
+
+    - Commands are looked up by name in a dict.
+    - Single-word keywords are looked up per word of the message in a dict.
+    - Regex patterns (and multi-word keywords) without capture groups are joined
+      into one combined regex; only messages it matches are tested against the
+      individual patterns. Patterns with groups are tested on every message.
+    - Message events (TelegramAddMessageEvent) keep their mention/private-chat filter.
+
+    With fan_out "all", every matching event fires. With fan_out "first", only
+    the first match fires, in the order: commands, text triggers (keywords and
+    patterns), message events, each in registration order. Either way an event fires
+    at most once per message, even if several of its commands, keywords or patterns
+    match. A message carrying a registered command is never delivered to message
+    events; an unknown command is.
+    """
+
+    def __init__(self, fan_out: str = FAN_OUT_ALL):
+        if fan_out not in (FAN_OUT_ALL, FAN_OUT_FIRST):
+            raise ValueError(f"fan_out must be '{FAN_OUT_ALL}' or '{FAN_OUT_FIRST}'.")
+        self.fan_out = fan_out
+
+        self._sequence = 0
+        self._commands: Dict[str, List[Tuple[int, str, Any]]] = {}
+        self._keywords: Dict[str, List[Tuple[int, str, Any, str]]] = {}
+        self._keywords_folded: Dict[str, List[Tuple[int, str, Any, str]]] = {}
+        self._patterns: List[Tuple[int, str, Any, "re.Pattern"]] = []
+        self._messages: List[Tuple[int, str, Any, Any]] = []
+        self._combined: Optional["re.Pattern"] = None
+        self._separate: List[Tuple[int, str, Any, "re.Pattern"]] = []
+        self._combined_dirty = False
+
+    def _next(self) -> int:
+        self._sequence += 1
+        return self._sequence
+
+    def add_command(self, command: str, event_name: str, ctx) -> None:
+        command = command.strip().lstrip("/").lower()
+        if not _COMMAND_NAME.match(command):
+            raise ValueError(f"Command `{command}` is not a valid bot command.")
+        self._commands.setdefault(command, []).append((self._next(), event_name, ctx))
+
+    def add_message(self, event_name: str, ctx, message_filter) -> None:
+        self._messages.append((self._next(), event_name, ctx, message_filter))
+
+    def add_keyword(self, keyword: str, event_name: str, ctx, case_sensitive: bool = False) -> None:
+        keyword = keyword.strip()
+        if not keyword:
+            return
+        if _WORD.fullmatch(keyword):
+            table = self._keywords if case_sensitive else self._keywords_folded
+            key = keyword if case_sensitive else keyword.casefold()
+            table.setdefault(key, []).append((self._next(), event_name, ctx, keyword))
+        else:
+            phrase = r"\s+".join(re.escape(part) for part in keyword.split())
+            self.add_pattern(r"(?<!\w)" + phrase + r"(?!\w)", event_name, ctx, case_sensitive)
+
+    def add_pattern(self, pattern: str, event_name: str, ctx, case_sensitive: bool = False) -> None:
+        flags = 0 if case_sensitive else re.IGNORECASE
+        try:
+            compiled = re.compile(pattern, flags)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern `{pattern}`: {e}")
+        self._patterns.append((self._next(), event_name, ctx, compiled))
+        self._combined_dirty = True
+
+    def _combined_pattern(self) -> Optional["re.Pattern"]:
+        if self._combined_dirty:
+            self._combined_dirty = False
+            parts = []
+            # Joining renumbers capture groups, which breaks backreferences, so
+            # patterns with groups are kept out and always tested one by one.
+            self._separate = [route for route in self._patterns if route[3].groups]
+            for _, _, _, compiled in self._patterns:
+                if compiled.groups:
+                    continue
+                flag = "" if compiled.flags & re.IGNORECASE == 0 else "i"
+                parts.append(f"(?{flag}:{compiled.pattern})" if flag else f"(?:{compiled.pattern})")
+            try:
+                self._combined = re.compile("|".join(parts)) if parts else None
+            except re.error:
+                # Patterns with global inline flags cannot be joined; they are
+                # then all tested one by one.
+                self._combined = None
+                self._separate = list(self._patterns)
+        return self._combined
+
+    @staticmethod
+    def _parse_command(update: Update, bot_username: Optional[str]) -> Optional[Tuple[str, List[str]]]:
+        message = update.effective_message
+        if message is None or not message.text or not message.entities:
+            return None
+        entity = message.entities[0]
+        if entity.type != MessageEntity.BOT_COMMAND or entity.offset != 0:
+            return None
+
+        command, _, mention = message.text[1:entity.length].partition("@")
+        if mention and bot_username and mention.lower() != bot_username.lower():
+            return None
+        return command.lower(), message.text.split()[1:]
+
+    def route(self, update: Update, bot_username: Optional[str] = None) -> List[Tuple[str, Any, dict]]:
+        """Returns the (event_name, ctx, payload) triples to fire for `update`."""
+        first = self.fan_out == FAN_OUT_FIRST
+        matches = []
+        # An event registered for several commands, keywords or patterns fires once per update.
+        fired = set()
+
+        parsed = self._parse_command(update, bot_username) if self._commands else None
+        if parsed is not None:
+            command, args = parsed
+            routes = self._commands.get(command)
+            if routes:
+                # One payload per event: subgraphs may modify theirs, e.g. when admission merges events.
+                for _, event_name, ctx in routes[:1] if first else routes:
+                    if event_name not in fired:
+                        fired.add(event_name)
+                        matches.append((event_name, ctx, command_payload(update, command, args)))
+                return matches
+
+        message = update.message
+        if message is None or not message.text:
+            return matches
+        text = message.text
+        triggered = []
+
+        if self._keywords or self._keywords_folded:
+            seen = set()
+            for word in _WORD.findall(text):
+                if word in seen:
+                    continue
+                seen.add(word)
+                for route in self._keywords.get(word, ()):
+                    triggered.append(route)
+                for route in self._keywords_folded.get(word.casefold(), ()):
+                    triggered.append(route)
+
+        if self._patterns:
+            combined = self._combined_pattern()
+            candidates = self._patterns if combined is not None and combined.search(text) else self._separate
+            for seq, event_name, ctx, compiled in candidates:
+                match = compiled.search(text)
+                if match:
+                    triggered.append((seq, event_name, ctx, match.group(0)))
+
+        if triggered:
+            triggered.sort(key=lambda route: route[0])
+            for _, event_name, ctx, trigger in triggered[:1] if first else triggered:
+                if event_name in fired:
+                    continue
+                fired.add(event_name)
+                payload = message_payload(update)
+                payload["trigger"] = trigger
+                matches.append((event_name, ctx, payload))
+            if first:
+                return matches
+
+        for _, event_name, ctx, message_filter in self._messages:
+            if event_name not in fired and message_filter.check_update(update):
+                fired.add(event_name)
+                matches.append((event_name, ctx, message_payload(update)))
+                if first:
+                    break
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "fan_out": self.fan_out,
+            "commands": sum(len(routes) for routes in self._commands.values()),
+            "keywords": sum(len(routes) for routes in self._keywords.values())
+            + sum(len(routes) for routes in self._keywords_folded.values()),
+            "patterns": len(self._patterns),
+            "message_events": len(self._messages),
+        }
+
+
+class RouterHandler(BaseHandler):
+    """The single PTB handler that feeds an Application's updates to its EventRouter."""
+
+    def __init__(self, router: EventRouter):
+        super().__init__(self._unused_callback)
+        self.router = router
+
+    @staticmethod
+    async def _unused_callback(update, context):
+        return None
+
+    def check_update(self, update: object) -> Optional[List[Tuple[str, Any, dict]]]:
+        if not isinstance(update, Update) or update.effective_message is None:
+            return None
+        try:
+            bot_username = update.get_bot().username
+        except RuntimeError:
+            bot_username = None
+        return self.router.route(update, bot_username) or None
+
+    async def handle_update(self, update, application, check_result, context) -> None:
+        for event_name, ctx, payload in check_result:
+            await dispatch_inbound(application, ctx, event_name, payload, key=payload["chat_id"])
+
+
+def get_router(app, create: bool = False, fan_out: str = FAN_OUT_ALL) -> Optional[EventRouter]:
+    """
+    Returns the EventRouter of `app`. With `create`, a router is created and its
+    handler added to the Application when there is none yet.
+    """
+    router = _routers.get(app)
+    if router is None and create:
+        router = _routers[app] = EventRouter(fan_out)
+        app.add_handler(RouterHandler(router))
+    return router
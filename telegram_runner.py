@@ -0,0 +1,365 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue
+import signal
+import threading
+import time
+import zlib
+from typing import Any, List, Optional, Sequence, Tuple
+
+from telegram import Bot, Update
+
+from .telegram_webhook import WebhookServer
+
+
+logger = logging.getLogger(__name__)
+
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGABRT)
+
+
+def bot_id(app) -> str:
+    return app.bot.token.split(":", 1)[0]
+
+
+async def _start_app(app, polling: bool, drop_pending_updates: bool) -> None:
+    await app.initialize()
+    if app.post_init:
+        await app.post_init(app)
+    if polling:
+        await app.updater.start_polling(drop_pending_updates=drop_pending_updates)
+    await app.start()
+
+
+async def _stop_app(app) -> None:
+    if app.updater is not None and app.updater.running:
+        await app.updater.stop()
+    if app.running:
+        await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+    await app.shutdown()
+    if app.post_shutdown:
+        await app.post_shutdown(app)
+
+
+def run_applications(
+    apps: Sequence,
+    server: Optional[WebhookServer] = None,
+    webhook_url: Optional[str] = None,
+    drop_pending_updates: bool = False,
+    stop_signals: Tuple[int, ...] = STOP_SIGNALS,
+) -> None:
+    """
+    Runs several Applications on one event loop until a stop signal is received,
+    with the same lifecycle as `Application.run_polling`.
+
+    Without `server`, every Application polls for its updates. With a
+    WebhookServer, each Application is served on the path of its bot id, and
+    with `webhook_url` registered with Telegram at `<webhook_url>/<bot id>`.
+    """
+    if not apps:
+        raise ValueError("At least one Telegram Application is required.")
+
+    loop = asyncio.get_event_loop()
+    if platform.system() != "Windows":
+        for sig in stop_signals:
+            loop.add_signal_handler(sig, loop.stop)
+
+    routes = {}
+    if server is not None:
+        for app in apps:
+            routes[app] = server.add_route(bot_id(app), app)
+
+    async def _start_all():
+        await asyncio.gather(*(_start_app(app, server is None, drop_pending_updates) for app in apps))
+        if server is None:
+            return
+        await server.start()
+        if webhook_url:
+            await asyncio.gather(*(
+                app.bot.set_webhook(
+                    url=webhook_url.rstrip("/") + routes[app],
+                    secret_token=server.secret_token,
+                    max_connections=server.max_connections,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=drop_pending_updates,
+                )
+                for app in apps
+            ))
+
+    try:
+        loop.run_until_complete(_start_all())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.debug("Applications received stop signal. Shutting down.")
+    finally:
+        try:
+            if server is not None:
+                loop.run_until_complete(server.stop())
+            results = loop.run_until_complete(
+                asyncio.gather(*(_stop_app(app) for app in apps), return_exceptions=True)
+            )
+            for app, result in zip(apps, results):
+                if isinstance(result, Exception):
+                    logger.error("Failed to shut down bot %s.", bot_id(app), exc_info=result)
+        finally:
+            loop.close()
+
+
+def update_chat_id(data: dict) -> Optional[int]:
+    """
+    Finds the chat an update belongs to in its raw JSON, falling back to the
+    sender for updates without a chat (inline queries, polls answers, ...).
+    """
+    for key, value in data.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat.get("id")
+        sender = value.get("from") or value.get("user")
+        if sender:
+            return sender.get("id")
+    return None
+
+
+def shard_for(chat_id: Any, shards: int) -> int:
+    """Stable shard index of a chat, identical across processes and restarts."""
+    if chat_id is None:
+        return 0
+    return zlib.crc32(str(chat_id).encode()) % shards
+
+
+class ShardChannel:
+    """
+    Carries raw updates from the webhook process to one shard worker over a pipe.
+
+    A feeder thread writes to the pipe, so a busy or restarting worker never
+    blocks the webhook server. The worker reads without any lock, so a worker
+    that dies while waiting for an update leaves the pipe usable for its
+    replacement, which inherits the read end and continues with the next update.
+    """
+
+    def __init__(self, mp_context):
+        self.reader, self._writer = mp_context.Pipe(duplex=False)
+        self._buffer = queue.SimpleQueue()
+        self._feeder: Optional[threading.Thread] = None
+
+    def put(self, body: Optional[bytes]) -> None:
+        """Queues `body` for the worker; None asks the worker to stop."""
+        if self._feeder is None:
+            self._feeder = threading.Thread(target=self._feed, name="xai-telegram-shard-feeder", daemon=True)
+            self._feeder.start()
+        self._buffer.put(body)
+
+    def _feed(self) -> None:
+        while True:
+            body = self._buffer.get()
+            try:
+                self._writer.send_bytes(body or b"")
+            except OSError:
+                logger.exception("Failed to forward an update to its shard.")
+            if body is None:
+                return
+
+
+class ShardingWebhookServer(WebhookServer):
+    """
+    A WebhookServer that forwards each raw update to the worker process owning
+    its chat. All updates of a chat go to the same worker in arrival order.
+    """
+
+    def __init__(self, app, channels: List[ShardChannel], **kwargs):
+        super().__init__(app, **kwargs)
+        self.channels = channels
+        self.forwarded = [0] * len(channels)
+
+    def deliver(self, app, data: dict, body: bytes) -> None:
+        shard = shard_for(update_chat_id(data), len(self.channels))
+        self.channels[shard].put(body)
+        self.forwarded[shard] += 1
+
+
+def _serve_shard(app, updates, shard: int) -> None:
+    # Runs in a worker process forked by the shard supervisor; the parent handles stop signals.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    logging.getLogger(__name__).info("Shard %d started.", shard)
+
+    async def _run():
+        await _start_app(app, polling=False, drop_pending_updates=False)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                body = await loop.run_in_executor(None, updates.recv_bytes)
+                if not body:
+                    break
+                try:
+                    app.update_queue.put_nowait(Update.de_json(json.loads(body), app.bot))
+                except Exception:
+                    logger.exception("Shard %d dropped a malformed update.", shard)
+        finally:
+            await _stop_app(app)
+
+    asyncio.run(_run())
+
+
+class ShardSupervisor:
+    """
+    Runs one forked worker process per shard, each hosting its own copy of the
+    Application (with every handler registered before forking), and restarts
+    workers that die, with exponential backoff.
+
+    Workers are forked by a supervisor process, which is itself forked by `start`
+    before the webhook process starts its event loop or any thread. The supervisor
+    never runs either, so every worker, including restarted ones, is forked from a
+    single-threaded process without a running loop.
+
+    An update a worker had received but not yet handled when it crashed is lost;
+    updates still queued are handled by the restarted worker.
+    """
+
+    def __init__(self, app, workers: int, max_backoff: float = 30.0, interval: float = 1.0):
+        if workers < 1:
+            raise ValueError("workers must be at least 1.")
+        try:
+            self._mp = multiprocessing.get_context("fork")
+        except ValueError:
+            raise ValueError("Sharded webhooks need the 'fork' start method, which this platform lacks.")
+
+        self.app = app
+        self.max_backoff = max_backoff
+        self.interval = interval
+        self.channels = [ShardChannel(self._mp) for _ in range(workers)]
+        # Written by the supervisor process, read by stats().
+        self.restarts = self._mp.Array("i", workers)
+        self.alive = self._mp.Array("b", workers)
+        self.process: Optional[multiprocessing.Process] = None
+        self._stopping = self._mp.Event()
+
+    def start(self) -> None:
+        """Forks the supervisor process. Call before starting an event loop or threads."""
+        # Not a daemon: daemonic processes may not start the workers.
+        self.process = self._mp.Process(target=self._supervise, name="xai-telegram-shard-supervisor")
+        self.process.start()
+
+    def _spawn(self, shard: int) -> multiprocessing.Process:
+        process = self._mp.Process(
+            target=_serve_shard,
+            args=(self.app, self.channels[shard].reader, shard),
+            name=f"xai-telegram-shard-{shard}",
+            daemon=True,
+        )
+        process.start()
+        self.alive[shard] = True
+        return process
+
+    def _supervise(self) -> None:
+        # Runs in the supervisor process.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        parent = os.getppid()
+        processes = [self._spawn(shard) for shard in range(len(self.channels))]
+        next_start = [0.0] * len(processes)
+
+        while not self._stopping.wait(self.interval):
+            if os.getppid() != parent:
+                logger.error("Webhook process exited. Stopping the shards.")
+                break
+            now = time.monotonic()
+            for shard, process in enumerate(processes):
+                self.alive[shard] = process.is_alive()
+                if self.alive[shard]:
+                    continue
+                if next_start[shard] == 0.0:
+                    delay = min(self.max_backoff, 2 ** self.restarts[shard] - 1)
+                    next_start[shard] = now + delay
+                    logger.error(
+                        "Shard %d exited with code %s. Restarting in %.0f seconds.", shard, process.exitcode, delay
+                    )
+                if now >= next_start[shard]:
+                    self.restarts[shard] += 1
+                    next_start[shard] = 0.0
+                    processes[shard] = self._spawn(shard)
+
+        # The webhook process has asked every worker to stop; wait for them here.
+        for process in processes:
+            process.join()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Lets every worker finish its queued updates, then stops it."""
+        self._stopping.set()
+        for channel in self.channels:
+            channel.put(None)
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                # Terminating the supervisor also terminates its daemonic workers.
+                self.process.terminate()
+                self.process.join()
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self.channels),
+            "alive": sum(self.alive),
+            "restarts": list(self.restarts),
+        }
+
+
+def run_sharded_webhook(
+    app,
+    workers: int,
+    webhook_url: Optional[str] = None,
+    drop_pending_updates: bool = False,
+    stop_signals: Tuple[int, ...] = STOP_SIGNALS,
+    **server_kwargs,
+) -> None:
+    """
+    Receives webhook updates in this process and shards them by chat id across
+    `workers` forked processes, each running a copy of `app`. Blocks until a
+    stop signal is received.
+    """
+    supervisor = ShardSupervisor(app, workers)
+    server = ShardingWebhookServer(app, supervisor.channels, **server_kwargs)
+    # Fork before this process starts its loop or opens any connection, so no worker inherits either.
+    supervisor.start()
+
+    loop = asyncio.get_event_loop()
+    if platform.system() != "Windows":
+        for sig in stop_signals:
+            loop.add_signal_handler(sig, loop.stop)
+
+    # A separate Bot, so the Application's own HTTP client stays unused here.
+    token = app.bot.token
+    bot = Bot(
+        token,
+        base_url=app.bot.base_url[: -len(token)],
+        base_file_url=app.bot.base_file_url[: -len(token)],
+    )
+    try:
+        loop.run_until_complete(server.start())
+        if webhook_url:
+            async def _set_webhook():
+                async with bot:
+                    await bot.set_webhook(
+                        url=webhook_url,
+                        secret_token=server.secret_token,
+                        max_connections=server.max_connections,
+                        allowed_updates=Update.ALL_TYPES,
+                        drop_pending_updates=drop_pending_updates,
+                    )
+
+            loop.run_until_complete(_set_webhook())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.debug("Sharded webhook received stop signal. Shutting down.")
+    finally:
+        try:
+            loop.run_until_complete(server.stop())
+            supervisor.stop()
+        finally:
+            loop.close()
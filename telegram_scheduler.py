@@ -0,0 +1,258 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+
+logger = logging.getLogger(__name__)
+
+# Lower values are sent first when the global limit is saturated.
+PRIORITY_REPLY = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BROADCAST = 2
+
+_LANES = {
+    PRIORITY_REPLY: "reply",
+    PRIORITY_DEFAULT: "default",
+    PRIORITY_BROADCAST: "broadcast",
+}
+
+
+class TokenBucket:
+    """
+    A token bucket refilled at `rate` tokens per second, holding at most `burst` tokens.
+    `reserve` always takes a token and returns how long the caller must wait for
+    it, so callers sharing a bucket are served in FIFO order without polling.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def delay(self, now: float) -> float:
+        """Time until a token is available, without taking it."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class SendScheduler(BaseRateLimiter):
+    """
+    Rate limiter for all Bot API requests of an Application, plugged in through
+    `ApplicationBuilder.rate_limiter`.
+
+    - A global token bucket (Telegram allows ~30 messages per second).
+    - A token bucket per chat, and a stricter one per group chat (~20 per minute).
+    - Priority lanes for the global bucket: replies, then regular sends, then broadcasts.
+    - `RetryAfter` pauses every request for the requested time and is retried
+      up to `max_retries` times.
+
+    Components pass `rate_limit_args={"priority": ...}` to pick a lane.
+    When `metrics` is set (see TelegramEnableMetrics), request times and 429s
+    are recorded per Bot API method.
+    """
+
+    metrics = None
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate_per_minute: float = 20.0,
+        max_retries: int = 3,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_minute / 60.0
+        self.max_retries = max_retries
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._global: Optional[TokenBucket] = None
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._waiters: List = []
+        self._sequence = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._paused_until = 0.0
+        self._last_sweep = 0.0
+
+        self._queued = {lane: 0 for lane in _LANES.values()}
+        self._sent = {lane: 0 for lane in _LANES.values()}
+        self._acquired = {lane: 0 for lane in _LANES.values()}
+        self._wait_total = {lane: 0.0 for lane in _LANES.values()}
+        self._wait_max = {lane: 0.0 for lane in _LANES.values()}
+        self._retry_after = 0
+        self._retries_exhausted = 0
+
+    async def initialize(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._global = TokenBucket(self.global_rate, self.global_rate, self._loop.time())
+        self._wakeup = asyncio.Event()
+
+    async def shutdown(self) -> None:
+        if self._pump is not None:
+            self._pump.cancel()
+            self._pump = None
+
+    def _chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, 1.0, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+
+        # Forget buckets of chats that have been quiet long enough to be full again.
+        if now - self._last_sweep > 60.0:
+            self._last_sweep = now
+            for key in [key for key, b in self._chats.items() if b is not bucket and b.idle(now)]:
+                del self._chats[key]
+        return bucket
+
+    async def _acquire_global(self, priority: int) -> None:
+        now = self._loop.time()
+        if not self._waiters and now >= self._paused_until and self._global.delay(now) == 0:
+            self._global.take()
+            return
+
+        future = self._loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._pump is None or self._pump.done():
+            self._pump = self._loop.create_task(self._run_pump())
+        await future
+
+    async def _run_pump(self) -> None:
+        while self._waiters:
+            now = self._loop.time()
+            delay = max(self._paused_until - now, self._global.delay(now))
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self._global.take()
+                future.set_result(None)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        rate_limit_args = rate_limit_args or {}
+        priority = rate_limit_args.get("priority", PRIORITY_DEFAULT)
+        max_retries = rate_limit_args.get("max_retries", self.max_retries)
+        lane = _LANES.get(priority, "default")
+
+        chat_id = data.get("chat_id")
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+
+        for attempt in range(max_retries + 1):
+            started = self._loop.time()
+            self._queued[lane] += 1
+            try:
+                if chat_id is not None:
+                    delay = self._chat_bucket(chat_id, started).reserve(started)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await self._acquire_global(priority)
+            finally:
+                self._queued[lane] -= 1
+
+            waited = self._loop.time() - started
+            self._acquired[lane] += 1
+            self._wait_total[lane] += waited
+            self._wait_max[lane] = max(self._wait_max[lane], waited)
+
+            metrics = self.metrics
+            try:
+                requested = self._loop.time()
+                try:
+                    result = await callback(*args, **kwargs)
+                finally:
+                    if metrics is not None:
+                        metrics.request_seconds.observe(self._loop.time() - requested, endpoint)
+                self._sent[lane] += 1
+                return result
+            except RetryAfter as exc:
+                self._retry_after += 1
+                if metrics is not None:
+                    metrics.retry_after.inc(endpoint)
+                retry_after = exc.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                self._paused_until = max(self._paused_until, self._loop.time() + retry_after + 0.1)
+                self._wakeup.set()
+                if attempt == max_retries:
+                    self._retries_exhausted += 1
+                    raise
+                logger.info("Rate limit hit on %s. Retrying after %.1f seconds.", endpoint, retry_after)
+                await asyncio.sleep(max(0.0, self._paused_until - self._loop.time()))
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        lanes = {}
+        for lane in _LANES.values():
+            acquired = self._acquired[lane]
+            lanes[lane] = {
+                "queued": self._queued[lane],
+                "sent": self._sent[lane],
+                "wait_avg": self._wait_total[lane] / acquired if acquired else 0.0,
+                "wait_max": self._wait_max[lane],
+            }
+        return {
+            "queue_depth": sum(self._queued.values()),
+            "lanes": lanes,
+            "tracked_chats": len(self._chats),
+            "retry_after": self._retry_after,
+            "retries_exhausted": self._retries_exhausted,
+        }
+
+
+def rate_limit_kwargs(app, priority: int = PRIORITY_DEFAULT) -> Dict[str, Any]:
+    """
+    Extra keyword arguments for `app.bot.send_*` that select the priority lane.
+    Empty when the Application has no SendScheduler, since python-telegram-bot
+    rejects `rate_limit_args` without a rate limiter.
+    """
+    if isinstance(getattr(app.bot, "rate_limiter", None), SendScheduler):
+        return {"rate_limit_args": {"priority": priority}}
+    return {}
@@ -0,0 +1,332 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_stores = weakref.WeakKeyDictionary()
+
+# A state is a dict of values for one (chat_id, user_id) pair; either id may be None.
+StateKey = Tuple[Any, Any]
+# What a backend stores per key: the state and its expiry as a UNIX timestamp.
+StateRecord = Tuple[Dict[str, Any], float]
+
+
+def _key_text(key: StateKey) -> str:
+    chat_id, user_id = key
+    return f"{'' if chat_id is None else chat_id}:{'' if user_id is None else user_id}"
+
+
+class SQLiteStateBackend:
+    """
+    Persists states as JSON in a SQLite database. Writes arrive in batches and
+    are committed in a single transaction.
+    """
+
+    batched = True
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_state "
+            "(key TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def load(self, key: StateKey, now: float) -> Optional[StateRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT state, expires_at FROM chat_state WHERE key = ? AND expires_at > ?",
+                (_key_text(key), now),
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def write(self, changes: Dict[StateKey, Optional[StateRecord]]) -> None:
+        upserts = [
+            (_key_text(key), json.dumps(record[0]), record[1])
+            for key, record in changes.items()
+            if record is not None
+        ]
+        deletes = [(_key_text(key),) for key, record in changes.items() if record is None]
+        with self._lock, self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO chat_state (key, state, expires_at) VALUES (?, ?, ?)", upserts
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM chat_state WHERE key = ?", deletes)
+
+    def purge(self, now: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chat_state WHERE expires_at <= ?", (now,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PersistenceStateBackend:
+    """
+    Keeps states in the `chat_data` (or, without a chat id, `user_data`) of an
+    Application built with a python-telegram-bot `Persistence`. The Persistence
+    writes them out in batches on its own `update_interval` and when the
+    Application stops, so writes are handed over immediately.
+
+    Note that python-telegram-bot keeps all chat and user data in memory.
+    """
+
+    batched = False
+    namespace = "xircuits_state"
+
+    def __init__(self, app):
+        if app.persistence is None:
+            raise ValueError("The Telegram Application has no persistence configured.")
+        self.app = app
+
+    def _states(self, key: StateKey, create: bool) -> Tuple[Optional[dict], Any]:
+        chat_id, user_id = key
+        if chat_id is not None:
+            if not create and chat_id not in self.app.chat_data:
+                return None, user_id
+            return self.app.chat_data[chat_id].setdefault(self.namespace, {}), user_id
+        if not create and user_id not in self.app.user_data:
+            return None, None
+        return self.app.user_data[user_id].setdefault(self.namespace, {}), None
+
+    def load(self, key: StateKey, now: float) -> Optional[StateRecord]:
+        states, field = self._states(key, create=False)
+        record = states.get(field) if states else None
+        if record is None or record[1] <= now:
+            return None
+        return record[0], record[1]
+
+    def write(self, changes: Dict[StateKey, Optional[StateRecord]]) -> None:
+        for key, record in changes.items():
+            states, field = self._states(key, create=record is not None)
+            if states is None:
+                continue
+            if record is None:
+                states.pop(field, None)
+            else:
+                states[field] = record
+            chat_id, user_id = key
+            if chat_id is not None:
+                self.app.mark_data_for_update_persistence(chat_ids=chat_id)
+            else:
+                self.app.mark_data_for_update_persistence(user_ids=user_id)
+
+    def purge(self, now: float) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class StateStore:
+    """
+    Per-chat / per-user state for event subgraphs.
+
+    - States live in an in-memory LRU of at most `max_entries`, and expire `ttl`
+      seconds after their last write.
+    - With a `backend`, states evicted from memory are loaded back on access, and
+      changes are written in batches: after `flush_interval` seconds, or as soon
+      as `batch_size` states changed. `flush` writes pending changes immediately.
+    - All operations are guarded by a lock, so subgraphs on the event loop and on
+      worker threads can share the store. Values returned are copies.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100000,
+        ttl: float = 86400.0,
+        backend=None,
+        flush_interval: float = 1.0,
+        batch_size: int = 500,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._entries: "OrderedDict[StateKey, StateRecord]" = OrderedDict()
+        self._dirty: Dict[StateKey, Optional[StateRecord]] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._flushing = False
+        self._last_purge = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.flushes = 0
+        self.written = 0
+
+    def _lookup(self, key: StateKey, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._entries.get(key)
+            if record is not None:
+                if record[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return record[0]
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if key in self._dirty:
+                record = self._dirty[key]
+                self.misses += 1
+                return record[0] if record is not None and record[1] > now else None
+
+        self.misses += 1
+        if self.backend is None:
+            return None
+        record = self.backend.load(key, now)
+        if record is None:
+            return None
+        with self._lock:
+            # A write that happened while loading wins over the loaded state.
+            if key not in self._entries and key not in self._dirty:
+                self._remember(key, record)
+            return self._entries[key][0] if key in self._entries else record[0]
+
+    def _remember(self, key: StateKey, record: StateRecord) -> None:
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _changed(self, key: StateKey, record: Optional[StateRecord]) -> None:
+        if self.backend is None:
+            return
+        if not self.backend.batched:
+            self.backend.write({key: record})
+            self.written += 1
+            return
+        self._dirty[key] = record
+        if len(self._dirty) >= self.batch_size and not self._flushing:
+            # At most one background flush at a time; later writes join the next batch.
+            self._flushing = True
+            threading.Thread(target=self._flush_batch, name="xai-telegram-state-flush", daemon=True).start()
+        elif self._timer is None:
+            self._arm_timer()
+
+    def _arm_timer(self) -> None:
+        self._timer = threading.Timer(self.flush_interval, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_batch(self) -> None:
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def get(self, chat_id=None, user_id=None) -> Dict[str, Any]:
+        """Returns a copy of the state of (chat_id, user_id); empty if there is none."""
+        state = self._lookup((chat_id, user_id), time.time())
+        return dict(state) if state else {}
+
+    def set(self, chat_id, user_id, state: Dict[str, Any]) -> None:
+        """Replaces the state of (chat_id, user_id)."""
+        key = (chat_id, user_id)
+        record = (dict(state), time.time() + self.ttl)
+        with self._lock:
+            self._remember(key, record)
+            self._changed(key, record)
+
+    def update(self, chat_id, user_id, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Merges `values` into the state of (chat_id, user_id) and returns the new state."""
+        key = (chat_id, user_id)
+        with self._lock:
+            now = time.time()
+            state = dict(self._lookup(key, now) or {})
+            state.update(values)
+            record = (state, now + self.ttl)
+            self._remember(key, record)
+            self._changed(key, record)
+        return dict(state)
+
+    def delete(self, chat_id=None, user_id=None) -> None:
+        key = (chat_id, user_id)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._changed(key, None)
+
+    def flush(self) -> None:
+        """Writes all pending changes to the backend."""
+        if self.backend is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                changes, self._dirty = self._dirty, {}
+            if changes:
+                try:
+                    self.backend.write(changes)
+                except Exception:
+                    logger.exception("Failed to write %d chat states.", len(changes))
+                    with self._lock:
+                        for key, record in changes.items():
+                            self._dirty.setdefault(key, record)
+                        # Retry after flush_interval rather than waiting for the next write.
+                        if self._timer is None:
+                            self._arm_timer()
+                    return
+                self.flushes += 1
+                self.written += len(changes)
+
+            now = time.time()
+            if now - self._last_purge > 3600:
+                self._last_purge = now
+                self.backend.purge(now)
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self.backend is not None:
+            self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "pending_writes": len(self._dirty),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "flushes": self.flushes,
+            "written": self.written,
+        }
+
+
+def get_state_store(app) -> StateStore:
+    """Returns the Application's state store, creating an in-memory one if needed."""
+    store = _stores.get(app)
+    if store is None:
+        store = _stores[app] = StateStore()
+    return store
+
+
+def set_state_store(app, store: StateStore) -> None:
+    _stores[app] = store
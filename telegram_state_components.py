@@ -0,0 +1,233 @@
+from xai_components.base import InArg, OutArg, Component, xai_component
+
+from .telegram_dispatch import add_post_stop_hook
+from .telegram_state import (
+    PersistenceStateBackend,
+    SQLiteStateBackend,
+    StateStore,
+    get_state_store,
+    set_state_store,
+)
+
+
+def _state_owner(component):
+    chat_id = component.chat_id.value
+    user_id = component.user_id.value
+    if chat_id is None and user_id is None:
+        raise ValueError("chat_id or user_id is required to address a state.")
+    return chat_id, user_id
+
+
+@xai_component(color="blue")
+class TelegramConfigureStateStore(Component):
+    """
+    Configures the per-chat / per-user state used by the state components.
+
+    States are kept in a bounded in-memory LRU and expire after `ttl_seconds` without
+    writes, so memory stays flat however many users the bot sees. Optionally they are
+    persisted to SQLite (written in batches every `flush_interval` seconds) or to the
+    python-telegram-bot Persistence of the Application, so restarts keep sessions.
+    Pending writes are flushed when the Application stops.
+
+    Without this component, an in-memory store with default limits is used.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - max_entries (int): Number of states kept in memory. Default 100000.
+    - ttl_seconds (float): Lifetime of a state after its last write. Default 86400.
+    - sqlite_path (str): Optional SQLite database to persist states to.
+    - use_app_persistence (bool): Persist states through the Application's
+      Persistence (see TelegramInitApp) instead. Default False.
+    - flush_interval (float): Seconds between batched SQLite writes. Default 1.
+
+    ##### outPorts:
+    - application_out (object): The Telegram Application object.
+    """
+    application: InArg[object]
+    max_entries: InArg[int]
+    ttl_seconds: InArg[float]
+    sqlite_path: InArg[str]
+    use_app_persistence: InArg[bool]
+    flush_interval: InArg[float]
+
+    application_out: OutArg[object]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+
+        backend = None
+        if self.use_app_persistence.value:
+            backend = PersistenceStateBackend(app)
+        elif self.sqlite_path.value:
+            backend = SQLiteStateBackend(self.sqlite_path.value)
+
+        store = StateStore(
+            max_entries=self.max_entries.value or 100000,
+            ttl=self.ttl_seconds.value or 86400.0,
+            backend=backend,
+            flush_interval=self.flush_interval.value or 1.0,
+        )
+
+        async def _flush(application):
+            store.close()
+
+        add_post_stop_hook(app, _flush, close=True)
+        set_state_store(app, store)
+        self.application_out.value = app
+
+
+@xai_component(color="green")
+class TelegramGetState(Component):
+    """
+    Reads the state stored for a chat, a user, or a user within a chat.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - chat_id (int): The chat the state belongs to (optional if user_id is set).
+    - user_id (int): The user the state belongs to (optional if chat_id is set).
+    - key (str): Optional key to read. If empty, only `state` is set.
+    - default (any): Value returned when `key` is not in the state.
+
+    ##### outPorts:
+    - state (dict): A copy of the whole state (empty if there is none).
+    - value (any): The value stored under `key`, or `default`.
+    """
+    application: InArg[object]
+    chat_id: InArg[int]
+    user_id: InArg[int]
+    key: InArg[str]
+    default: InArg[any]
+
+    state: OutArg[dict]
+    value: OutArg[any]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        chat_id, user_id = _state_owner(self)
+
+        state = get_state_store(app).get(chat_id, user_id)
+        self.state.value = state
+        self.value.value = state.get(self.key.value, self.default.value) if self.key.value else None
+
+
+@xai_component(color="green")
+class TelegramSetState(Component):
+    """
+    Stores a value under `key` in the state of a chat, a user, or a user within a chat.
+    Other keys of the state are kept.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - chat_id (int): The chat the state belongs to (optional if user_id is set).
+    - user_id (int): The user the state belongs to (optional if chat_id is set).
+    - key (str): The key to set.
+    - value (any): The value to store. Must be JSON serializable when persisting to SQLite.
+
+    ##### outPorts:
+    - state (dict): The updated state.
+    """
+    application: InArg[object]
+    chat_id: InArg[int]
+    user_id: InArg[int]
+    key: InArg[str]
+    value: InArg[any]
+
+    state: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        chat_id, user_id = _state_owner(self)
+        if not self.key.value:
+            raise ValueError("key is required.")
+
+        self.state.value = get_state_store(app).update(chat_id, user_id, {self.key.value: self.value.value})
+
+
+@xai_component(color="green")
+class TelegramUpdateState(Component):
+    """
+    Merges several values into the state of a chat, a user, or a user within a chat
+    in one atomic step.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - chat_id (int): The chat the state belongs to (optional if user_id is set).
+    - user_id (int): The user the state belongs to (optional if chat_id is set).
+    - values (dict): The keys and values to merge into the state.
+    - replace (bool): Replace the whole state with `values` instead. Default False.
+
+    ##### outPorts:
+    - state (dict): The updated state.
+    """
+    application: InArg[object]
+    chat_id: InArg[int]
+    user_id: InArg[int]
+    values: InArg[dict]
+    replace: InArg[bool]
+
+    state: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        chat_id, user_id = _state_owner(self)
+        values = self.values.value or {}
+
+        store = get_state_store(app)
+        if self.replace.value:
+            store.set(chat_id, user_id, values)
+            self.state.value = dict(values)
+        else:
+            self.state.value = store.update(chat_id, user_id, values)
+
+
+@xai_component(color="green")
+class TelegramClearState(Component):
+    """
+    Deletes the state of a chat, a user, or a user within a chat.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+    - chat_id (int): The chat the state belongs to (optional if user_id is set).
+    - user_id (int): The user the state belongs to (optional if chat_id is set).
+    """
+    application: InArg[object]
+    chat_id: InArg[int]
+    user_id: InArg[int]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        chat_id, user_id = _state_owner(self)
+        get_state_store(app).delete(chat_id, user_id)
+
+
+@xai_component(color="blue")
+class TelegramGetStateStoreStats(Component):
+    """
+    Returns a snapshot of the state store: entries in memory, hits, misses, evictions,
+    expirations and pending / written backend writes.
+
+    ##### inPorts:
+    - application (object): The Telegram Application object.
+
+    ##### outPorts:
+    - stats (dict): The state store statistics.
+    """
+    application: InArg[object]
+
+    stats: OutArg[dict]
+
+    def execute(self, ctx) -> None:
+        app = self.application.value or ctx.get('telegram_app')
+        if not app:
+            raise ValueError("Telegram Application not found in input or context!")
+        self.stats.value = get_state_store(app).stats()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from typing import Any, List, Optional
+
+from telegram.constants import ChatAction
+from telegram.error import BadRequest, RetryAfter
+
+from .telegram_scheduler import PRIORITY_REPLY, rate_limit_kwargs
+
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+def rollover_point(text: str, limit: int) -> int:
+    """Where to cut `text` to fit `limit`: the last line break or space in the second half, else `limit`."""
+    for separator in ("\n", " "):
+        cut = text.rfind(separator, limit // 2, limit)
+        if cut != -1:
+            return cut + 1
+    return limit
+
+
+async def _collect(chunks, parts: List[str], arrived: asyncio.Event) -> None:
+    if isinstance(chunks, str):
+        parts.append(chunks)
+        arrived.set()
+        return
+    if hasattr(chunks, "__aiter__"):
+        async for chunk in chunks:
+            parts.append(str(chunk))
+            arrived.set()
+        return
+
+    # Sync generators may block (e.g. a streaming HTTP client), so they are
+    # advanced on the default executor rather than on the event loop.
+    loop = asyncio.get_running_loop()
+    iterator = iter(chunks)
+    end = object()
+    while True:
+        chunk = await loop.run_in_executor(None, next, iterator, end)
+        if chunk is end:
+            return
+        parts.append(str(chunk))
+        arrived.set()
+
+
+async def _call(factory, attempts: int = 3):
+    for attempt in range(attempts):
+        try:
+            return await factory()
+        except RetryAfter as e:
+            if attempt == attempts - 1:
+                raise
+            retry_after = e.retry_after
+            if not isinstance(retry_after, (int, float)):
+                retry_after = retry_after.total_seconds()
+            await asyncio.sleep(retry_after)
+
+
+async def stream_reply(
+    app,
+    chat_id,
+    chunks,
+    reply_to_message_id: Optional[int] = None,
+    parse_mode: Optional[str] = None,
+    edit_interval: float = 1.0,
+    action_interval: float = 4.5,
+    max_length: int = MAX_MESSAGE_LENGTH,
+) -> List[Any]:
+    """
+    Sends text produced by `chunks` (a str, or a sync or async iterable of str) as it
+    is generated, and returns the sent Messages.
+
+    "typing" is shown every `action_interval` seconds until the text is complete.
+    The first text is sent as soon as it arrives; later chunks are coalesced and
+    shown by editing the message at most every `edit_interval` seconds. Text
+    beyond `max_length` rolls over into a new message. Messages are streamed as
+    plain text; `parse_mode` is applied to each message once its text is final.
+    """
+    loop = asyncio.get_running_loop()
+    send_kwargs = rate_limit_kwargs(app, PRIORITY_REPLY)
+    # A SendScheduler already retries after 429 responses; retrying here too would multiply the attempts.
+    attempts = 1 if send_kwargs else 3
+    parts: List[str] = []
+    arrived = asyncio.Event()
+    producer = loop.create_task(_collect(chunks, parts, arrived))
+
+    messages = []
+    message = None
+    shown = ""
+    current = ""
+    next_action = loop.time()
+
+    async def show(text: str, final: bool) -> None:
+        nonlocal message, shown
+        mode = parse_mode if final else None
+        if text == shown and mode is None:
+            return
+        if message is None:
+            reply_to = reply_to_message_id if not messages else None
+            try:
+                message = await _call(lambda: app.bot.send_message(
+                    chat_id=chat_id, text=text, parse_mode=mode, reply_to_message_id=reply_to, **send_kwargs
+                ), attempts)
+            except BadRequest:
+                if mode is None:
+                    raise
+                message = await _call(lambda: app.bot.send_message(
+                    chat_id=chat_id, text=text, reply_to_message_id=reply_to, **send_kwargs
+                ), attempts)
+            messages.append(message)
+        else:
+            try:
+                await _call(lambda: app.bot.edit_message_text(
+                    text, chat_id=chat_id, message_id=message.message_id, parse_mode=mode, **send_kwargs
+                ), attempts)
+            except BadRequest as e:
+                if "not modified" in str(e).lower():
+                    pass
+                elif mode is not None:
+                    # Text that is not valid markup stays plain.
+                    logger.debug("Streaming reply kept as plain text: %s", e)
+                else:
+                    raise
+        shown = text
+
+    try:
+        while True:
+            finished = producer.done()
+            arrived.clear()
+            if parts:
+                current += "".join(parts)
+                parts.clear()
+
+            while len(current) > max_length:
+                cut = rollover_point(current, max_length)
+                await show(current[:cut], final=True)
+                current = current[cut:]
+                message, shown = None, ""
+
+            if current.strip():
+                await show(current, final=finished)
+            if finished:
+                producer.result()
+                return messages
+
+            now = loop.time()
+            if now >= next_action:
+                try:
+                    await app.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
+                except Exception:
+                    logger.debug("Failed to send chat action.", exc_info=True)
+                next_action = now + action_interval
+
+            if message is None:
+                # Nothing shown yet: send the first text as soon as it arrives.
+                waiter = loop.create_task(arrived.wait())
+                await asyncio.wait({producer, waiter}, timeout=max(0.0, next_action - loop.time()),
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+            else:
+                await asyncio.wait({producer}, timeout=edit_interval)
+    finally:
+        if not producer.done():
+            producer.cancel()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Dict, List, Optional
+
+from .telegram_dispatch import run_coroutine
+from .telegram_metrics import get_metrics
+
+
+logger = logging.getLogger(__name__)
+
+_registries = weakref.WeakKeyDictionary()
+
+
+class SendTaskRegistry:
+    """
+    Keeps track of every send coroutine scheduled by the components of an Application.
+
+    - Each send gets a `concurrent.futures.Future` handle resolving to the sent Message,
+      usable from worker threads and inspectable from the event loop.
+    - At most `max_in_flight` sends run at once; the rest wait for a slot.
+    - Failures are passed to the error callbacks (and logged) instead of being lost.
+    - `drain` waits for all outstanding sends, e.g. before the Application shuts down.
+    """
+
+    def __init__(self, max_in_flight: int = 100):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1.")
+        self.max_in_flight = max_in_flight
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._handles = set()
+        self._tasks = set()
+        self._error_callbacks: List[Callable[[BaseException, str], Any]] = []
+        self._lock = threading.Lock()
+
+        self._submitted = 0
+        self._succeeded = 0
+        self._failed = 0
+        self._in_flight = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def add_error_callback(self, callback: Callable[[BaseException, str], Any]) -> None:
+        """Registers `callback(exception, description)` for failed sends."""
+        self._error_callbacks.append(callback)
+
+    def submit(self, app, coro: Coroutine, description: str = "send") -> Future:
+        handle = Future()
+        with self._lock:
+            self._submitted += 1
+            self._handles.add(handle)
+        handle.add_done_callback(self._handles.discard)
+        metrics = get_metrics(app)
+        if metrics is not None:
+            handle.add_done_callback(_observer(metrics, description, time.monotonic()))
+        run_coroutine(app, self._run(coro, handle, description))
+        return handle
+
+    async def _run(self, coro: Coroutine, handle: Future, description: str) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        try:
+            async with self._slots:
+                self._in_flight += 1
+                started = time.monotonic()
+                try:
+                    result = await coro
+                except Exception as exc:
+                    self._failed += 1
+                    handle.set_exception(exc)
+                    self._report(exc, description)
+                else:
+                    self._succeeded += 1
+                    handle.set_result(result)
+                finally:
+                    self._in_flight -= 1
+                    latency = time.monotonic() - started
+                    self._latency_total += latency
+                    self._latency_max = max(self._latency_max, latency)
+        finally:
+            self._tasks.discard(task)
+            if not handle.done():
+                handle.cancel()
+
+    def _report(self, exc: BaseException, description: str) -> None:
+        if not self._error_callbacks:
+            logger.error("Telegram %s failed: %s", description, exc, exc_info=exc)
+        for callback in self._error_callbacks:
+            try:
+                callback(exc, description)
+            except Exception:
+                logger.exception("Send error callback failed.")
+
+    async def drain(self) -> None:
+        """Waits until every submitted send has completed or failed."""
+        while self._handles:
+            await asyncio.gather(
+                *(asyncio.wrap_future(handle) for handle in list(self._handles)),
+                return_exceptions=True,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self._succeeded + self._failed
+        return {
+            "max_in_flight": self.max_in_flight,
+            "submitted": self._submitted,
+            "succeeded": self._succeeded,
+            "failed": self._failed,
+            "in_flight": self._in_flight,
+            "pending": len(self._handles) - self._in_flight,
+            "latency_avg": self._latency_total / finished if finished else 0.0,
+            "latency_max": self._latency_max,
+        }
+
+
+def _observer(metrics, description: str, submitted: float) -> Callable[[Future], None]:
+    def observe(handle: Future) -> None:
+        metrics.send_seconds.observe(time.monotonic() - submitted, description)
+        if handle.cancelled():
+            metrics.send_errors.inc(description, "CancelledError")
+        elif handle.exception() is not None:
+            metrics.send_errors.inc(description, type(handle.exception()).__name__)
+
+    return observe
+
+
+def get_send_registry(app) -> SendTaskRegistry:
+    registry = _registries.get(app)
+    if registry is None:
+        registry = _registries[app] = SendTaskRegistry()
+    return registry
+
+
+def set_send_registry(app, registry: SendTaskRegistry) -> None:
+    _registries[app] = registry
+
+
+def submit_send(app, coro: Coroutine, description: str = "send") -> Future:
+    """Schedules a send coroutine on the Application's registry and returns its handle."""
+    return get_send_registry(app).submit(app, coro, description)
+
+
+def wait_for_send(handle: Future, timeout: Optional[float] = None):
+    """
+    Blocks until the send behind `handle` completes and returns the sent Message.
+    Only possible off the event loop, i.e. in subgraphs run on the worker pool.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return handle.result(timeout=timeout)
+    raise ValueError(
+        "Cannot wait for a send on the event loop thread. "
+        "Use TelegramConfigureWorkerPool to run subgraphs on worker threads."
+    )
@@ -0,0 +1,177 @@
+import re
+from html import unescape
+from typing import Iterator, List, Optional, Tuple
+
+from telegram.constants import ParseMode
+
+
+MAX_MESSAGE_LENGTH = 4096
+MAX_CAPTION_LENGTH = 1024
+
+# Tags, entities, then runs of text split after whitespace so every piece ends at a
+# possible break point.
+_HTML_TOKEN = re.compile(r"<[^>]*>|&#?\w+;|[^<&\s]*\s+|[^<&\s]+|[<&]")
+_TEXT_TOKEN = re.compile(r"\S*\s+|\S+")
+_TAG_NAME = re.compile(r"</?\s*([a-zA-Z][\w-]*)")
+
+_SENTENCE_ENDS = (".", "!", "?", ";", ":")
+
+# Break priorities after a piece: paragraph, line, sentence, word.
+_PARAGRAPH, _LINE, _SENTENCE, _WORD, _NONE = 3, 2, 1, 0, -1
+
+
+def _units(text: str) -> int:
+    """Length in UTF-16 code units, as Telegram counts it: most emoji count twice."""
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _chunks(token: str, size: int) -> Iterator[str]:
+    """Cuts `token` into chunks of at most `size` UTF-16 units, never inside a character."""
+    if _units(token) <= size:
+        yield token
+        return
+    start = length = 0
+    for index, char in enumerate(token):
+        width = 2 if ord(char) > 0xFFFF else 1
+        if length + width > size and index > start:
+            yield token[start:index]
+            start, length = index, 0
+        length += width
+    yield token[start:]
+
+
+def _break_priority(piece: str) -> int:
+    if not piece[-1:].isspace():
+        return _NONE
+    if piece.endswith("\n\n"):
+        return _PARAGRAPH
+    if piece.endswith("\n"):
+        return _LINE
+    if piece.rstrip().endswith(_SENTENCE_ENDS):
+        return _SENTENCE
+    return _WORD
+
+
+def text_length(text: str, html: bool = False) -> int:
+    """
+    Length of `text` as Telegram counts it: in UTF-16 code units, with tags
+    excluded and entities counted as the character they stand for.
+    """
+    if not html:
+        return _units(text)
+    length = 0
+    for token in _HTML_TOKEN.findall(text):
+        if token.startswith("<") and len(token) > 1:
+            continue
+        length += _units(unescape(token)) if token.startswith("&") and len(token) > 1 else _units(token)
+    return length
+
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH, html: bool = False,
+               first_limit: Optional[int] = None) -> List[str]:
+    """
+    Splits `text` into parts of at most `limit` characters (the first part at most
+    `first_limit`), preferring to break between paragraphs, then lines, then
+    sentences, then words, in the second half of a part. Lengths are counted as
+    Telegram does, in UTF-16 code units, and characters are never cut in half.
+
+    With `html`, tags are not counted, entities count as the character they stand
+    for and are never cut, and tags still open at a break are closed at the end
+    of the part and reopened at the start of the next.
+
+    Each piece of text is carried over to a following part at most once, so
+    splitting runs in linear time over the text.
+    """
+    if not text:
+        return []
+    limits = [first_limit or limit, limit]
+    if text_length(text, html) <= limits[0]:
+        return [text]
+
+    # Pieces: (markup, visible length, break priority, tags open after the piece).
+    pieces: List[Tuple[str, int, int, tuple]] = []
+    open_tags: tuple = ()
+    for token in (_HTML_TOKEN if html else _TEXT_TOKEN).findall(text):
+        if html and token.startswith("<") and len(token) > 1:
+            match = _TAG_NAME.match(token)
+            if match:
+                name = match.group(1).lower()
+                if token.startswith("</"):
+                    for depth in range(len(open_tags) - 1, -1, -1):
+                        if open_tags[depth][0] == name:
+                            open_tags = open_tags[:depth] + open_tags[depth + 1:]
+                            break
+                elif not token.endswith("/>"):
+                    open_tags = open_tags + ((name, token),)
+            pieces.append((token, 0, _NONE, open_tags))
+        elif html and token.startswith("&") and len(token) > 1:
+            pieces.append((token, _units(unescape(token)), _NONE, open_tags))
+        else:
+            # A word longer than a whole part is cut hard.
+            for piece in _chunks(token, min(limits)):
+                pieces.append((piece, _units(piece), _break_priority(piece), open_tags))
+
+    parts = []
+    start = 0
+    reopen: tuple = ()
+    while start < len(pieces):
+        budget = limits[0] if not parts else limits[1]
+        length = 0
+        best = {}
+        end = start
+        while end < len(pieces) and length + pieces[end][1] <= budget:
+            length += pieces[end][1]
+            priority = pieces[end][2]
+            if priority != _NONE and length * 2 >= budget:
+                best[priority] = end
+            end += 1
+
+        if end < len(pieces) and best:
+            cut = best[max(best)] + 1
+        else:
+            cut = max(end, start + 1)
+        # Keep closing tags that directly follow the break in this part.
+        while cut < len(pieces) and pieces[cut][1] == 0 and pieces[cut][0].startswith("</"):
+            cut += 1
+
+        close = pieces[cut - 1][3]
+        markup = "".join(tag for _, tag in reopen)
+        markup += "".join(piece[0] for piece in pieces[start:cut])
+        markup += "".join(f"</{name}>" for name, _ in reversed(close))
+        if markup.strip():
+            parts.append(markup)
+        reopen = close
+        start = cut
+    return parts
+
+
+def split_caption(caption: Optional[str], parse_mode: Optional[str] = None) -> Tuple[Optional[str], List[str]]:
+    """
+    Splits a media caption into what fits the 1024 character caption limit and
+    the overflow, as parts of at most 4096 characters to send as text messages.
+    """
+    if not caption:
+        return caption, []
+    html = parse_mode == ParseMode.HTML
+    if text_length(caption, html) <= MAX_CAPTION_LENGTH:
+        return caption, []
+    parts = split_text(caption, MAX_MESSAGE_LENGTH, html=html, first_limit=MAX_CAPTION_LENGTH)
+    return parts[0], parts[1:]
+
+
+async def send_text(app, chat_id, text: str, parse_mode: Optional[str] = ParseMode.HTML,
+                    reply_to_message_id: Optional[int] = None, **kwargs) -> list:
+    """
+    Sends `text`, split into messages of at most 4096 characters, in order. Only the
+    first message replies to `reply_to_message_id`. Returns the sent Messages.
+    """
+    messages = []
+    for part in split_text(text, MAX_MESSAGE_LENGTH, html=parse_mode == ParseMode.HTML):
+        messages.append(await app.bot.send_message(
+            chat_id=chat_id,
+            text=part,
+            parse_mode=parse_mode,
+            reply_to_message_id=reply_to_message_id if not messages else None,
+            **kwargs,
+        ))
+    return messages
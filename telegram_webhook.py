@@ -0,0 +1,220 @@
+import asyncio
+import hmac
+import json
+import logging
+import platform
+import signal
+from typing import Optional, Tuple
+
+from telegram import Update
+
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "x-telegram-bot-api-secret-token"
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class WebhookServer:
+    """
+    A minimal asyncio HTTP/1.1 server that accepts Telegram webhook POSTs and
+    puts the decoded Updates on the Application's update queue.
+
+    Requests are acknowledged as soon as the Update is queued; handlers run
+    afterwards on the Application, so a slow handler never delays Telegram.
+    Any client can POST recorded Update JSON to the same endpoint for local testing.
+
+    Further Applications can be served on other paths of the same server with
+    `add_route` (pass `app=None` to serve only those); subclasses can override `deliver` to send updates elsewhere.
+    """
+
+    def __init__(
+        self,
+        app,
+        listen: str = "127.0.0.1",
+        port: int = 8443,
+        url_path: str = "",
+        secret_token: Optional[str] = None,
+        max_connections: int = 40,
+        max_body_size: int = 1024 * 1024,
+    ):
+        self.app = app
+        self.listen = listen
+        self.port = port
+        self.path = "/" + (url_path or "").strip("/")
+        self.secret_token = secret_token or None
+        self.max_connections = max_connections
+        self.max_body_size = max_body_size
+        self._routes = {self.path.rstrip("/"): app} if app is not None else {}
+
+        self.received = 0
+        self.rejected = 0
+        self._connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def add_route(self, url_path: str, app) -> str:
+        """Serves updates POSTed to `url_path` to `app`, and returns the normalized path."""
+        path = "/" + (url_path or "").strip("/")
+        self._routes[path.rstrip("/")] = app
+        return path
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.listen, self.port)
+        logger.info("Webhook server listening on http://%s:%s%s", self.listen, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self._connections >= self.max_connections:
+            await self._respond(writer, 503, keep_alive=False)
+            writer.close()
+            return
+
+        self._connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                if "content-length" not in headers:
+                    # Chunked bodies are not used by Telegram and are not supported here.
+                    status = 411 if method == "POST" else 405
+                    await self._respond(writer, status, keep_alive=False)
+                    break
+
+                length = int(headers["content-length"])
+                if length > self.max_body_size:
+                    await self._respond(writer, 413, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                status = self._ingest(method, target, headers, body)
+                await self._respond(writer, status, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._connections -= 1
+            writer.close()
+
+    def _ingest(self, method: str, target: str, headers: dict, body: bytes) -> int:
+        app = self._routes.get(target.split("?", 1)[0].rstrip("/"))
+        if app is None:
+            return 404
+        if method != "POST":
+            return 405
+        if self.secret_token is not None:
+            received = headers.get(SECRET_TOKEN_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                self.rejected += 1
+                return 403
+
+        try:
+            data = json.loads(body)
+            self.deliver(app, data, body)
+        except Exception:
+            self.rejected += 1
+            logger.debug("Rejected malformed webhook body.", exc_info=True)
+            return 400
+
+        self.received += 1
+        return 200
+
+    def deliver(self, app, data: dict, body: bytes) -> None:
+        """Hands a decoded update to `app`. Raising rejects the request with 400."""
+        app.update_queue.put_nowait(Update.de_json(data, app.bot))
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, keep_alive: bool) -> None:
+        connection = "keep-alive" if keep_alive else "close"
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Length: 0\r\nConnection: {connection}\r\n\r\n".encode("latin-1")
+        )
+        await writer.drain()
+
+
+def run_webhook(
+    app,
+    server: WebhookServer,
+    webhook_url: Optional[str] = None,
+    drop_pending_updates: bool = False,
+    stop_signals: Tuple[int, ...] = (signal.SIGINT, signal.SIGTERM, signal.SIGABRT),
+) -> None:
+    """
+    Runs the Application with `server` as its update source, following the same
+    lifecycle as `Application.run_polling` (post_init, post_stop and post_shutdown
+    are honoured). Blocks until a stop signal is received.
+
+    When `webhook_url` is given, it is registered with Telegram through
+    `set_webhook`; otherwise the server only accepts updates POSTed to it locally.
+    """
+    loop = asyncio.get_event_loop()
+
+    if platform.system() != "Windows":
+        for sig in stop_signals:
+            loop.add_signal_handler(sig, loop.stop)
+
+    try:
+        loop.run_until_complete(app.initialize())
+        if app.post_init:
+            loop.run_until_complete(app.post_init(app))
+        loop.run_until_complete(server.start())
+        if webhook_url:
+            loop.run_until_complete(
+                app.bot.set_webhook(
+                    url=webhook_url,
+                    secret_token=server.secret_token,
+                    max_connections=server.max_connections,
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=drop_pending_updates,
+                )
+            )
+        loop.run_until_complete(app.start())
+        loop.run_forever()
+    except (KeyboardInterrupt, SystemExit):
+        logger.debug("Webhook application received stop signal. Shutting down.")
+    finally:
+        try:
+            loop.run_until_complete(server.stop())
+            if app.running:
+                loop.run_until_complete(app.stop())
+                if app.post_stop:
+                    loop.run_until_complete(app.post_stop(app))
+            loop.run_until_complete(app.shutdown())
+            if app.post_shutdown:
+                loop.run_until_complete(app.post_shutdown(app))
+        finally:
+            loop.close()
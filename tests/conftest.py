@@ -0,0 +1,66 @@
+import asyncio
+import importlib
+import importlib.util
+import os
+import selectors
+import sys
+
+import pytest
+import xai_components
+
+# The library is imported as a package of xai_components, like Xircuits does,
+# whatever the directory of this checkout is called.
+LIBRARY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE = "xai_components.xai_telegram"
+
+if PACKAGE not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE, os.path.join(LIBRARY, "__init__.py"), submodule_search_locations=[LIBRARY]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE] = module
+    spec.loader.exec_module(module)
+    xai_components.xai_telegram = module
+
+
+@pytest.fixture
+def dispatch():
+    return importlib.import_module(PACKAGE + ".telegram_dispatch")
+
+
+class FakeClockSelector(selectors.DefaultSelector):
+    """Advances the loop's clock by the select timeout instead of sleeping."""
+
+    def __init__(self, loop_holder):
+        super().__init__()
+        self.loop_holder = loop_holder
+
+    def select(self, timeout=None):
+        if timeout:
+            self.loop_holder[0].now += timeout
+        return super().select(0)
+
+
+class FakeClockLoop(asyncio.SelectorEventLoop):
+    """An event loop whose timers fire at once, in order, on a virtual clock starting at 0."""
+
+    def __init__(self):
+        holder = []
+        super().__init__(FakeClockSelector(holder))
+        holder.append(self)
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def fake_clock():
+    """Runs `scenario(loop)` to completion on a FakeClockLoop and returns its result."""
+    loop = FakeClockLoop()
+
+    def run(scenario):
+        return loop.run_until_complete(scenario(loop))
+
+    yield run
+    loop.close()
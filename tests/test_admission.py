@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from xai_components.xai_telegram import telegram_admission
+from xai_components.xai_telegram.telegram_admission import AdmissionController
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Replaces dispatching with a record of (time, event, user, text, merged_count); each run takes 1s."""
+    records = []
+
+    async def dispatch_cached(app, ctx, event_name, payload, key=None, on_done=None):
+        loop = asyncio.get_running_loop()
+        records.append((round(loop.time(), 3), event_name, payload["user_id"], payload["text"],
+                        payload.get("merged_count", 1)))
+        loop.call_later(1.0, on_done)
+
+    monkeypatch.setattr(telegram_admission, "dispatch_cached", dispatch_cached)
+    return records
+
+
+def message(user, text, chat=None):
+    return {"chat_id": chat or user, "user_id": user, "text": text}
+
+
+async def submit_all(controller, events, event_name="msg"):
+    for user, text in events:
+        controller.submit(None, {}, event_name, message(user, text))
+    await controller.drain()
+
+
+def test_drop_policy_drops_events_over_the_user_rate(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=1.0, user_burst=2.0, policy="drop")
+    fake_clock(lambda loop: submit_all(controller, [(1, "a"), (1, "b"), (1, "c"), (2, "x")]))
+
+    assert [(user, text) for _, _, user, text, _ in dispatched] == [(1, "a"), (1, "b"), (2, "x")]
+    assert controller.stats()["dropped"] == {"rate": 1, "busy": 0, "queue_full": 0}
+
+
+def test_drop_policy_drops_events_over_max_in_flight(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=0, max_in_flight=1, policy="drop")
+    fake_clock(lambda loop: submit_all(controller, [(1, "a"), (2, "b")]))
+
+    assert [text for _, _, _, text, _ in dispatched] == ["a"]
+    assert controller.stats()["dropped"]["busy"] == 1
+
+
+def test_queue_policy_paces_each_user_and_bounds_the_queue(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=1.0, user_burst=1.0, policy="queue", max_queue=2)
+
+    async def scenario(loop):
+        for text in "abcd":
+            controller.submit(None, {}, "msg", message(1, text))
+        controller.submit(None, {}, "msg", message(2, "x"))
+        await asyncio.sleep(10)
+
+    fake_clock(scenario)
+    assert [(at, user, text) for at, _, user, text, _ in dispatched] == [
+        (0.0, 1, "a"), (0.0, 2, "x"), (1.0, 1, "b"), (2.0, 1, "c"),
+    ]
+    assert controller.stats()["dropped"]["queue_full"] == 1
+
+
+def test_queue_is_served_round_robin_across_users(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=0, max_in_flight=1, policy="queue")
+    fake_clock(lambda loop: submit_all(controller, [(1, "a1"), (1, "a2"), (1, "a3"), (2, "b1"), (3, "c1")]))
+
+    # A user whose event starts goes to the back of the line.
+    assert [text for _, _, _, text, _ in dispatched] == ["a1", "a2", "b1", "c1", "a3"]
+    assert [at for at, _, _, _, _ in dispatched] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_merge_policy_joins_waiting_events_of_the_same_chat(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=1.0, user_burst=1.0, policy="merge")
+
+    async def scenario(loop):
+        for text in ("a", "b", "c"):
+            controller.submit(None, {}, "msg", message(1, text))
+        controller.submit(None, {}, "other", message(1, "d"))
+        await asyncio.sleep(10)
+
+    fake_clock(scenario)
+    assert [(at, event, text, count) for at, event, _, text, count in dispatched] == [
+        (0.0, "msg", "a", 1), (1.0, "msg", "b\nc", 2), (2.0, "other", "d", 1),
+    ]
+    assert controller.stats()["merged"] == 1
+
+
+def test_debounce_batches_messages_sent_together(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=0, debounce=0.5)
+
+    async def scenario(loop):
+        controller.submit(None, {}, "msg", message(1, "one"))
+        await asyncio.sleep(0.2)
+        controller.submit(None, {}, "msg", message(1, "two"))
+        controller.submit(None, {}, "msg", message(2, "other user"))
+        await asyncio.sleep(0.2)
+        controller.submit(None, {}, "msg", message(1, "three"))
+        await asyncio.sleep(1.0)
+        controller.submit(None, {}, "msg", message(1, "later"))
+        await controller.drain()
+
+    fake_clock(scenario)
+    assert [(at, user, text, count) for at, _, user, text, count in dispatched] == [
+        (0.5, 1, "one\ntwo\nthree", 3), (0.7, 2, "other user", 1), (1.4, 1, "later", 1),
+    ]
+
+
+def test_drain_dispatches_waiting_events_without_pacing(fake_clock, dispatched):
+    controller = AdmissionController(user_rate=0.1, user_burst=1.0, policy="queue")
+    fake_clock(lambda loop: submit_all(controller, [(1, "a"), (1, "b"), (1, "c")]))
+
+    assert [(at, text) for at, _, _, text, _ in dispatched] == [(0.0, "a"), (0.0, "b"), (0.0, "c")]
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_event_names_limit_which_events_are_admitted():
+    controller = AdmissionController(event_names=["msg"])
+    assert controller.applies_to("msg")
+    assert not controller.applies_to("cmd")
+    assert AdmissionController().applies_to("cmd")
+
+    with pytest.raises(ValueError):
+        AdmissionController(policy="ignore")
@@ -0,0 +1,38 @@
+import types
+
+from telegram.error import RetryAfter
+
+from xai_components.xai_telegram.telegram_broadcast import broadcast
+from xai_components.xai_telegram.telegram_scheduler import SendScheduler
+
+
+class RateLimitedBot:
+    """A bot whose every send_message is rejected with a 429."""
+
+    def __init__(self, rate_limiter=None):
+        self.rate_limiter = rate_limiter
+        self.calls = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.calls.append((chat_id, kwargs.get("rate_limit_args")))
+        raise RetryAfter(1)
+
+
+def test_sends_retry_after_429_without_a_scheduler(fake_clock):
+    bot = RateLimitedBot()
+    app = types.SimpleNamespace(bot=bot)
+    summary = fake_clock(lambda loop: broadcast(app, [1], text="hi", max_retries=2))
+
+    assert summary["failed"] == 1
+    assert len(bot.calls) == 3
+
+
+def test_scheduler_retries_are_not_repeated(fake_clock):
+    bot = RateLimitedBot(SendScheduler())
+    app = types.SimpleNamespace(bot=bot)
+    summary = fake_clock(lambda loop: broadcast(app, [1, 2], text="hi", max_retries=2))
+
+    assert summary["failed"] == 2
+    # The scheduler is bypassed by this fake bot, so each call here is one attempt of broadcast.
+    assert [chat_id for chat_id, _ in bot.calls] == [1, 2]
+    assert bot.calls[0][1] == {"priority": 2}
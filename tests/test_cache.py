@@ -0,0 +1,65 @@
+from telegram import Update
+from telegram.error import Forbidden
+
+from xai_components.xai_telegram.telegram_cache import RESPONSES_KEY, ResponseCache, ResponseRecorder
+from xai_components.xai_telegram.telegram_core_components import TelegramReplyToMessageEvent
+from xai_components.xai_telegram.telegram_tasks import get_send_registry
+
+
+class Bot:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if self.error is not None:
+            raise self.error
+        self.sent.append((chat_id, text))
+        return text
+
+
+class App:
+    def __init__(self, bot):
+        self.bot = bot
+
+
+def cached_payload(cache: ResponseCache) -> dict:
+    update = Update.de_json(
+        {"update_id": 1, "message": {"message_id": 1, "date": 0, "chat": {"id": 5, "type": "private"}, "text": "hi"}},
+        None,
+    )
+    payload = {"update": update, "chat_id": 5, "text": "hi"}
+    payload[RESPONSES_KEY] = ResponseRecorder(cache, cache.key(payload))
+    return payload
+
+
+def reply(fake_clock, app, payload, text):
+    async def scenario(loop):
+        component = TelegramReplyToMessageEvent()
+        component.application.value = app
+        component.event_payload.value = payload
+        component.reply_text.value = text
+        component.execute({})
+        await get_send_registry(app).drain()
+
+    fake_clock(scenario)
+
+
+def test_delivered_reply_is_cached(fake_clock):
+    cache = ResponseCache(ttl=60)
+    app = App(Bot())
+    payload = cached_payload(cache)
+    reply(fake_clock, app, payload, "hello")
+
+    assert app.bot.sent == [(5, "hello")]
+    assert cache.get(cache.key(payload)) == [("hello", "HTML")]
+
+
+def test_failed_reply_is_not_cached(fake_clock):
+    cache = ResponseCache(ttl=60)
+    app = App(Bot(Forbidden("bot was blocked by the user")))
+    payload = cached_payload(cache)
+    reply(fake_clock, app, payload, "hello")
+
+    assert cache.get(cache.key(payload)) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+from xai_components.base import BaseComponent, Component, InArg, OutArg, SubGraphExecutor
+
+
+class Listener(Component):
+    payload: OutArg[dict]
+
+
+class GetText(Component):
+    payload: InArg[dict]
+    text: OutArg[str]
+
+    def execute(self, ctx) -> None:
+        self.text.value = self.payload.value["text"]
+
+
+class Branch(Component):
+    when_true: BaseComponent
+    when_false: BaseComponent
+    condition: InArg[bool]
+
+    def do(self, ctx) -> BaseComponent:
+        branch = self.when_true if self.condition.value else self.when_false
+        while branch:
+            branch = branch.do(ctx)
+        return self.next
+
+
+class Record(Component):
+    value: InArg[str]
+    seen: list = None
+    barrier: threading.Barrier = None
+
+    def execute(self, ctx) -> None:
+        if self.barrier is not None:
+            self.barrier.wait(timeout=5)
+        self.seen.append(self.value.value)
+
+
+def _branching_graph(seen, barrier=None):
+    """Listener -> GetText -> Branch(when_true=Record(text)), wired as the compiler does."""
+    listener, get_text, branch, record = Listener(), GetText(), Branch(), Record()
+    get_text.payload.connect(listener.payload)
+    branch.condition.value = True
+    record.value.connect(get_text.text)
+    record.seen, record.barrier = seen, barrier
+    record.next = None
+
+    listener.next = get_text
+    get_text.next = branch
+    branch.when_true = SubGraphExecutor(record)
+    branch.when_false = None
+    branch.next = None
+    return listener
+
+
+def test_branch_body_sees_payload(dispatch):
+    seen = []
+    listener = _branching_graph(seen)
+
+    dispatch.run_subgraph(listener, {}, {"text": "hello"})
+    dispatch.run_subgraph(listener, {}, {"text": "again"})
+
+    assert seen == ["hello", "again"]
+    assert listener.payload.value is None
+
+
+def test_concurrent_branch_bodies_are_isolated(dispatch):
+    seen = []
+    listener = _branching_graph(seen, barrier=threading.Barrier(2))
+
+    threads = [
+        threading.Thread(target=dispatch.run_subgraph, args=(listener, {}, {"text": text}))
+        for text in ("first", "second")
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert sorted(seen) == ["first", "second"]
+
+
+def test_uncloneable_subgraph_runs_serially(dispatch):
+    seen = []
+    listener = _branching_graph(seen)
+    listener.extra_branches = [SubGraphExecutor(Record())]
+
+    template = dispatch.get_subgraph_template(listener)
+    assert not template.cloneable
+
+    dispatch.run_subgraph(listener, {}, {"text": "serial"})
+    assert seen == ["serial"]
+
+
+def test_close_stop_hooks_run_last(dispatch):
+    class App:
+        post_stop = None
+
+    app = App()
+    order = []
+
+    def hook(name):
+        async def run(application):
+            order.append(name)
+        return run
+
+    dispatch.add_post_stop_hook(app, hook("close"), close=True)
+    dispatch.add_post_stop_hook(app, hook("drain"))
+    asyncio.run(app.post_stop(app))
+    assert order == ["drain", "close"]
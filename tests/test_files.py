@@ -0,0 +1,60 @@
+import io
+
+from xai_components.xai_telegram.telegram_files import LazyFile, make_input_file, release_input_file
+
+
+def upload(media) -> bytes:
+    """Reads the content as the upload does."""
+    content = media.input_file_content
+    return content if isinstance(content, bytes) else content.read()
+
+
+def test_caller_stream_stays_open_and_is_rewound():
+    stream = io.BytesIO(b"headerpayload")
+    stream.seek(6)
+    media = make_input_file(stream, filename="a.bin")
+
+    for _ in range(2):
+        assert upload(media) == b"payload"
+        release_input_file(media)
+    assert not stream.closed
+
+
+def test_unseekable_caller_stream_is_not_closed():
+    class Pipe(io.RawIOBase):
+        def readable(self):
+            return True
+
+        def readinto(self, buffer):
+            return 0
+
+    stream = Pipe()
+    media = make_input_file(stream, filename="a.bin")
+    release_input_file(media)
+    assert not stream.closed
+
+
+def test_file_opened_from_a_path_is_closed_and_reopened(tmp_path):
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"content")
+    media = make_input_file(str(path))
+    assert isinstance(media.input_file_content, LazyFile)
+
+    for _ in range(2):
+        assert upload(media) == b"content"
+        release_input_file(media)
+        assert media.input_file_content._file is None
+
+
+def test_buffers_are_rewound():
+    media = make_input_file(bytearray(b"buffer"), filename="a.bin")
+    for _ in range(2):
+        assert upload(media) == b"buffer"
+        release_input_file(media)
+
+
+def test_content_is_hashed_only_on_demand():
+    media = make_input_file(b"bytes")
+    assert callable(media._cache_key)
+    assert media.cache_key.startswith("sha256:")
+    assert media.cache_key == media._cache_key
@@ -0,0 +1,67 @@
+import re
+
+import pytest
+from telegram import Update
+
+from xai_components.xai_telegram.telegram_router import EventRouter
+
+
+def text_update(text: str, update_id: int = 1) -> Update:
+    message = {"message_id": update_id, "date": 0, "chat": {"id": 5, "type": "private"}, "text": text}
+    if text.startswith("/"):
+        length = len(text.split()[0])
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": length}]
+    return Update.de_json({"update_id": update_id, "message": message}, None)
+
+
+def fired(router: EventRouter, text: str):
+    return [event_name for event_name, _, _ in router.route(text_update(text))]
+
+
+def test_backreference_pattern_fires_after_other_groups():
+    router = EventRouter()
+    router.add_pattern("(b)x", "bx", {})
+    router.add_pattern(r"(a)\1", "double_a", {})
+
+    assert re.search(r"(a)\1", "aa")
+    assert fired(router, "aa") == ["double_a"]
+    assert fired(router, "bx") == ["bx"]
+
+
+def test_patterns_with_and_without_groups_are_both_tested():
+    router = EventRouter()
+    router.add_pattern("hello", "plain", {})
+    router.add_pattern(r"order #(\d+)", "order", {})
+
+    assert fired(router, "order #12") == ["order"]
+    assert fired(router, "hello, order #12") == ["plain", "order"]
+    assert fired(router, "nothing") == []
+
+
+def test_event_fires_once_for_several_matching_keywords():
+    router = EventRouter()
+    router.add_keyword("hello", "greet", {})
+    router.add_keyword("hi", "greet", {})
+    router.add_keyword("good morning", "greet", {})
+    router.add_keyword("hello", "other", {})
+
+    assert fired(router, "hello hi, Hello and good morning") == ["greet", "other"]
+
+
+def test_command_routes_get_separate_payloads():
+    router = EventRouter()
+    router.add_command("start", "first", {})
+    router.add_command("start", "second", {})
+
+    matches = router.route(text_update("/start now"))
+    assert [event_name for event_name, _, _ in matches] == ["first", "second"]
+    assert matches[0][2] is not matches[1][2]
+
+
+@pytest.mark.parametrize("fan_out, expected", [("all", ["a", "b"]), ("first", ["a"])])
+def test_fan_out(fan_out, expected):
+    router = EventRouter(fan_out=fan_out)
+    router.add_keyword("ping", "a", {})
+    router.add_pattern("pi.g", "b", {})
+
+    assert fired(router, "ping") == expected
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from telegram.error import RetryAfter
+
+from xai_components.xai_telegram.telegram_scheduler import (
+    PRIORITY_BROADCAST,
+    PRIORITY_REPLY,
+    SendScheduler,
+    TokenBucket,
+)
+
+
+async def started(**kwargs) -> SendScheduler:
+    scheduler = SendScheduler(**kwargs)
+    await scheduler.initialize()
+    return scheduler
+
+
+def send(scheduler, loop, sent, name, chat_id=None, priority=None, callback=None):
+    async def request():
+        sent.append((name, round(loop.time(), 3)))
+        return name
+
+    return scheduler.process_request(
+        callback or request, (), {}, "sendMessage", {"chat_id": chat_id},
+        {"priority": priority} if priority is not None else None,
+    )
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(rate=2.0, burst=3.0, now=0.0)
+    assert [bucket.reserve(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Callers past the burst wait in FIFO order, one refill interval apart.
+    assert bucket.reserve(0.0) == pytest.approx(0.5)
+    assert bucket.reserve(0.0) == pytest.approx(1.0)
+    assert bucket.delay(0.0) == pytest.approx(1.5)
+    assert bucket.delay(2.0) == 0.0
+    assert not bucket.idle(2.0)
+    assert bucket.idle(10.0)
+    assert bucket.tokens == 3.0
+
+
+def test_private_chats_get_a_burst_and_groups_do_not(fake_clock):
+    async def scenario(loop):
+        scheduler = await started(global_rate=100.0, chat_rate=1.0, chat_burst=3.0, group_rate_per_minute=20.0)
+        sent = []
+        await asyncio.gather(*(send(scheduler, loop, sent, f"p{i}", chat_id=5) for i in range(4)))
+        await asyncio.gather(*(send(scheduler, loop, sent, f"g{i}", chat_id=-100) for i in range(2)))
+        return sent
+
+    sent = dict(fake_clock(scenario))
+    assert [sent[f"p{i}"] for i in range(4)] == [0.0, 0.0, 0.0, pytest.approx(1.0)]
+    # Group chats: one message, then 20 per minute.
+    assert sent["g1"] - sent["g0"] == pytest.approx(3.0)
+
+
+def test_global_limit_serves_replies_before_broadcasts(fake_clock):
+    async def scenario(loop):
+        scheduler = await started(global_rate=1.0)
+        sent = []
+        await send(scheduler, loop, sent, "first")
+        await asyncio.gather(
+            send(scheduler, loop, sent, "broadcast", priority=PRIORITY_BROADCAST),
+            send(scheduler, loop, sent, "default"),
+            send(scheduler, loop, sent, "reply", priority=PRIORITY_REPLY),
+        )
+        return sent, scheduler.stats()
+
+    sent, stats = fake_clock(scenario)
+    assert [name for name, _ in sent] == ["first", "reply", "default", "broadcast"]
+    assert [at for _, at in sent] == [0.0, pytest.approx(1.0), pytest.approx(2.0), pytest.approx(3.0)]
+    assert stats["lanes"]["broadcast"]["sent"] == 1
+    assert stats["lanes"]["broadcast"]["wait_max"] == pytest.approx(3.0)
+    assert stats["queue_depth"] == 0
+
+
+def test_retry_after_pauses_every_request_and_retries(fake_clock):
+    async def scenario(loop):
+        scheduler = await started(global_rate=100.0)
+        sent = []
+        failures = [RetryAfter(2)]
+
+        async def flaky():
+            sent.append(("flaky", round(loop.time(), 3)))
+            if failures:
+                raise failures.pop()
+            return "ok"
+
+        async def later():
+            await asyncio.sleep(0.5)
+            return await send(scheduler, loop, sent, "other")
+
+        result, _ = await asyncio.gather(send(scheduler, loop, sent, "flaky", callback=flaky), later())
+        return result, sent, scheduler.stats()
+
+    result, sent, stats = fake_clock(scenario)
+    assert result == "ok"
+    assert sent[0] == ("flaky", 0.0)
+    # Both the retry and the unrelated request wait out the pause.
+    assert all(at >= 2.1 - 1e-9 for _, at in sent[1:])
+    assert stats["retry_after"] == 1
+    assert stats["retries_exhausted"] == 0
+
+
+def test_retry_after_raises_once_retries_are_exhausted(fake_clock):
+    async def scenario(loop):
+        scheduler = await started(max_retries=1)
+        calls = []
+
+        async def limited():
+            calls.append(loop.time())
+            raise RetryAfter(1)
+
+        with pytest.raises(RetryAfter):
+            await send(scheduler, loop, [], "limited", callback=limited)
+        return calls, scheduler.stats()
+
+    calls, stats = fake_clock(scenario)
+    assert len(calls) == 2
+    assert calls[1] - calls[0] == pytest.approx(1.1)
+    assert stats["retry_after"] == 2
+    assert stats["retries_exhausted"] == 1
@@ -0,0 +1,159 @@
+import threading
+import time
+import types
+
+import pytest
+
+from xai_components.xai_telegram import telegram_state
+from xai_components.xai_telegram.telegram_state import SQLiteStateBackend, StateStore
+
+
+class FlakyBackend(SQLiteStateBackend):
+    """Fails the first `failures` writes; can hold writes until `release` is set."""
+
+    def __init__(self, path: str, failures: int = 0):
+        super().__init__(path)
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+        self.writes = 0
+
+    def write(self, changes) -> None:
+        self.release.wait(5)
+        self.writes += 1
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        super().write(changes)
+
+
+@pytest.fixture
+def db(tmp_path):
+    return str(tmp_path / "state.sqlite")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(telegram_state, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def wait_until(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def stored(db, chat_id, user_id=None):
+    backend = SQLiteStateBackend(db)
+    try:
+        record = backend.load((chat_id, user_id), 0.0)
+    finally:
+        backend.close()
+    return record[0] if record else None
+
+
+def test_lru_evicts_to_backend_and_loads_back(db):
+    store = StateStore(max_entries=2, backend=SQLiteStateBackend(db), flush_interval=60)
+    for chat_id in (1, 2, 3):
+        store.set(chat_id, None, {"n": chat_id})
+    assert store.stats()["evictions"] == 1
+    assert store.stats()["entries"] == 2
+
+    # Evicted but not yet flushed: served from the pending writes.
+    assert store.get(1) == {"n": 1}
+    store.flush()
+    assert stored(db, 1) == {"n": 1}
+
+    assert store.get(1) == {"n": 1}
+    assert store.stats()["entries"] == 2
+    assert store.get(3) == {"n": 3}
+    store.close()
+
+
+def test_states_expire_after_ttl(db, clock):
+    store = StateStore(ttl=10, backend=SQLiteStateBackend(db), flush_interval=60)
+    store.update(1, 7, {"step": 1})
+    clock[0] += 5
+    assert store.update(1, 7, {"done": True}) == {"step": 1, "done": True}
+    clock[0] += 9
+    assert store.get(1, 7) == {"step": 1, "done": True}
+    clock[0] += 2
+    assert store.get(1, 7) == {}
+    assert store.stats()["expirations"] == 1
+
+    store.flush()
+    assert store.get(1, 7) == {}
+    store.close()
+
+
+def test_delete_is_written_to_backend(db):
+    store = StateStore(backend=SQLiteStateBackend(db), flush_interval=60)
+    store.set(1, None, {"a": 1})
+    store.flush()
+    store.delete(1, None)
+    store.flush()
+    assert stored(db, 1) is None
+    store.close()
+
+
+def test_full_batch_flushes_without_waiting_for_the_interval(db):
+    store = StateStore(backend=SQLiteStateBackend(db), flush_interval=60, batch_size=3)
+    store.set(1, None, {"a": 1})
+    store.set(2, None, {"a": 2})
+    assert store.stats()["pending_writes"] == 2
+
+    store.set(3, None, {"a": 3})
+    wait_until(lambda: store.stats()["flushes"] == 1)
+    assert store.stats()["written"] == 3
+    assert stored(db, 3) == {"a": 3}
+    store.close()
+
+
+def test_pending_writes_flush_after_the_interval(db):
+    store = StateStore(backend=SQLiteStateBackend(db), flush_interval=0.05)
+    store.set(1, None, {"a": 1})
+    wait_until(lambda: store.stats()["flushes"] == 1)
+    assert stored(db, 1) == {"a": 1}
+    store.close()
+
+
+def test_only_one_background_flush_runs_at_a_time(db):
+    backend = FlakyBackend(db)
+    backend.release.clear()
+    store = StateStore(backend=backend, flush_interval=60, batch_size=2)
+    for chat_id in range(50):
+        store.set(chat_id, None, {"a": chat_id})
+
+    flushing = [thread for thread in threading.enumerate() if thread.name == "xai-telegram-state-flush"]
+    assert len(flushing) == 1
+    backend.release.set()
+    store.close()
+    assert all(stored(db, chat_id) == {"a": chat_id} for chat_id in range(50))
+
+
+def test_failed_flush_is_retried_without_another_write(db):
+    backend = FlakyBackend(db, failures=1)
+    store = StateStore(backend=backend, flush_interval=0.05)
+    store.set(1, None, {"a": 1})
+
+    wait_until(lambda: store.stats()["flushes"] == 1)
+    assert backend.writes == 2
+    assert store.stats()["pending_writes"] == 0
+    assert stored(db, 1) == {"a": 1}
+    store.close()
+
+
+def test_failed_flush_keeps_newer_changes(db):
+    backend = FlakyBackend(db, failures=1)
+    store = StateStore(backend=backend, flush_interval=60)
+    store.set(1, None, {"a": 1})
+    store.flush()
+    assert store.stats()["pending_writes"] == 1
+
+    store.set(1, None, {"a": 2})
+    store.flush()
+    assert stored(db, 1) == {"a": 2}
+    store.close()
@@ -0,0 +1,112 @@
+import re
+
+import pytest
+
+from xai_components.xai_telegram.telegram_text import (
+    MAX_CAPTION_LENGTH,
+    MAX_MESSAGE_LENGTH,
+    split_caption,
+    split_text,
+    text_length,
+)
+
+EMOJI = "\U0001F600"
+
+
+def visible(part: str) -> str:
+    return re.sub(r"<[^>]*>", "", part)
+
+
+def test_short_text_is_one_part():
+    assert split_text("") == []
+    assert split_text("hello", limit=5) == ["hello"]
+
+
+def test_parts_respect_the_limit_and_keep_all_text():
+    text = " ".join(f"word{i}" for i in range(500))
+    parts = split_text(text, limit=100)
+    assert all(text_length(part) <= 100 for part in parts)
+    assert "".join(parts) == text
+
+
+def test_prefers_paragraph_then_line_then_sentence_breaks():
+    paragraph = "a" * 30 + ". " + "b" * 20 + "\n" + "c" * 20 + "\n\n"
+    parts = split_text(paragraph + "d" * 40, limit=80)
+    assert parts == [paragraph, "d" * 40]
+
+    parts = split_text("a" * 30 + "\n" + "b" * 30 + ". " + "c" * 30, limit=70)
+    assert parts[0] == "a" * 30 + "\n" + "b" * 30 + ". "
+
+
+def test_long_word_is_cut_hard():
+    parts = split_text("x" * 250, limit=100)
+    assert parts == ["x" * 100, "x" * 100, "x" * 50]
+
+
+def test_first_limit_applies_to_the_first_part_only():
+    parts = split_text("word " * 100, limit=200, first_limit=50)
+    assert text_length(parts[0]) <= 50
+    assert all(text_length(part) <= 200 for part in parts[1:])
+    assert len(parts[1]) > 100
+
+
+def test_html_length_excludes_tags_and_counts_entities_once():
+    assert text_length("<b>bold</b> &amp; <a href='x'>link</a>", html=True) == len("bold & link")
+    assert text_length("&#128512;", html=True) == 2
+
+
+def test_html_tags_are_closed_and_reopened_across_parts():
+    text = "<b>" + "bold words " * 30 + "</b><i>tail</i>"
+    parts = split_text(text, limit=100, html=True)
+    assert len(parts) > 1
+    for part in parts:
+        assert text_length(part, html=True) <= 100
+        assert part.count("<b>") == part.count("</b>")
+    assert parts[1].startswith("<b>")
+    assert "".join(visible(part) for part in parts) == visible(text)
+
+
+def test_nested_tags_reopen_in_order():
+    text = "<b><i>" + "nested text " * 20 + "</i></b>"
+    parts = split_text(text, limit=50, html=True)
+    for part in parts:
+        assert part.startswith("<b><i>")
+        assert part.endswith("</i></b>")
+
+
+def test_entities_are_never_cut():
+    text = "&amp;" * 150
+    parts = split_text(text, limit=100, html=True)
+    assert [text_length(part, html=True) for part in parts] == [100, 50]
+    assert all(part == "&amp;" * (len(part) // 5) for part in parts)
+
+
+def test_emoji_count_as_two_units_and_are_not_cut():
+    assert text_length(EMOJI * 3) == 6
+    parts = split_text(EMOJI * 75, limit=100)
+    assert parts == [EMOJI * 50, EMOJI * 25]
+
+    parts = split_text("a" + EMOJI * 50, limit=100)
+    assert parts == ["a" + EMOJI * 49, EMOJI]
+    assert all(text_length(part) <= 100 for part in parts)
+
+
+def test_emoji_text_fits_telegram_limit():
+    text = (EMOJI + " ") * 2000
+    parts = split_text(text)
+    assert all(len(part.encode("utf-16-le")) // 2 <= MAX_MESSAGE_LENGTH for part in parts)
+    assert "".join(parts) == text
+
+
+@pytest.mark.parametrize("parse_mode", [None, "HTML"])
+def test_split_caption(parse_mode):
+    assert split_caption(None) == (None, [])
+    assert split_caption("short", parse_mode) == ("short", [])
+
+    caption = "<b>" + "caption text " * 200 + "</b>"
+    first, rest = split_caption(caption, parse_mode)
+    html = parse_mode == "HTML"
+    assert text_length(first, html) <= MAX_CAPTION_LENGTH
+    assert rest and all(text_length(part, html) <= MAX_MESSAGE_LENGTH for part in rest)
+    if html:
+        assert first.endswith("</b>") and rest[0].startswith("<b>")